@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Event bus."""
+
+import bisect
+import json
+import logging
+import time
+
+__all__ = [
+    'BusInstrumentation',
+    'EventBus',
+]
+
+
+class EventBus(object):
+    """Dispatches events and commands to the handlers that are subscribed to their type.
+
+    A handler that is subscribed to a type also receives instances of its subclasses; subscribing to object receives
+    everything. For every concrete type that is published, the matching handlers are computed once and stored in a
+    dispatch table, so publishing costs one dict lookup plus the handler calls. Handlers are called in the order in
+    which they subscribed.
+    """
+
+    def __init__(self):
+        self._subscriptions = []  # type: list[tuple[type, callable]]
+        self._dispatch_table = {}  # type: dict[type, tuple]
+        self.instrumentation = None  # type: BusInstrumentation
+
+    def disable_instrumentation(self):
+        """Stops recording metrics. Publishing goes back to the uninstrumented code path."""
+        self.instrumentation = None
+        self.__dict__.pop('publish', None)
+
+    def enable_instrumentation(self, instrumentation: 'BusInstrumentation' = None) -> 'BusInstrumentation':
+        """Starts recording metrics about the dispatching of events.
+
+        While instrumentation is disabled, publishing does not pay for it: the instrumented code path is only
+        installed by this method.
+
+        @param instrumentation: The object to record the metrics in. A new one is created if it is None.
+        @return: The BusInstrumentation.
+        """
+        self.instrumentation = instrumentation if instrumentation is not None else BusInstrumentation()
+        self.publish = self._publish_instrumented
+        return self.instrumentation
+
+    def get_handlers(self, event_type: type) -> tuple:
+        """Returns the handlers of a type of event.
+
+        @param event_type: The concrete type of the event.
+        @return: A tuple of handlers.
+        """
+        handlers = self._dispatch_table.get(event_type)
+        if handlers is None:
+            handlers = tuple(
+                handler
+                for subscribed_type, handler in self._subscriptions
+                if issubclass(event_type, subscribed_type)
+            )
+            self._dispatch_table[event_type] = handlers
+        return handlers
+
+    def publish(self, event):
+        """Publishes an event to the handlers subscribed to its type.
+
+        @param event: The event. Nothing happens if it is None.
+        """
+        if event is None:
+            return
+        for handler in self.get_handlers(type(event)):
+            handler(event)
+
+    def _publish_instrumented(self, event):
+        if event is None:
+            return
+        event_type = type(event)
+        instrumentation = self.instrumentation
+        instrumentation.record_event(event_type)
+        for handler in self.get_handlers(event_type):
+            start_time = time.perf_counter()
+            handler(event)
+            instrumentation.record_handler(handler, event_type, time.perf_counter() - start_time)
+
+    def publish_all(self, events):
+        """Publishes a batch of events, in order.
+
+        @param events: An iterable of events.
+        """
+        if self.instrumentation is not None:
+            for event in events:
+                self.publish(event)
+            return
+        for event in events:
+            event_type = type(event)
+            handlers = self._dispatch_table.get(event_type)
+            if handlers is None:
+                handlers = self.get_handlers(event_type)
+            for handler in handlers:
+                handler(event)
+
+    def subscribe(self, event_type: type, handler):
+        """Subscribes a handler to a type of event.
+
+        @param event_type: The type of event, which may be a base class.
+        @param handler: A function taking the event.
+        """
+        self._subscriptions.append((event_type, handler))
+        self._dispatch_table = {}
+
+    def unsubscribe(self, event_type: type, handler):
+        """Unsubscribes a handler from a type of event.
+
+        @param event_type: The type of event that was used to subscribe.
+        @param handler: The handler that was used to subscribe.
+        @raise ValueError: If the handler is not subscribed to the type.
+        """
+        self._subscriptions.remove((event_type, handler))
+        self._dispatch_table = {}
+
+
+class _HandlerStatistics(object):
+    def __init__(self, bucket_count: int):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * bucket_count
+
+
+class BusInstrumentation(object):
+    """Records how many events of every type are published and how long every handler takes.
+
+    Handler durations include the handling of events that the handler publishes itself.
+
+    @ivar slow_handler_threshold: A handler call that takes longer than this number of seconds is logged as a
+        warning.
+    """
+
+    # Upper bounds of the histogram buckets, in seconds. The last bucket has no upper bound.
+    BUCKET_BOUNDS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+    def __init__(self, slow_handler_threshold: float = 0.016):
+        """Constructor.
+
+        @param slow_handler_threshold: See the class documentation. The default is about one frame.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.slow_handler_threshold = slow_handler_threshold
+        self.start_time = time.time()
+        self._event_counts = {}  # type: dict[type, int]
+        self._handler_statistics = {}  # type: dict[callable, _HandlerStatistics]
+
+    @staticmethod
+    def _get_name(handler_or_type) -> str:
+        return '{m}.{n}'.format(
+            m=getattr(handler_or_type, '__module__', '?'),
+            n=getattr(handler_or_type, '__qualname__', repr(handler_or_type)))
+
+    def record_event(self, event_type: type):
+        self._event_counts[event_type] = self._event_counts.get(event_type, 0) + 1
+
+    def record_handler(self, handler, event_type: type, duration: float):
+        statistics = self._handler_statistics.get(handler)
+        if statistics is None:
+            statistics = _HandlerStatistics(len(self.BUCKET_BOUNDS) + 1)
+            self._handler_statistics[handler] = statistics
+        statistics.count += 1
+        statistics.total_time += duration
+        if duration > statistics.max_time:
+            statistics.max_time = duration
+        statistics.histogram[bisect.bisect_left(self.BUCKET_BOUNDS, duration)] += 1
+        if duration > self.slow_handler_threshold:
+            self.log.warning(u'Slow handler {handler} took {duration:.1f} ms for {event_type}'.format(
+                handler=self._get_name(handler), duration=duration * 1000, event_type=event_type.__name__))
+
+    def reset(self):
+        """Forgets all recorded metrics."""
+        self.start_time = time.time()
+        self._event_counts.clear()
+        self._handler_statistics.clear()
+
+    def to_dict(self) -> dict:
+        """Returns the recorded metrics as a dict that can be serialized to JSON. Durations are in seconds."""
+        return {
+            'start_time': self.start_time,
+            'duration': time.time() - self.start_time,
+            'bucket_bounds': list(self.BUCKET_BOUNDS),
+            'events': {
+                self._get_name(event_type): count
+                for event_type, count in self._event_counts.items()
+            },
+            'handlers': {
+                self._get_name(handler): {
+                    'count': statistics.count,
+                    'total_time': statistics.total_time,
+                    'average_time': statistics.total_time / statistics.count,
+                    'max_time': statistics.max_time,
+                    'histogram': list(statistics.histogram),
+                }
+                for handler, statistics in self._handler_statistics.items()
+            },
+        }
+
+    def to_json(self) -> str:
+        """Returns the recorded metrics as JSON."""
+        return json.dumps(self.to_dict(), indent=2, sort_keys=True)
+
+    def dump(self, path: str):
+        """Writes the recorded metrics to a file as JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+        self.log.info(u'Bus metrics written to {path}'.format(path=path))
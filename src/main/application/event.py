@@ -1,3 +0,0 @@
-# -*- coding: utf-8 -*-
-
-APPLICATION_TOPIC = 'application-events'
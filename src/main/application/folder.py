@@ -1,10 +1,8 @@
 # -*- coding: utf-8 -*-
 import logging
 
-import cyrusbus.bus
-
 from notebook.aggregate import Note
-from .event import APPLICATION_TOPIC
+from .bus import EventBus
 
 
 # class FolderOpened(object):
@@ -16,14 +14,13 @@ from .event import APPLICATION_TOPIC
 
 
 class FolderService(object):
-    def __init__(self, bus: cyrusbus.bus.Bus):
+    def __init__(self, bus: EventBus):
         self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
         self.bus = bus
-        bus.subscribe(APPLICATION_TOPIC, self.on_event)
+        # bus.subscribe(NoteOpened, self.on_note_opened)
 
     def _publish_event(self, event):
-        if event is not None:
-            self.bus.publish(APPLICATION_TOPIC, event)
+        self.bus.publish(event)
 
     # def set_open_node(self, node_id: str):
     #     """Sets the currently open node.
@@ -32,19 +29,14 @@ class FolderService(object):
     #     """
     #     if node_id is not None:
     #         node = self.note_repository.get_node(node_id)
-    #         self.bus.publish(APPLICATION_TOPIC, NoteOpened(node, node.payload))
+    #         self.bus.publish(NoteOpened(node, node.payload))
     #     else:
     #         # TODO: Replace with different event
-    #         self.bus.publish(APPLICATION_TOPIC, NoteOpened(None, None))
-
-    def on_event(self, bus, event):
-        self.log.debug(u'Event received: {event}'.format(event=event))
-
-        # if isinstance(event, NoteOpened):  # type: NoteOpened
-        #     with self.source_buffer.handler_block(self._on_buffer_changed_handler_id):
-        #         if event.node is not None:
-        #             self.set_note(event)
-        #         else:
-        #             self.clear()
-        # else:
-        #     self.log.debug(u'Unhandled event: {event}'.format(event=event))
+    #         self.bus.publish(NoteOpened(None, None))
+
+    # def on_note_opened(self, event: NoteOpened):
+    #     with self.source_buffer.handler_block(self._on_buffer_changed_handler_id):
+    #         if event.node is not None:
+    #             self.set_note(event)
+    #         else:
+    #             self.clear()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Backlinks and broken links between notes."""
+
+import logging
+import threading
+from collections import namedtuple
+
+from notebook.aggregate import NotePayloadChanged, NotePayloadTextDeleted, NotePayloadTextInserted
+from notebook.dao import NoteRepository
+from notebook.links import LinkGraph
+from notebook.storage import NotebookStorage
+from .bus import EventBus
+from .note import NotebookChanged, NotebookLoaded
+
+__all__ = [
+    'BacklinksFound',
+    'FindBacklinksCommand',
+    'LinkService',
+]
+
+FindBacklinksCommand = namedtuple('FindBacklinksCommand', ['note_id'])
+
+
+class BacklinksFound(object):
+    def __init__(self, note_id: str, note_ids):
+        self.note_id = note_id
+        self.note_ids = note_ids  # type: list[str]
+
+    def __repr__(self):
+        return '{cls}[{note_id}, {len} backlinks]'.format(
+            cls=self.__class__.__name__,
+            len=len(self.note_ids),
+            **self.__dict__)
+
+
+class LinkService(object):
+    """Keeps a graph of the links between notes and answers FindBacklinksCommands.
+
+    When the notebook has been loaded, the graph is built from the storage on a background thread. After that, only
+    notes that changed are parsed again, before the next query.
+    """
+
+    def __init__(self, bus: EventBus, note_repository: NoteRepository, storage: NotebookStorage):
+        """Constructor.
+
+        @param bus: The bus.
+        @param note_repository: The repository to read changed notes from.
+        @param storage: The storage to build the graph from.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.bus = bus
+        self.note_repository = note_repository
+        self.storage = storage
+        self.graph = LinkGraph()
+        self._changed_note_ids = set()
+        self._lock = threading.Lock()
+        self._build_thread = None
+        self._building = False
+
+        bus.subscribe(FindBacklinksCommand, self.on_find_backlinks_command)
+        bus.subscribe(NotebookChanged, self.on_notebook_changed)
+        bus.subscribe(NotebookLoaded, self.on_notebook_loaded)
+        bus.subscribe(NotePayloadChanged, self.on_note_payload_changed)
+        bus.subscribe(NotePayloadTextInserted, self.on_note_payload_changed)
+        bus.subscribe(NotePayloadTextDeleted, self.on_note_payload_changed)
+
+    def _build(self):
+        graph = LinkGraph()
+        try:
+            for note in self.storage.get_all_notes():
+                with self.storage.open_note_payload_buffer(note.note_id, 'main') as buffer:
+                    graph.update_note(note.note_id, str(buffer, encoding='utf-8'))
+        except Exception:
+            self.log.exception(u'Building the link graph failed')
+            with self._lock:
+                self._building = False
+            return
+        self.log.debug(u'Built the link graph of {count} notes'.format(count=len(graph)))
+        with self._lock:
+            self.graph = graph
+            self._building = False
+
+    def close(self):
+        """Waits for the graph to be built."""
+        if self._build_thread is not None:
+            self._build_thread.join()
+
+    def _update_changed_notes(self):
+        for note_id in self._changed_note_ids:
+            if self.note_repository.has_note(note_id):
+                self.graph.update_note(note_id, self.note_repository.get_note(note_id).payload)
+            else:
+                self.graph.remove_note(note_id)
+        # While the graph is being built, the changes must be applied to the new graph as well.
+        if not self._building:
+            self._changed_note_ids.clear()
+
+    def get_backlinks(self, note_id: str):
+        """Returns the ids of the notes that link to a note.
+
+        @param note_id: The id of the note.
+        @return: A sorted list of note ids.
+        """
+        with self._lock:
+            self._update_changed_notes()
+            return sorted(self.graph.get_backlinks(note_id))
+
+    def get_broken_links(self):
+        """Returns the links to notes that do not exist.
+
+        @return: A sorted list of tuples (id of the linking note, id of the missing note).
+        """
+        with self._lock:
+            self._update_changed_notes()
+            return sorted(self.graph.get_broken_links())
+
+    def on_find_backlinks_command(self, command: FindBacklinksCommand):
+        self.bus.publish(BacklinksFound(command.note_id, self.get_backlinks(command.note_id)))
+
+    def on_note_payload_changed(self, event):
+        """Handles NotePayloadChanged, NotePayloadTextInserted and NotePayloadTextDeleted events."""
+        self._changed_note_ids.add(event.note_id)
+
+    def on_notebook_changed(self, event: NotebookChanged):
+        self._changed_note_ids.update(note.note_id for note in event.created_notes)
+        self._changed_note_ids.update(event.modified_note_ids)
+        self._changed_note_ids.update(event.deleted_note_ids)
+
+    def on_notebook_loaded(self, event: NotebookLoaded):
+        if self._build_thread is not None:
+            return
+        self._building = True
+        self._build_thread = threading.Thread(target=self._build, name='link-graph', daemon=True)
+        self._build_thread.start()
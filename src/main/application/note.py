@@ -3,13 +3,13 @@ import io
 import logging
 from collections import namedtuple
 
-import cyrusbus.bus
-
 from notebook.aggregate import Note
 from notebook.dao import NoteRepository
 from notebook.dao.delayed_persist import DelayedPersistNoteRepository
-from .event import APPLICATION_TOPIC
+from .bus import EventBus
 
+DeleteNoteTextCommand = namedtuple('DeleteNoteTextCommand', ['note_id', 'start_offset', 'end_offset'])
+InsertNoteTextCommand = namedtuple('InsertNoteTextCommand', ['note_id', 'offset', 'text'])
 OpenNoteCommand = namedtuple('OpenNoteCommand', ['note_id'])
 UpdateNotePayloadCommand = namedtuple('UpdateNotePayloadCommand', ['note_id', 'payload'])
 
@@ -26,31 +26,103 @@ class NoteOpened(object):
             **self.__dict__)
 
 
+class NotebookChanged(object):
+    """Notes were created, modified or deleted outside the application."""
+
+    def __init__(self, created_notes, modified_note_ids, deleted_note_ids):
+        self.created_notes = created_notes  # type: list[Note]
+        self.modified_note_ids = modified_note_ids  # type: list[str]
+        self.deleted_note_ids = deleted_note_ids  # type: list[str]
+
+    def __repr__(self):
+        return '{cls}[{created} created, {modified} modified, {deleted} deleted]'.format(
+            cls=self.__class__.__name__,
+            created=len(self.created_notes),
+            modified=len(self.modified_note_ids),
+            deleted=len(self.deleted_note_ids))
+
+
+class NotebookLoaded(object):
+    def __init__(self, notes):
+        self.notes = notes  # type: list[Note]
+
+    def __repr__(self):
+        return '{cls}[{len} notes]'.format(cls=self.__class__.__name__, len=len(self.notes))
+
+
 class NoteService(object):
-    def __init__(self, note_repository: DelayedPersistNoteRepository, bus: cyrusbus.bus.Bus):
+    def __init__(self, note_repository: DelayedPersistNoteRepository, bus: EventBus):
         self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
         self.bus = bus
         self.note_repository = note_repository
+        self.open_note_id = None  # type: str
 
-        self.bus.subscribe(APPLICATION_TOPIC, self.on_event)
+        self.bus.subscribe(NotebookChanged, self.on_notebook_changed)
+        self.bus.subscribe(OpenNoteCommand, self.on_open_note_command)
+        self.bus.subscribe(UpdateNotePayloadCommand, self.on_update_note_payload_command)
+        self.bus.subscribe(InsertNoteTextCommand, self.on_insert_note_text_command)
+        self.bus.subscribe(DeleteNoteTextCommand, self.on_delete_note_text_command)
 
     def load_notebook(self):
-        for note in self.note_repository.get_all_notes():  # type: Note
-            self.bus.publish(APPLICATION_TOPIC, note.create())
+        """Loads all notes and publishes them in a single NotebookLoaded event."""
+        self._publish_event(NotebookLoaded(list(self.note_repository.get_all_notes())))
 
-    def on_event(self, bus, event):
-        self.log.debug(u'Event received: {event}'.format(event=event))
+    def on_delete_note_text_command(self, command: DeleteNoteTextCommand):
+        self.delete_note_text(command.note_id, command.start_offset, command.end_offset)
 
-        if isinstance(event, OpenNoteCommand):  # type: OpenNoteCommand
-            self.set_open_note(event.note_id)
-        elif isinstance(event, UpdateNotePayloadCommand): # type: UpdateNotePayloadCommand
-            self.update_note_payload(event.note_id, event.payload)
-        else:
-            self.log.debug(u'Unhandled event: {event}'.format(event=event))
+    def on_insert_note_text_command(self, command: InsertNoteTextCommand):
+        self.insert_note_text(command.note_id, command.offset, command.text)
+
+    def on_notebook_changed(self, event: NotebookChanged):
+        """Reopens the open note if another program changed it, unless it has unsaved changes."""
+        if self.open_note_id is None or self.note_repository.is_dirty(self.open_note_id):
+            return
+        if self.open_note_id in event.deleted_note_ids:
+            self.set_open_note(None)
+        elif self.open_note_id in event.modified_note_ids:
+            self.set_open_note(self.open_note_id)
+
+    def on_open_note_command(self, command: OpenNoteCommand):
+        self.set_open_note(command.note_id)
+
+    def on_update_note_payload_command(self, command: UpdateNotePayloadCommand):
+        self.update_note_payload(command.note_id, command.payload)
+
+    def delete_note_text(self, note_id: str, start_offset: int, end_offset: int):
+        """Deletes a range of text from the payload of a note.
+
+        @param note_id: The id of the note to update.
+        @param start_offset: The character offset of the start of the range.
+        @param end_offset: The character offset of the end of the range (exclusive).
+        """
+        note = self.note_repository.get_note(note_id)
+        event = note.delete_payload_text(start_offset, end_offset)
+        self._publish_event(event)
+        self.note_repository.add_or_update_note(note)
+
+    def get_note_payload(self, note_id: str) -> str:
+        """Returns the full payload of a note.
+
+        Consumers of the text insertion and deletion events can use this if they need the full text.
+
+        @param note_id: The id of the note.
+        """
+        return self.note_repository.get_note(note_id).payload
+
+    def insert_note_text(self, note_id: str, offset: int, text: str):
+        """Inserts text into the payload of a note.
+
+        @param note_id: The id of the note to update.
+        @param offset: The character offset at which the text is inserted.
+        @param text: The text to insert.
+        """
+        note = self.note_repository.get_note(note_id)
+        event = note.insert_payload_text(offset, text)
+        self._publish_event(event)
+        self.note_repository.add_or_update_note(note)
 
     def _publish_event(self, event):
-        if event is not None:
-            self.bus.publish(APPLICATION_TOPIC, event)
+        self.bus.publish(event)
 
     def save(self):
         """Saves unsaved changes."""
@@ -61,12 +133,13 @@ class NoteService(object):
 
         @param note_id: The id of the note that should be open. May be None to indicate the currently open note should be closed.
         """
+        self.open_note_id = note_id
         if note_id is not None:
             note = self.note_repository.get_note(note_id)
-            self.bus.publish(APPLICATION_TOPIC, NoteOpened(note, note.payload))
+            self._publish_event(NoteOpened(note, note.payload))
         else:
             # TODO: Replace with different event
-            self.bus.publish(APPLICATION_TOPIC, NoteOpened(None, None))
+            self._publish_event(NoteOpened(None, None))
 
     def update_note_payload(self, note_id: str, payload: str):
         """Updates the payload of a note.
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Markdown rendering."""
+
+import hashlib
+import re
+import unicodedata
+from collections import OrderedDict, namedtuple
+
+import markdown
+from markdown.extensions.sane_lists import SaneListExtension
+from markdown.extensions.toc import TocExtension
+from pymdownx.github import GithubExtension
+
+__all__ = [
+    'BlockRenderer',
+    'RenderedBlock',
+    'create_markdown',
+    'render_markdown',
+    'split_blocks',
+]
+
+RenderedBlock = namedtuple('RenderedBlock', ['block_hash', 'html'])
+
+_FENCE_PATTERN = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+_LIST_ITEM_PATTERN = re.compile(r'^ {0,3}([*+-]|\d+[.)])\s')
+_BLOCK_QUOTE_PATTERN = re.compile(r'^ {0,3}>')
+# Constructs that make the rendering of a block depend on the rest of the document: a table of contents, reference
+# link definitions, and raw HTML, which may contain blank lines.
+_DOCUMENT_WIDE_PATTERN = re.compile(r'^\s{0,3}(\[TOC\]\s*$|\[[^\]]+\]:\s|<[a-zA-Z])', re.MULTILINE)
+# Lines that may be headings, also in block quotes and list items, and the underlines of setext headings.
+_ATX_HEADING_PATTERN = re.compile(r'^[ \t>]*(?:(?:[*+-]|\d+[.)])[ \t]+)?#{1,6}(?:[ \t]+(.*))?$')
+_SETEXT_UNDERLINE_PATTERN = re.compile(r'^[ \t>]*(=+|-+)[ \t]*$')
+_NON_WORD_PATTERN = re.compile(r'\W+')
+
+
+def create_markdown() -> markdown.Markdown:
+    """Creates a Markdown converter with the configuration of the application.
+
+    A converter can be reused for multiple documents, but not from multiple threads at the same time.
+    """
+    return markdown.Markdown(
+        tab_length=2,
+        extensions=[GithubExtension(), SaneListExtension(), TocExtension()],
+        output_format='html5',
+    )
+
+
+def render_markdown(payload: str, md: markdown.Markdown = None) -> str:
+    """Renders a complete Markdown document to HTML.
+
+    @param payload: The Markdown document.
+    @param md: The converter to use. A new one is created if it is None.
+    @return: The HTML.
+    """
+    if md is None:
+        md = create_markdown()
+    return md.reset().convert(payload)
+
+
+def _get_heading_key(heading_text: str) -> str:
+    """Returns a key for the text of a heading, which is the same for all headings that may get the same id.
+
+    TocExtension drops the characters that are not ASCII from ids, so they are dropped here as well. The key also
+    ignores all punctuation, so it is the same for more headings than the id.
+    """
+    ascii_text = unicodedata.normalize('NFKD', heading_text).encode('ascii', 'ignore').decode('ascii')
+    return _NON_WORD_PATTERN.sub('', ascii_text).lower()
+
+
+def split_blocks(text: str):
+    """Splits a Markdown document into top-level blocks that can be rendered independently.
+
+    Blocks are separated by blank lines, except inside fenced code and when the next line continues the previous
+    block (an indented line, a list item following a list, or a block quote following a block quote). Documents with a
+    table of contents, reference link definitions or raw HTML are returned as a single block, because rendering their
+    blocks separately gives another result. So are documents in which two headings may get the same id, which the
+    whole document would make unique.
+
+    @param text: The Markdown document.
+    @return: A list of strings.
+    """
+    if _DOCUMENT_WIDE_PATTERN.search(text):
+        return [text]
+
+    blocks = []
+    current_lines = []
+    blank_lines = []
+    paragraph_lines = []
+    heading_keys = set()
+    fence = None
+    for line in text.split('\n'):
+        if fence is not None:
+            current_lines.append(line)
+            stripped_line = line.strip()
+            if stripped_line.startswith(fence) and stripped_line.strip(fence[0]) == '':
+                fence = None
+            continue
+        if line.strip() == '':
+            if current_lines:
+                blank_lines.append(line)
+            paragraph_lines = []
+            continue
+
+        heading_match = _ATX_HEADING_PATTERN.match(line)
+        if heading_match:
+            heading_text = heading_match.group(1) or ''
+        elif paragraph_lines and _SETEXT_UNDERLINE_PATTERN.match(line):
+            heading_text = ' '.join(paragraph_lines)
+        else:
+            heading_text = None
+        if heading_text is None:
+            paragraph_lines.append(line)
+        else:
+            heading_key = _get_heading_key(heading_text)
+            if heading_key in heading_keys:
+                return [text]
+            heading_keys.add(heading_key)
+            paragraph_lines = []
+
+        if blank_lines:
+            continues_block = line[0] in ' \t' or \
+                (_LIST_ITEM_PATTERN.match(line) and _LIST_ITEM_PATTERN.match(current_lines[0])) or \
+                (_BLOCK_QUOTE_PATTERN.match(line) and _BLOCK_QUOTE_PATTERN.match(current_lines[0]))
+            if continues_block:
+                current_lines.extend(blank_lines)
+            else:
+                blocks.append('\n'.join(current_lines))
+                current_lines = []
+            blank_lines = []
+        fence_match = _FENCE_PATTERN.match(line)
+        if fence_match:
+            fence = fence_match.group(1)
+            paragraph_lines = []
+        current_lines.append(line)
+    if current_lines:
+        blocks.append('\n'.join(current_lines))
+    return blocks
+
+
+class BlockRenderer(object):
+    """Renders Markdown documents block by block, caching the HTML of every block.
+
+    When a document changes, usually only one of its blocks changes, so only that block has to be rendered again.
+    Instances are not thread-safe.
+
+    @ivar max_cached_blocks: The maximum number of rendered blocks that are kept.
+    """
+
+    def __init__(self, max_cached_blocks: int = 2000):
+        """Constructor.
+
+        @param max_cached_blocks: See the class documentation.
+        """
+        self.max_cached_blocks = max_cached_blocks
+        self._markdown = create_markdown()
+        self._cache = OrderedDict()
+
+    def render(self, text: str):
+        """Renders a Markdown document.
+
+        @param text: The Markdown document.
+        @return: A list of RenderedBlock objects.
+        """
+        rendered_blocks = []
+        for block in split_blocks(text):
+            block_hash = hashlib.blake2b(block.encode('utf-8'), digest_size=16).hexdigest()
+            html = self._cache.get(block_hash)
+            if html is None:
+                html = render_markdown(block, self._markdown)
+                self._cache[block_hash] = html
+                if len(self._cache) > self.max_cached_blocks:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(block_hash)
+            rendered_blocks.append(RenderedBlock(block_hash, html))
+        return rendered_blocks
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Background Markdown rendering."""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from .render import BlockRenderer
+
+__all__ = [
+    'RenderResult',
+    'RenderWorker',
+]
+
+RenderResult = namedtuple('RenderResult', ['note_id', 'revision', 'blocks', 'latency'])
+
+_RenderRequest = namedtuple('_RenderRequest', ['note_id', 'revision', 'payload', 'callback', 'submit_time'])
+
+
+class RenderWorker(object):
+    """Renders Markdown documents on a background thread.
+
+    Only the latest request per note is kept: a request that is superseded by a newer request for the same note
+    before it has been rendered is dropped, and so is its result if a newer request arrives while it is rendered.
+    Results are handed back through a deliver function, which should run the callback on the main loop
+    (e.g. GLib.idle_add).
+
+    @ivar deliver: A function taking a callback and a RenderResult, which arranges for the callback to be called
+        with the result.
+    """
+
+    def __init__(self, deliver, block_renderer: BlockRenderer = None):
+        """Constructor.
+
+        @param deliver: See the class documentation.
+        @param block_renderer: The renderer to use. It is only used from the worker thread.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.deliver = deliver
+        self._block_renderer = block_renderer if block_renderer is not None else BlockRenderer()
+        self._pending = OrderedDict()  # type: dict[str, _RenderRequest]
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._submitted_count = 0
+        self._rendered_count = 0
+        self._superseded_count = 0
+        self._total_latency = 0.0
+        self._last_latency = None
+        self._max_latency = 0.0
+        self._thread = threading.Thread(target=self._run, name='render-worker', daemon=True)
+        self._thread.start()
+
+    def get_statistics(self) -> dict:
+        """Returns statistics that can be used to tune rendering.
+
+        Latencies are in seconds, from submitting a request until its result is handed to the deliver function.
+        """
+        with self._condition:
+            return {
+                'queue_depth': len(self._pending),
+                'submitted': self._submitted_count,
+                'rendered': self._rendered_count,
+                'superseded': self._superseded_count,
+                'last_latency': self._last_latency,
+                'average_latency': self._total_latency / self._rendered_count if self._rendered_count else None,
+                'max_latency': self._max_latency,
+            }
+
+    def stop(self):
+        """Stops the worker thread. Pending requests are dropped, and so is the result of a request that is rendered."""
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._condition.notify()
+        self._thread.join()
+
+    def submit(self, note_id: str, revision: int, payload: str, callback):
+        """Requests a note to be rendered.
+
+        @param note_id: The id of the note.
+        @param revision: The revision of the payload. Must increase with every request for the note.
+        @param payload: The Markdown payload.
+        @param callback: A function taking a RenderResult.
+        """
+        with self._condition:
+            if self._pending.pop(note_id, None) is not None:
+                self._superseded_count += 1
+            self._pending[note_id] = _RenderRequest(note_id, revision, payload, callback, time.monotonic())
+            self._submitted_count += 1
+            self._condition.notify()
+
+    def _is_superseded(self, request: _RenderRequest):
+        pending_request = self._pending.get(request.note_id)
+        return pending_request is not None and pending_request.revision > request.revision
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                _, request = self._pending.popitem(last=False)
+
+            try:
+                blocks = self._block_renderer.render(request.payload)
+            except Exception:
+                self.log.exception(u'Rendering note {note_id} failed'.format(note_id=request.note_id))
+                continue
+            latency = time.monotonic() - request.submit_time
+
+            with self._condition:
+                if self._stopped:
+                    return
+                if self._is_superseded(request):
+                    self._superseded_count += 1
+                    continue
+                self._rendered_count += 1
+                self._total_latency += latency
+                self._last_latency = latency
+                self._max_latency = max(self._max_latency, latency)
+                queue_depth = len(self._pending)
+
+            if self.log.isEnabledFor(logging.DEBUG):
+                self.log.debug(u'Rendered note {note_id} revision {revision} in {latency:.1f} ms, queue depth {depth}'
+                               .format(note_id=request.note_id, revision=request.revision, latency=latency * 1000,
+                                       depth=queue_depth))
+            self.deliver(request.callback, RenderResult(request.note_id, request.revision, blocks, latency))
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from collections import namedtuple
+
+from notebook.aggregate import NotePayloadChanged, NotePayloadTextDeleted, NotePayloadTextInserted
+from notebook.dao import NoteRepository
+from notebook.search.fulltext import FullTextIndex
+from notebook.storage import NotebookStorage
+from .bus import EventBus
+from .note import NotebookChanged, NotebookLoaded
+
+SearchNotesCommand = namedtuple('SearchNotesCommand', ['query'])
+
+
+class NotesFound(object):
+    def __init__(self, query: str, results):
+        self.query = query
+        self.results = results  # type: list[notebook.search.fulltext.SearchResult]
+
+    def __repr__(self):
+        return '{cls}[{query}, {len} results]'.format(
+            cls=self.__class__.__name__,
+            len=len(self.results),
+            **self.__dict__)
+
+
+class SearchService(object):
+    """Keeps a full-text index of the notes in a notebook and answers SearchNotesCommands.
+
+    When the notebook has been loaded, the index is loaded from disk and brought up to date with the storage on a
+    background thread; until then, searches use the index as it was. Notes that are changed in the application are
+    indexed again before the next search.
+    """
+
+    def __init__(
+            self,
+            bus: EventBus,
+            note_repository: NoteRepository,
+            storage: NotebookStorage,
+            index_path: str,
+            processes: int = None,
+    ):
+        """Constructor.
+
+        @param bus: The bus.
+        @param note_repository: The repository to read changed notes from.
+        @param storage: The storage to build the index from.
+        @param index_path: The path of the index file.
+        @param processes: The number of processes used to build the index. See FullTextIndex.build().
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.bus = bus
+        self.note_repository = note_repository
+        self.storage = storage
+        self.index_path = index_path
+        self.processes = processes
+        self.index = FullTextIndex()
+        self._changed_note_ids = set()
+        self._lock = threading.Lock()
+        self._build_thread = None
+        self._building = False
+
+        bus.subscribe(NotebookChanged, self.on_notebook_changed)
+        bus.subscribe(NotebookLoaded, self.on_notebook_loaded)
+        bus.subscribe(NotePayloadChanged, self.on_note_payload_changed)
+        bus.subscribe(NotePayloadTextInserted, self.on_note_payload_changed)
+        bus.subscribe(NotePayloadTextDeleted, self.on_note_payload_changed)
+        bus.subscribe(SearchNotesCommand, self.on_search_notes_command)
+
+    def _build(self):
+        try:
+            index = FullTextIndex.load(self.index_path)
+            index.build(self.storage, processes=self.processes)
+        except Exception:
+            self.log.exception(u'Building the full-text index failed')
+            with self._lock:
+                self._building = False
+            return
+        with self._lock:
+            self.index = index
+            self._building = False
+            self._index_changed_notes()
+
+    def close(self):
+        """Waits for the index to be built and writes it to disk."""
+        if self._build_thread is not None:
+            self._build_thread.join()
+        with self._lock:
+            self._index_changed_notes()
+            self.index.save(self.index_path)
+
+    def _index_changed_notes(self):
+        for note_id in self._changed_note_ids:
+            if self.note_repository.has_note(note_id):
+                self.index.index_note(note_id, self.note_repository.get_note(note_id).payload)
+            else:
+                self.index.remove_note(note_id)
+        # While the index is being built, the changes must be applied to the new index as well.
+        if not self._building:
+            self._changed_note_ids.clear()
+
+    def on_note_payload_changed(self, event):
+        """Handles NotePayloadChanged, NotePayloadTextInserted and NotePayloadTextDeleted events."""
+        # The build thread iterates over the changed notes when it swaps the index.
+        with self._lock:
+            self._changed_note_ids.add(event.note_id)
+
+    def on_notebook_changed(self, event: NotebookChanged):
+        with self._lock:
+            self._changed_note_ids.update(note.note_id for note in event.created_notes)
+            self._changed_note_ids.update(event.modified_note_ids)
+            self._changed_note_ids.update(event.deleted_note_ids)
+
+    def on_notebook_loaded(self, event: NotebookLoaded):
+        if self._build_thread is not None:
+            return
+        self._building = True
+        self._build_thread = threading.Thread(target=self._build, name='fulltext-index', daemon=True)
+        self._build_thread.start()
+
+    def on_search_notes_command(self, command: SearchNotesCommand):
+        self.bus.publish(NotesFound(command.query, self.search(command.query)))
+
+    def search(self, query: str, limit: int = 50):
+        """Searches the contents of all notes.
+
+        @param query: Words and "quoted phrases", all of which must occur in a note.
+        @param limit: The maximum number of results.
+        @return: A list of SearchResult objects, best first.
+        """
+        with self._lock:
+            self._index_changed_notes()
+            return self.index.search(query, limit)
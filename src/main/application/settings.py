@@ -1,18 +1,19 @@
 import configparser
+import copy
 import enum
 import logging
 import os.path
+import threading
+import time
 from collections import namedtuple
 
-import cyrusbus
-
-from application.event import APPLICATION_TOPIC
+from application.bus import EventBus
 
 __all__ = [
-    'LayoutRequestedEvent'
+    'LayoutRequestedEvent',
     'Settings',
     'SettingsController',
-    'SettingsRepository'
+    'SettingsRepository',
 ]
 
 EDITOR_VIEWER_SPLIT_POSITION_KEY = 'editor_viewer_split_position'
@@ -93,8 +94,8 @@ class SettingsRepository:
 
     def _read_and_parse_enum(self, config, section, key, enum_class, default):
         try:
-            return enum_class[config[section].get(key, default.value)]
-        except ValueError:
+            return enum_class[config[section].get(key, default.name)]
+        except KeyError:
             return default
 
     def _read_and_parse_window_size_and_location(self, config, section, key, fallback) -> WindowSizeAndLocation:
@@ -110,6 +111,10 @@ class SettingsRepository:
         return WindowSizeAndLocation(*int_values)
 
     def save(self, settings: Settings):
+        """Writes the settings to the configuration file.
+
+        The file is written next to the configuration file first and then renamed, so it is never left half-written.
+        """
         self.ensure_directory_exists()
         config = configparser.ConfigParser()
         config['DEFAULT'] = {}
@@ -122,35 +127,118 @@ class SettingsRepository:
             config['DEFAULT'][MAIN_SPLIT_POSITION_KEY] = str(settings.main_split_position)
         if settings.editor_viewer_split_position is not None:
             config['DEFAULT'][EDITOR_VIEWER_SPLIT_POSITION_KEY] = str(settings.editor_viewer_split_position)
-        with open(self.config_file_path, 'w', encoding='utf-8') as f:
+        temporary_path = self.config_file_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as f:
             config.write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self.config_file_path)
 
-        def _serialize_window_size_and_location(self, window_size_and_location: WindowSizeAndLocation) -> str:
-            if window_size_and_location is None:
-                return None
-            return ','.join([
-                window_size_and_location.width,
-                window_size_and_location.height,
-                window_size_and_location.left,
-                window_size_and_location.top
-            ])
+    @staticmethod
+    def _serialize_window_size_and_location(window_size_and_location: WindowSizeAndLocation) -> str:
+        if window_size_and_location is None:
+            return None
+        return ','.join(str(value) for value in [
+            window_size_and_location.width,
+            window_size_and_location.height,
+            window_size_and_location.left,
+            window_size_and_location.top
+        ])
 
 
 class SettingsController:
-    def __init__(self, settings_repository: SettingsRepository, bus: cyrusbus.bus.Bus):
+    """Keeps the settings in memory and writes them to the repository some time after they were last changed.
+
+    A burst of updates, like the positions reported while a split pane is dragged, is written once, flush_delay
+    seconds after the last update. close() writes pending changes immediately.
+
+    @ivar flush_delay: The number of seconds without updates after which the settings are written.
+    """
+
+    def __init__(self, settings_repository: SettingsRepository, bus: EventBus, flush_delay: float = 2.0):
+        """Constructor.
+
+        @param settings_repository: The repository to load the settings from and to write them to.
+        @param bus: The bus.
+        @param flush_delay: See the class documentation.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
         self.bus = bus
         self.repository = settings_repository
+        self.flush_delay = flush_delay
+        self._settings = None  # type: Settings
+        self._dirty = False
+        self._last_update_time = None  # type: float
+        self._flush_timer = None  # type: threading.Timer
+        self._lock = threading.RLock()
+        # Serializes the writes, so an older copy of the settings never overwrites a newer one. It is taken before
+        # _lock, which is only held to copy the settings and never during I/O.
+        self._save_lock = threading.Lock()
+
+    def _get_settings(self) -> Settings:
+        if self._settings is None:
+            self._settings = self.repository.load()
+        return self._settings
 
     def load_settings(self):
-        settings = self.repository.load()
+        with self._lock:
+            settings = self._get_settings()
         self.publish_event(settings)
 
-    # TODO: Rename to "update" once settings are not flushed to disk immediately anymore
-    def update_and_save(self, f):
-        settings = self.repository.load()
-        f(settings)
-        self.repository.save(settings)
+    def update(self, f):
+        """Changes the settings in memory. They are written after flush_delay seconds without updates.
+
+        @param f: A function that takes the Settings and changes them.
+        """
+        with self._lock:
+            f(self._get_settings())
+            self._dirty = True
+            self._last_update_time = time.monotonic()
+            if self._flush_timer is None:
+                self._start_flush_timer(self.flush_delay)
+
+    def _start_flush_timer(self, delay: float):
+        self._flush_timer = threading.Timer(delay, self._on_flush_timer)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _on_flush_timer(self):
+        with self._lock:
+            if self._flush_timer is None:
+                return
+            # One timer per burst: while updates keep coming, the timer is started again for the remaining time.
+            remaining = self._last_update_time + self.flush_delay - time.monotonic()
+            if remaining > 0:
+                self._start_flush_timer(remaining)
+                return
+            self._flush_timer = None
+        self.flush()
+
+    def flush(self):
+        """Writes the settings if they have changed.
+
+        A copy of the settings is written, so update() does not wait for the disk.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                settings = copy.copy(self._settings)
+                self._dirty = False
+            try:
+                self.repository.save(settings)
+            except OSError:
+                self.log.exception(u'Saving the settings failed')
+                with self._lock:
+                    self._dirty = True
+
+    def close(self):
+        """Writes pending changes and stops the timer."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        self.flush()
 
     def publish_event(self, event):
-        if event is not None:
-            self.bus.publish(APPLICATION_TOPIC, event)
+        self.bus.publish(event)
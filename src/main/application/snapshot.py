@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""Showing the notebook at startup before the storage has been read."""
+
+import logging
+import marshal
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from notebook.aggregate import FolderPath, Note
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+from .bus import EventBus
+from .note import NotebookChanged, NotebookLoaded, NoteService, OpenNoteCommand
+
+__all__ = [
+    'NotebookSnapshot',
+    'StartupSnapshotService',
+    'read_snapshot',
+    'write_snapshot',
+]
+
+MAGIC = b'WMSNSNAP'
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct('<8sH')
+
+# The state of the application at the end of the previous session.
+NotebookSnapshot = namedtuple('NotebookSnapshot', ['notebook_dir', 'notes', 'open_note_id'])
+
+
+def write_snapshot(path: str, snapshot: NotebookSnapshot):
+    """Writes a snapshot to a file, replacing it atomically.
+
+    Folder paths are written once, and notes refer to their folder by its position in the list of folders.
+
+    @param path: The path of the snapshot file.
+    @param snapshot: The snapshot.
+    """
+    folder_indexes = {}  # type: dict[tuple, int]
+    notes = []
+    for note in snapshot.notes:
+        elements = note.folder_path.elements
+        folder_index = folder_indexes.setdefault(elements, len(folder_indexes))
+        notes.append((note.note_id, note.title, folder_index))
+    data = marshal.dumps((snapshot.notebook_dir, list(folder_indexes), notes, snapshot.open_note_id))
+
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as snapshot_file:
+        snapshot_file.write(_HEADER.pack(MAGIC, SNAPSHOT_VERSION))
+        snapshot_file.write(data)
+    os.replace(temporary_path, path)
+
+
+def read_snapshot(path: str) -> NotebookSnapshot:
+    """Reads a snapshot from a file.
+
+    Notes in the same folder share one FolderPath object.
+
+    @param path: The path of the snapshot file.
+    @return: The snapshot, or None if the file does not exist or cannot be read.
+    """
+    log = logging.getLogger(__name__)
+    try:
+        with open(path, 'rb') as snapshot_file:
+            data = snapshot_file.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        log.warning(u'Cannot read snapshot {path}: {e}'.format(path=path, e=e))
+        return None
+    if len(data) < _HEADER.size or _HEADER.unpack_from(data) != (MAGIC, SNAPSHOT_VERSION):
+        log.warning(u'Ignoring snapshot {path} of an unknown format'.format(path=path))
+        return None
+    try:
+        notebook_dir, folders, notes, open_note_id = marshal.loads(data[_HEADER.size:])
+    except (EOFError, ValueError, TypeError) as e:
+        log.warning(u'Ignoring damaged snapshot {path}: {e}'.format(path=path, e=e))
+        return None
+
+    folder_paths = [FolderPath(elements) for elements in folders]
+    return NotebookSnapshot(
+        notebook_dir=notebook_dir,
+        notes=[Note(note_id, title, folder_paths[folder_index]) for note_id, title, folder_index in notes],
+        open_note_id=open_note_id)
+
+
+class StartupSnapshotService(object):
+    """Shows the notebook of the previous session immediately at startup.
+
+    At shutdown, the metadata of all notes, their folders and the open note are written to a snapshot file. At
+    startup, the notebook is published from the snapshot in a NotebookLoaded event, so the time until the window is
+    usable does not depend on the size of the notebook. The storage is then read on a background thread, and the
+    differences with the snapshot are handed to the deliver function as a NotebookChanged event. If there is no
+    usable snapshot, the notebook is loaded from the storage as before.
+
+    Only the existence of notes is reconciled; notes whose payload changed are picked up by whoever reads them.
+
+    @ivar deliver: A function taking a function and an event, which arranges for the function to be called with the
+        event (e.g. GLib.idle_add).
+    """
+
+    def __init__(
+            self,
+            bus: EventBus,
+            note_service: NoteService,
+            storage: SimpleFileSystemStorage,
+            snapshot_path: str,
+            deliver,
+    ):
+        """Constructor.
+
+        @param bus: The bus.
+        @param note_service: The service to load the notebook with if there is no snapshot, and whose open note is
+            remembered.
+        @param storage: The storage to reconcile the snapshot with.
+        @param snapshot_path: The path of the snapshot file.
+        @param deliver: See the class documentation.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.bus = bus
+        self.note_service = note_service
+        self.storage = storage
+        self.snapshot_path = snapshot_path
+        self.deliver = deliver
+        self._notes = {}  # type: dict[str, Note]
+        self._reconcile_thread = None
+
+        bus.subscribe(NotebookChanged, self.on_notebook_changed)
+        bus.subscribe(NotebookLoaded, self.on_notebook_loaded)
+
+    def _get_notebook_dir(self) -> str:
+        return os.path.abspath(self.storage.dir)
+
+    def load_notebook(self, on_loaded=None):
+        """Publishes the notebook, from the snapshot if possible.
+
+        @param on_loaded: A function without arguments that is called once the notebook matches the storage. If the
+            snapshot was used, it is called through the deliver function after reconciling.
+        """
+        snapshot = read_snapshot(self.snapshot_path)
+        if snapshot is None or snapshot.notebook_dir != self._get_notebook_dir():
+            self.note_service.load_notebook()
+            if on_loaded is not None:
+                on_loaded()
+            return
+
+        self.log.debug(u'Loading {count} notes from the snapshot'.format(count=len(snapshot.notes)))
+        self.bus.publish(NotebookLoaded(snapshot.notes))
+        if snapshot.open_note_id is not None and self.storage.has_note(snapshot.open_note_id):
+            self.bus.publish(OpenNoteCommand(snapshot.open_note_id))
+        self._reconcile_thread = threading.Thread(
+            target=self._reconcile, args=(snapshot.notes, on_loaded), name='snapshot-reconcile', daemon=True)
+        self._reconcile_thread.start()
+
+    def _reconcile(self, snapshot_notes, on_loaded):
+        """Compares the snapshot with the storage. Called on a background thread."""
+        event = None
+        try:
+            snapshot_note_ids = {note.note_id for note in snapshot_notes}
+            storage_notes = list(self.storage.get_all_notes())
+            storage_note_ids = {note.note_id for note in storage_notes}
+            created_notes = [note for note in storage_notes if note.note_id not in snapshot_note_ids]
+            deleted_note_ids = sorted(snapshot_note_ids - storage_note_ids)
+            if created_notes or deleted_note_ids:
+                event = NotebookChanged(
+                    created_notes=created_notes, modified_note_ids=[], deleted_note_ids=deleted_note_ids)
+                self.log.debug(u'Snapshot differs from the storage: {event}'.format(event=event))
+        except Exception:
+            self.log.exception(u'Reconciling the snapshot with the storage failed')
+        self.deliver(self._on_reconciled, (event, on_loaded))
+
+    def _on_reconciled(self, result):
+        event, on_loaded = result
+        if event is not None:
+            self.bus.publish(event)
+        if on_loaded is not None:
+            on_loaded()
+
+    def on_notebook_changed(self, event: NotebookChanged):
+        for note_id in event.deleted_note_ids:
+            self._notes.pop(note_id, None)
+        for note in event.created_notes:
+            self._notes[note.note_id] = note
+
+    def on_notebook_loaded(self, event: NotebookLoaded):
+        self._notes = {note.note_id: note for note in event.notes}
+
+    def close(self):
+        """Waits for reconciling to finish and writes the snapshot."""
+        if self._reconcile_thread is not None:
+            self._reconcile_thread.join()
+            self._reconcile_thread = None
+        snapshot = NotebookSnapshot(
+            notebook_dir=self._get_notebook_dir(),
+            notes=sorted(self._notes.values(), key=lambda note: note.note_id),
+            open_note_id=self.note_service.open_note_id)
+        try:
+            write_snapshot(self.snapshot_path, snapshot)
+        except OSError:
+            self.log.exception(u'Writing the snapshot failed')
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Picking up changes that other programs make to the notebook."""
+
+import logging
+
+from notebook.dao.cache import CachingNoteRepository
+from notebook.storage import NoteDoesNotExistError
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+from notebook.storage.watcher import create_watcher
+from .bus import EventBus
+from .note import NotebookChanged
+
+__all__ = [
+    'NotebookWatchService',
+]
+
+
+class NotebookWatchService(object):
+    """Publishes a NotebookChanged event when other programs create, modify or delete notes.
+
+    A watcher reports the directories in which something changed, and the storage works out which notes changed.
+    Both happen on the thread of the watcher, and bursts of changes are reported as one event. The note cache is
+    invalidated before the event is handed to the deliver function, which should publish it on the main loop
+    (e.g. GLib.idle_add).
+
+    @ivar deliver: A function taking a function and an event, which arranges for the function to be called with the
+        event.
+    """
+
+    def __init__(
+            self,
+            bus: EventBus,
+            storage: SimpleFileSystemStorage,
+            deliver,
+            note_cache: CachingNoteRepository = None,
+            watcher_factory=create_watcher,
+    ):
+        """Constructor.
+
+        @param bus: The bus.
+        @param storage: The storage to watch.
+        @param deliver: See the class documentation.
+        @param note_cache: The cache to invalidate changed notes in, if any.
+        @param watcher_factory: A function taking a directory path and a callback, which returns a watcher. See
+            notebook.storage.watcher.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.bus = bus
+        self.storage = storage
+        self.deliver = deliver
+        self.note_cache = note_cache
+        self.watcher_factory = watcher_factory
+        self.watcher = None
+
+    def on_directories_changed(self, directory_paths, recursive: bool):
+        """Handles a report of the watcher. Called on the thread of the watcher."""
+        changes = self.storage.refresh_directories(directory_paths, recursive=recursive)
+        if not (changes.created or changes.modified or changes.deleted):
+            return
+
+        created_notes = []
+        for note_id in sorted(changes.created):
+            try:
+                created_notes.append(self.storage.get_note(note_id))
+            except NoteDoesNotExistError:
+                # Deleted again in the meantime. The next report will say so.
+                pass
+        if self.note_cache is not None:
+            for note_id in changes.modified | changes.deleted:
+                self.note_cache.invalidate_note(note_id)
+
+        event = NotebookChanged(
+            created_notes=created_notes,
+            modified_note_ids=sorted(changes.modified),
+            deleted_note_ids=sorted(changes.deleted))
+        self.log.debug(u'Notebook changed: {event}'.format(event=event))
+        self.deliver(self.bus.publish, event)
+
+    def start(self):
+        """Starts watching the notebook."""
+        if self.watcher is not None:
+            return
+        self.watcher = self.watcher_factory(self.storage.dir, self.on_directories_changed)
+        self.watcher.start()
+
+    def stop(self):
+        """Stops watching the notebook."""
+        if self.watcher is None:
+            return
+        self.watcher.stop()
+        self.watcher = None
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks that run without GTK.
+
+Run them from the src/main directory, e.g. python -m benchmark.bus
+"""
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""Runs the benchmark suite on a generated notebook and writes the results as JSON.
+
+Usage, from the src/main directory:
+
+    python -m benchmark --notes 10000 --output results.json
+    python -m benchmark --notes 10000 --compare results.json
+
+Every benchmark runs several times; the fastest run is reported, because it is the least disturbed by other activity
+on the machine. Benchmarks whose dependencies are missing (e.g. the markdown package) are skipped.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from application.bus import EventBus
+from application.note import NotebookLoaded, NoteService
+from notebook.dao.delayed_persist import DelayedPersistNoteRepository
+from notebook.dao.mem import InMemoryNoteRepository
+from notebook.dao.storage import StorageNoteRepository
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+from .generator import PAYLOAD_SIZE_DISTRIBUTIONS, generate_notebook
+
+RESULTS_VERSION = 1
+
+
+class _Suite(object):
+    """The benchmarks, which share one generated notebook.
+
+    Every benchmark method prepares its data, and returns a function to time and the number of operations that it
+    performs.
+    """
+
+    def __init__(self, temp_dir: str, note_ids, sample_size: int, seed: int):
+        self.temp_dir = temp_dir
+        self.notebook_dir = os.path.join(temp_dir, 'notebook')
+        self.index_path = os.path.join(temp_dir, 'index.json')
+        self.note_ids = note_ids
+        self.sample_note_ids = random.Random(seed).sample(note_ids, min(sample_size, len(note_ids)))
+        self._cold_index_count = 0
+
+    def _open_storage(self, index_path: str = None) -> SimpleFileSystemStorage:
+        return SimpleFileSystemStorage(self.notebook_dir, index_path=index_path or self.index_path)
+
+    def get_all_notes_cold(self):
+        """SimpleFileSystemStorage.get_all_notes() without a metadata index."""
+        self._cold_index_count += 1
+        storage = self._open_storage(os.path.join(self.temp_dir, 'cold-{n}.json'.format(n=self._cold_index_count)))
+        return lambda: list(storage.get_all_notes()), len(self.note_ids)
+
+    def get_all_notes_warm(self):
+        """SimpleFileSystemStorage.get_all_notes() with an up-to-date metadata index."""
+        storage = self._open_storage()
+        list(storage.get_all_notes())
+        storage = self._open_storage()
+        return lambda: list(storage.get_all_notes()), len(self.note_ids)
+
+    def get_note(self):
+        """StorageNoteRepository.get_note(), which loads the metadata and the payload."""
+        repository = StorageNoteRepository(self._open_storage())
+        return lambda: [repository.get_note(note_id) for note_id in self.sample_note_ids], len(self.sample_note_ids)
+
+    def persist(self):
+        """DelayedPersistNoteRepository.persist() of changed notes."""
+        storage_repository = StorageNoteRepository(self._open_storage())
+        repository = DelayedPersistNoteRepository(InMemoryNoteRepository(), storage_repository)
+        for note_id in self.sample_note_ids:
+            note = storage_repository.get_note(note_id)
+            note.insert_payload_text(len(note.payload), 'Changed at {time}.\n'.format(time=time.time()))
+            repository.add_or_update_note(note)
+        return repository.persist, len(self.sample_note_ids)
+
+    def load_notebook(self):
+        """NoteService.load_notebook(), including publishing NotebookLoaded on the bus."""
+        bus = EventBus()
+        loaded_notes = []
+        bus.subscribe(NotebookLoaded, lambda event: loaded_notes.extend(event.notes))
+        storage = self._open_storage()
+        list(storage.get_all_notes())
+        note_service = NoteService(
+            DelayedPersistNoteRepository(InMemoryNoteRepository(), StorageNoteRepository(storage)), bus)
+        return note_service.load_notebook, len(self.note_ids)
+
+    def render_markdown(self):
+        """Rendering payloads with a new BlockRenderer, so that no block is cached."""
+        from application.render import BlockRenderer
+        repository = StorageNoteRepository(self._open_storage())
+        payloads = [repository.get_note(note_id).payload for note_id in self.sample_note_ids]
+        renderer = BlockRenderer()
+        return lambda: [renderer.render(payload) for payload in payloads], len(payloads)
+
+    BENCHMARKS = ('get_all_notes_cold', 'get_all_notes_warm', 'get_note', 'persist', 'load_notebook',
+                  'render_markdown')
+
+
+def run(note_count: int, depth: int = 2, fan_out: int = 10, payload_size: int = 2000,
+        payload_size_distribution: str = 'lognormal', sample_size: int = 1000, repeat: int = 3, seed: int = 0,
+        benchmark_names=None):
+    """Runs the benchmark suite.
+
+    @param note_count: The number of notes in the generated notebook.
+    @param depth: See generate_notebook().
+    @param fan_out: See generate_notebook().
+    @param payload_size: See generate_notebook().
+    @param payload_size_distribution: See generate_notebook().
+    @param sample_size: The number of notes that the benchmarks of single notes use.
+    @param repeat: The number of runs of every benchmark.
+    @param seed: The seed for generating the notebook and choosing the sample.
+    @param benchmark_names: The names of the benchmarks to run, or None to run all of them.
+    @return: A dict that can be written as JSON.
+    """
+    parameters = {
+        'notes': note_count,
+        'depth': depth,
+        'fan_out': fan_out,
+        'payload_size': payload_size,
+        'payload_size_distribution': payload_size_distribution,
+        'sample_size': sample_size,
+        'repeat': repeat,
+        'seed': seed,
+    }
+    results = {}
+    temp_dir = tempfile.mkdtemp()
+    try:
+        note_ids = generate_notebook(
+            os.path.join(temp_dir, 'notebook'),
+            note_count,
+            depth=depth,
+            fan_out=fan_out,
+            payload_size=payload_size,
+            payload_size_distribution=payload_size_distribution,
+            seed=seed)
+        suite = _Suite(temp_dir, note_ids, sample_size, seed)
+        for name in benchmark_names or _Suite.BENCHMARKS:
+            durations = []
+            try:
+                for _ in range(repeat):
+                    function, operation_count = getattr(suite, name)()
+                    start = time.perf_counter()
+                    function()
+                    durations.append(time.perf_counter() - start)
+            except ImportError as e:
+                results[name] = {'skipped': str(e)}
+                continue
+            results[name] = {
+                'seconds': min(durations),
+                'runs': durations,
+                'operations': operation_count,
+            }
+    finally:
+        shutil.rmtree(temp_dir)
+
+    return {
+        'version': RESULTS_VERSION,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'parameters': parameters,
+        'results': results,
+    }
+
+
+def print_results(report: dict, baseline: dict = None):
+    """Prints the results as a table, with the change relative to a baseline report if one is given."""
+    baseline_results = baseline['results'] if baseline is not None else {}
+    for name, result in report['results'].items():
+        if 'skipped' in result:
+            print('{name:20s} skipped: {reason}'.format(name=name, reason=result['skipped']))
+            continue
+        line = '{name:20s} {seconds:10.4f} s {rate:12.0f} ops/s'.format(
+            name=name, seconds=result['seconds'], rate=result['operations'] / max(result['seconds'], 1e-9))
+        baseline_seconds = baseline_results.get(name, {}).get('seconds')
+        if baseline_seconds:
+            line += ' {change:+7.1%}'.format(change=result['seconds'] / baseline_seconds - 1)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=10000, help='the number of notes in the notebook')
+    parser.add_argument('--depth', type=int, default=2, help='the number of folder levels')
+    parser.add_argument('--fan-out', type=int, default=10, help='the number of subfolders per folder')
+    parser.add_argument('--payload-size', type=int, default=2000, help='the mean payload size in characters')
+    parser.add_argument('--payload-size-distribution', choices=PAYLOAD_SIZE_DISTRIBUTIONS, default='lognormal',
+                        help='the distribution of payload sizes')
+    parser.add_argument('--sample-size', type=int, default=1000,
+                        help='the number of notes used by the benchmarks of single notes')
+    parser.add_argument('--repeat', type=int, default=3, help='the number of runs of every benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the random number generator')
+    parser.add_argument('--benchmark', action='append', choices=_Suite.BENCHMARKS, dest='benchmarks',
+                        help='a benchmark to run; may be given more than once (default: all)')
+    parser.add_argument('--output', help='the file to write the results to as JSON')
+    parser.add_argument('--compare', help='a results file of an earlier run to compare with')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    report = run(
+        args.notes,
+        depth=args.depth,
+        fan_out=args.fan_out,
+        payload_size=args.payload_size,
+        payload_size_distribution=args.payload_size_distribution,
+        sample_size=args.sample_size,
+        repeat=args.repeat,
+        seed=args.seed,
+        benchmark_names=args.benchmarks)
+    print_results(report, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Compares the EventBus with the cyrusbus topic bus it replaced.
+
+The subscribers mimic the components of the application: on the topic bus, every component receives every event,
+formats a debug log line and runs an isinstance chain; on the EventBus, every component subscribes to the types it
+handles.
+"""
+
+import argparse
+import logging
+import time
+
+from application.bus import BusInstrumentation, EventBus
+from application.note import InsertNoteTextCommand, NoteOpened, OpenNoteCommand
+from notebook.aggregate import NoteCreated, NotePayloadTextInserted
+
+APPLICATION_TOPIC = 'application-events'
+
+# One entry per component: the event types it handles.
+COMPONENT_EVENT_TYPES = [
+    (OpenNoteCommand, InsertNoteTextCommand),  # NoteService
+    (NoteCreated,),  # NotebookTreeStore
+    (NoteOpened,),  # NotebookTreeViewHandler
+    (NoteOpened,),  # SourceHandler
+    (NoteOpened, NotePayloadTextInserted),  # WebViewHandler
+    (NoteOpened,),  # WindowTitleHandler
+    (),  # LayoutHandler
+]
+
+
+def create_events(count: int):
+    events = []
+    for i in range(count):
+        if i % 2 == 0:
+            events.append(InsertNoteTextCommand('note.md', i, 'x'))
+        else:
+            events.append(NotePayloadTextInserted('note.md', i, 'x'))
+    return events
+
+
+class TopicSubscriber(object):
+    def __init__(self, event_types):
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.event_types = event_types
+        self.handled_count = 0
+
+    def on_event(self, bus, event):
+        self.log.debug(u'Event received: {event}'.format(event=event))
+        for event_type in self.event_types:
+            if isinstance(event, event_type):
+                self.handled_count += 1
+                break
+        else:
+            self.log.debug(u'Unhandled event: {event}'.format(event=event))
+
+
+class TypedSubscriber(object):
+    def __init__(self):
+        self.handled_count = 0
+
+    def on_event(self, event):
+        self.handled_count += 1
+
+
+def benchmark_event_bus(events, batched: bool, instrumented: bool = False):
+    bus = EventBus()
+    if instrumented:
+        bus.enable_instrumentation(BusInstrumentation(slow_handler_threshold=float('inf')))
+    subscribers = []
+    for event_types in COMPONENT_EVENT_TYPES:
+        subscriber = TypedSubscriber()
+        subscribers.append(subscriber)
+        for event_type in event_types:
+            bus.subscribe(event_type, subscriber.on_event)
+    start = time.perf_counter()
+    if batched:
+        bus.publish_all(events)
+    else:
+        for event in events:
+            bus.publish(event)
+    return time.perf_counter() - start, sum(subscriber.handled_count for subscriber in subscribers)
+
+
+def benchmark_topic_bus(events):
+    import cyrusbus
+    bus = cyrusbus.bus.Bus()
+    subscribers = []
+    for event_types in COMPONENT_EVENT_TYPES:
+        subscriber = TopicSubscriber(event_types)
+        subscribers.append(subscriber)
+        bus.subscribe(APPLICATION_TOPIC, subscriber.on_event)
+    start = time.perf_counter()
+    for event in events:
+        bus.publish(APPLICATION_TOPIC, event)
+    return time.perf_counter() - start, sum(subscriber.handled_count for subscriber in subscribers)
+
+
+def run(event_count: int):
+    """Runs the benchmark.
+
+    @param event_count: The number of events to publish.
+    @return: A dict mapping the name of every variant to its duration in seconds. Variants whose dependencies are
+        missing are left out.
+    """
+    events = create_events(event_count)
+    results = {
+        'event_bus': benchmark_event_bus(events, batched=False)[0],
+        'event_bus_batched': benchmark_event_bus(events, batched=True)[0],
+        'event_bus_instrumented': benchmark_event_bus(events, batched=False, instrumented=True)[0],
+    }
+    try:
+        results['cyrusbus'] = benchmark_topic_bus(events)[0]
+    except ImportError:
+        pass
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100000, help='the number of events to publish')
+    args = parser.parse_args()
+
+    for name, duration in sorted(run(args.events).items()):
+        print('{name:24s} {duration:8.3f} s  {rate:10.0f} events/s'.format(
+            name=name, duration=duration, rate=args.events / duration))
+
+
+if __name__ == '__main__':
+    main()
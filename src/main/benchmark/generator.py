@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Generates synthetic notebooks for benchmarks.
+
+Usage, from the src/main directory:
+
+    python -m benchmark.generator NOTEBOOK_DIR --notes 10000 --depth 2 --fan-out 10
+"""
+
+import argparse
+import math
+import os
+import random
+
+__all__ = ['PAYLOAD_SIZE_DISTRIBUTIONS', 'generate_notebook']
+
+PAYLOAD_SIZE_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+
+_WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore '
+    'magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo '
+    'consequat'
+).split()
+
+
+def _get_folder_paths(depth: int, fan_out: int):
+    """Returns the paths of the folders at the given depth of a tree with fan_out subfolders per folder."""
+    folder_paths = ['']
+    for level in range(depth):
+        folder_paths = [
+            os.path.join(folder_path, 'Folder {level}-{i:03d}'.format(level=level, i=i))
+            for folder_path in folder_paths
+            for i in range(fan_out)
+        ]
+    return folder_paths
+
+
+def _get_payload_size(rng: random.Random, distribution: str, mean_size: int) -> int:
+    if distribution == 'fixed':
+        return mean_size
+    elif distribution == 'uniform':
+        return rng.randint(0, 2 * mean_size)
+    elif distribution == 'lognormal':
+        # Most notes are short and a few are very long, with the given mean.
+        sigma = 1.0
+        return int(rng.lognormvariate(math.log(max(mean_size, 1)) - sigma ** 2 / 2, sigma))
+    raise ValueError('Unknown payload size distribution {distribution}'.format(distribution=distribution))
+
+
+def _create_payload(rng: random.Random, title: str, size: int) -> str:
+    lines = ['# {title}'.format(title=title), '']
+    length = 0
+    while length < size:
+        paragraph = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(20, 80))).capitalize() + '.'
+        if rng.random() < 0.2:
+            paragraph = '\n'.join('* {word}'.format(word=word) for word in paragraph.split()[:rng.randint(2, 6)])
+        lines.extend([paragraph, ''])
+        length += len(paragraph) + 2
+    return '\n'.join(lines)[:max(size, len(lines[0]))] + '\n'
+
+
+def generate_notebook(
+        notebook_dir: str,
+        note_count: int,
+        depth: int = 2,
+        fan_out: int = 10,
+        payload_size: int = 2000,
+        payload_size_distribution: str = 'lognormal',
+        seed: int = 0,
+):
+    """Writes a notebook of Markdown notes, as SimpleFileSystemStorage reads it.
+
+    The notes are spread evenly over the folders at the deepest level of a folder tree. The same arguments always
+    generate the same notebook.
+
+    @param notebook_dir: The directory to write the notebook to. It is created if it does not exist.
+    @param note_count: The number of notes.
+    @param depth: The number of folder levels. With depth 0, all notes are in the notebook directory.
+    @param fan_out: The number of subfolders of every folder above the deepest level.
+    @param payload_size: The mean payload size, in characters.
+    @param payload_size_distribution: One of PAYLOAD_SIZE_DISTRIBUTIONS.
+    @param seed: The seed of the random number generator.
+    @return: The ids of the notes.
+    """
+    if payload_size_distribution not in PAYLOAD_SIZE_DISTRIBUTIONS:
+        raise ValueError('Unknown payload size distribution {distribution}'.format(
+            distribution=payload_size_distribution))
+    rng = random.Random(seed)
+    folder_paths = _get_folder_paths(depth, fan_out)
+    for folder_path in folder_paths:
+        os.makedirs(os.path.join(notebook_dir, folder_path), exist_ok=True)
+
+    note_ids = []
+    for i in range(note_count):
+        title = 'Note {i:07d}'.format(i=i)
+        note_id = os.path.join(folder_paths[i % len(folder_paths)], title + '.md')
+        size = _get_payload_size(rng, payload_size_distribution, payload_size)
+        with open(os.path.join(notebook_dir, note_id), 'w', encoding='utf-8') as f:
+            f.write(_create_payload(rng, title, size))
+        note_ids.append(note_id)
+    return note_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('notebook_dir', help='the directory to write the notebook to')
+    parser.add_argument('--notes', type=int, default=10000, help='the number of notes')
+    parser.add_argument('--depth', type=int, default=2, help='the number of folder levels')
+    parser.add_argument('--fan-out', type=int, default=10, help='the number of subfolders per folder')
+    parser.add_argument('--payload-size', type=int, default=2000, help='the mean payload size in characters')
+    parser.add_argument('--payload-size-distribution', choices=PAYLOAD_SIZE_DISTRIBUTIONS, default='lognormal',
+                        help='the distribution of payload sizes')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the random number generator')
+    args = parser.parse_args()
+
+    note_ids = generate_notebook(
+        args.notebook_dir,
+        args.notes,
+        depth=args.depth,
+        fan_out=args.fan_out,
+        payload_size=args.payload_size,
+        payload_size_distribution=args.payload_size_distribution,
+        seed=args.seed)
+    print('Generated {count} notes in {dir}'.format(count=len(note_ids), dir=args.notebook_dir))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Measures the memory used by the metadata of the notes in a notebook.
+
+Notes are created the way the storages create them, with FolderPath.from_string(). For comparison, the same notes are
+also created with plain objects that have a __dict__ and a fresh list of path elements per note, which is how notes
+were represented before. The numbers include the strings of the note ids and titles.
+"""
+
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+from notebook.aggregate import FolderPath, Note
+
+NOTES_PER_FOLDER = 100
+
+
+class _PlainFolderPath(object):
+    def __init__(self, elements):
+        self.elements = elements
+
+
+class _PlainNote(object):
+    def __init__(self, note_id, title, folder_path, payload=None):
+        self._title = title
+        self._note_id = note_id
+        self._folder_path = folder_path
+        self._payload = payload
+
+
+def _create_note(note_id: str) -> Note:
+    return Note(note_id, os.path.basename(note_id)[:-3], FolderPath.from_string(os.path.dirname(note_id)))
+
+
+def _create_plain_note(note_id: str) -> _PlainNote:
+    folder_path = os.path.dirname(note_id)
+    return _PlainNote(note_id, os.path.basename(note_id)[:-3], _PlainFolderPath(folder_path.split(os.sep)))
+
+
+def _generate_note_ids(note_count: int):
+    for i in range(note_count):
+        yield os.path.join(
+            'Notebook',
+            'Folder {f:05d}'.format(f=i // NOTES_PER_FOLDER),
+            'Note {i:07d}.md'.format(i=i))
+
+
+def measure(create_note, note_count: int):
+    """Creates note_count notes and returns a tuple (bytes per note, seconds).
+
+    The notes are created twice, because tracing allocations makes creating them much slower.
+    """
+    start = time.perf_counter()
+    notes = [create_note(note_id) for note_id in _generate_note_ids(note_count)]
+    duration = time.perf_counter() - start
+    del notes
+
+    gc.collect()
+    tracemalloc.start()
+    notes = [create_note(note_id) for note_id in _generate_note_ids(note_count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del notes
+    return size / note_count, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=1000000, help='the number of notes')
+    args = parser.parse_args()
+
+    for name, create_note in (('slotted', _create_note), ('plain', _create_plain_note)):
+        bytes_per_note, duration = measure(create_note, args.notes)
+        print('{name:8s} {bytes:8.1f} bytes per note {total:8.1f} MiB {duration:8.3f} s'.format(
+            name=name, bytes=bytes_per_note, total=bytes_per_note * args.notes / 2 ** 20, duration=duration))
+
+
+if __name__ == '__main__':
+    main()
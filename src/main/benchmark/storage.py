@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Compares SqliteStorage and LogStructuredStorage with SimpleFileSystemStorage.
+
+A notebook with the given number of notes is generated in a temporary directory and copied into the other storages.
+All storages then run the same operations.
+"""
+
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from notebook.storage.log import LogStructuredStorage
+from notebook.storage.migrate import migrate
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+from notebook.storage.sqlite import SqliteStorage
+
+NOTES_PER_FOLDER = 100
+
+
+def create_notebook(notebook_dir: str, note_count: int):
+    """Writes a notebook with note_count notes, in folders of NOTES_PER_FOLDER notes."""
+    for i in range(note_count):
+        folder_path = os.path.join(notebook_dir, 'Folder {f:04d}'.format(f=i // NOTES_PER_FOLDER))
+        if i % NOTES_PER_FOLDER == 0:
+            os.makedirs(folder_path)
+        with open(os.path.join(folder_path, 'Note {i:06d}.md'.format(i=i)), 'w', encoding='utf-8') as f:
+            f.write('# Note {i}\n\n{text}\n'.format(i=i, text='Lorem ipsum dolor sit amet. ' * 20))
+
+
+def copy_to_log_storage(source: SimpleFileSystemStorage, target: LogStructuredStorage):
+    for note in source.get_all_notes():
+        target.add_note(note)
+        with source.get_note_payload(note.note_id, 'main') as payload_file:
+            target.set_note_payload(note.note_id, 'main', payload_file)
+
+
+def _time(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def benchmark_storage(storage, note_ids, bulk: bool):
+    results = {}
+    results['get_all_notes'] = _time(lambda: list(storage.get_all_notes()))
+    results['has_note'] = _time(lambda: [storage.has_note(note_id) for note_id in note_ids])
+    results['get_note'] = _time(lambda: [storage.get_note(note_id) for note_id in note_ids])
+
+    def read_payloads():
+        for note_id in note_ids:
+            with storage.open_note_payload_buffer(note_id, 'main') as buffer:
+                bytes(buffer)
+
+    results['read_payloads'] = _time(read_payloads)
+    results['write_payloads'] = _time(lambda: [
+        storage.set_note_payload(note_id, 'main', io.BytesIO(b'changed ' + note_id.encode('utf-8')))
+        for note_id in note_ids
+    ])
+    if bulk:
+        results['write_payloads_bulk'] = _time(lambda: storage.set_note_payloads([
+            (note_id, 'main', b'changed again ' + note_id.encode('utf-8'))
+            for note_id in note_ids
+        ]))
+    return results
+
+
+def run(note_count: int):
+    """Runs the benchmark.
+
+    @param note_count: The number of notes in the generated notebook.
+    @return: A dict mapping storage names to dicts mapping operation names to durations in seconds.
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        notebook_dir = os.path.join(temp_dir, 'notebook')
+        create_notebook(notebook_dir, note_count)
+
+        simple_fs = SimpleFileSystemStorage(notebook_dir, index_path=os.path.join(temp_dir, 'index.json'))
+        note_ids = [note.note_id for note in simple_fs.get_all_notes()]
+        sqlite = SqliteStorage(os.path.join(temp_dir, 'notebook.sqlite'))
+        migration_duration = _time(lambda: migrate(simple_fs, sqlite))
+
+        log_dir = os.path.join(temp_dir, 'log')
+        log = LogStructuredStorage(log_dir)
+        log_copy_duration = _time(lambda: copy_to_log_storage(simple_fs, log))
+
+        results = {
+            'simple_fs': benchmark_storage(simple_fs, note_ids, bulk=False),
+            'sqlite': benchmark_storage(sqlite, note_ids, bulk=True),
+            'log': benchmark_storage(log, note_ids, bulk=False),
+        }
+        results['sqlite']['migrate'] = migration_duration
+        results['log']['migrate'] = log_copy_duration
+        results['log']['compact'] = _time(log.compact)
+        log.close()
+        results['log']['reopen'] = _time(lambda: LogStructuredStorage(log_dir).close())
+        sqlite.close()
+        simple_fs.close()
+        return results
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=10000, help='the number of notes in the notebook')
+    args = parser.parse_args()
+
+    for storage_name, storage_results in sorted(run(args.notes).items()):
+        for operation, duration in sorted(storage_results.items()):
+            print('{storage:10s} {operation:20s} {duration:8.3f} s'.format(
+                storage=storage_name, operation=operation, duration=duration))
+
+
+if __name__ == '__main__':
+    main()
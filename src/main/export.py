@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""Renders a notebook to static HTML, without GTK.
+
+Usage, from the src/main directory:
+
+    python export.py NOTEBOOK_DIR OUTPUT_DIR
+
+Every note is written to OUTPUT_DIR with the same relative path and the extension .html, and OUTPUT_DIR/index.html
+lists all notes. Only notes whose content changed since the previous export are rendered again.
+"""
+
+import argparse
+import html
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from application.render import create_markdown, render_markdown
+from notebook.storage import NoteDoesNotExistError
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+
+__all__ = [
+    'ExportResult',
+    'export_notebook',
+]
+
+# The version of the manifest and of the page layout. Changing it makes the next export render all notes again.
+EXPORT_VERSION = 1
+
+MANIFEST_FILE_NAME = '.wmsnotes-export.json'
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head><body>
+{html}
+</body></html>
+'''
+
+INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head><body>
+<h1>{title}</h1>
+<ul>
+{items}
+</ul>
+</body></html>
+'''
+
+ExportResult = namedtuple('ExportResult', ['rendered', 'unchanged', 'removed'])
+
+# The Markdown converter of a worker process.
+_markdown = None
+
+
+def _get_output_path(note_id: str) -> str:
+    return note_id[:-3] + '.html' if note_id.endswith('.md') else note_id + '.html'
+
+
+def _render_notes(notes):
+    """Renders a chunk of notes and writes their pages. Runs in a worker process.
+
+    @param notes: A list of tuples (note id, title, payload file path, output file path).
+    @return: A list of the ids of the notes that were rendered.
+    """
+    global _markdown
+    if _markdown is None:
+        _markdown = create_markdown()
+    note_ids = []
+    for note_id, title, payload_path, output_path in notes:
+        with open(payload_path, encoding='utf-8') as payload_file:
+            payload = payload_file.read()
+        page = PAGE_TEMPLATE.format(title=html.escape(title), html=render_markdown(payload, _markdown))
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        temporary_path = output_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as output_file:
+            output_file.write(page)
+        os.replace(temporary_path, output_path)
+        note_ids.append(note_id)
+    return note_ids
+
+
+def _load_manifest(path: str) -> dict:
+    """Returns the content hashes of the notes of the previous export, by note id."""
+    try:
+        with open(path, encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logging.getLogger(__name__).warning(u'Ignoring damaged manifest {path}'.format(path=path))
+        return {}
+    if manifest.get('version') != EXPORT_VERSION:
+        return {}
+    return manifest['notes']
+
+
+def _save_manifest(path: str, content_hashes: dict):
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump({'version': EXPORT_VERSION, 'notes': content_hashes}, manifest_file, sort_keys=True)
+    os.replace(temporary_path, path)
+
+
+def _write_index(output_dir: str, notes, title: str):
+    items = [
+        '<li><a href="{href}">{text}</a></li>'.format(
+            href=html.escape(_get_output_path(note.note_id).replace(os.sep, '/')),
+            text=html.escape('/'.join(note.folder_path.elements + (note.title,))))
+        for note in sorted(notes, key=lambda note: (note.folder_path.elements, note.title))
+    ]
+    with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as index_file:
+        index_file.write(INDEX_TEMPLATE.format(title=html.escape(title), items='\n'.join(items)))
+
+
+def export_notebook(
+        storage: SimpleFileSystemStorage,
+        output_dir: str,
+        processes: int = None,
+        chunk_size: int = 50,
+        force: bool = False,
+) -> ExportResult:
+    """Renders all notes of a notebook to HTML pages.
+
+    The content hashes of the exported notes are kept in a manifest in the output directory. A note is rendered again
+    if its content hash differs from the manifest or its page is missing. Pages of notes that no longer exist are
+    removed. The content hashes come from the metadata index of the storage, so unchanged notes are not read at all.
+
+    @param storage: The storage of the notebook.
+    @param output_dir: The directory to write the pages to. It is created if it does not exist.
+    @param processes: The number of worker processes, or None for one per CPU. With 1, notes are rendered in this
+        process.
+    @param chunk_size: The number of notes that are sent to a process at once.
+    @param force: Whether to render all notes, even if they have not changed. Pages of removed notes are removed
+        either way.
+    @return: An ExportResult with the numbers of rendered, unchanged and removed notes.
+    """
+    log = logging.getLogger(__name__)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+    previous_content_hashes = _load_manifest(manifest_path)
+
+    notes = []
+    content_hashes = {}  # type: dict[str, str]
+    pending_content_hashes = {}  # type: dict[str, str]
+    chunks = []
+    chunk = []
+    for note in storage.get_all_notes():
+        try:
+            content_hash = storage.get_note_payload_hash(note.note_id, 'main')
+        except NoteDoesNotExistError:
+            continue
+        notes.append(note)
+        output_path = os.path.join(output_dir, _get_output_path(note.note_id))
+        if not force and previous_content_hashes.get(note.note_id) == content_hash and os.path.exists(output_path):
+            content_hashes[note.note_id] = content_hash
+            continue
+        pending_content_hashes[note.note_id] = content_hash
+        chunk.append((note.note_id, note.title, os.path.join(storage.dir, note.note_id), output_path))
+        if len(chunk) >= chunk_size:
+            chunks.append(chunk)
+            chunk = []
+    if chunk:
+        chunks.append(chunk)
+    unchanged_count = len(content_hashes)
+
+    def record(rendered_chunks):
+        # A hash is only recorded once the page has been written, so an interrupted export is completed next time.
+        for rendered_note_ids in rendered_chunks:
+            for note_id in rendered_note_ids:
+                content_hashes[note_id] = pending_content_hashes[note_id]
+
+    try:
+        if processes == 1 or len(chunks) <= 1:
+            record(map(_render_notes, chunks))
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                record(executor.map(_render_notes, chunks))
+    finally:
+        _save_manifest(manifest_path, content_hashes)
+
+    removed_count = 0
+    for note_id in set(previous_content_hashes) - {note.note_id for note in notes}:
+        try:
+            os.remove(os.path.join(output_dir, _get_output_path(note_id)))
+            removed_count += 1
+        except FileNotFoundError:
+            pass
+    _write_index(output_dir, notes, os.path.basename(os.path.abspath(storage.dir)))
+
+    result = ExportResult(
+        rendered=len(content_hashes) - unchanged_count, unchanged=unchanged_count, removed=removed_count)
+    log.info(u'Exported {result}'.format(result=result))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('notebook_dir', help='the notebook directory')
+    parser.add_argument('output_dir', help='the directory to write the HTML pages to')
+    parser.add_argument('--processes', type=int, default=None, help='the number of worker processes')
+    parser.add_argument('--force', action='store_true', help='render all notes, even if they have not changed')
+    args = parser.parse_args()
+    if not os.path.isdir(args.notebook_dir):
+        parser.error('{dir} is not a directory'.format(dir=args.notebook_dir))
+
+    logging.basicConfig(format='%(asctime)s %(levelname)5s %(msg)s [%(name)s]', level=logging.INFO)
+    storage = SimpleFileSystemStorage(args.notebook_dir)
+    start = time.perf_counter()
+    try:
+        result = export_notebook(storage, args.output_dir, processes=args.processes, force=args.force)
+    finally:
+        storage.close()
+    print('Rendered {rendered} notes, {unchanged} unchanged, {removed} removed in {duration:.1f} s'.format(
+        duration=time.perf_counter() - start, **result._asdict()))
+
+
+if __name__ == '__main__':
+    main()
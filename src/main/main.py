@@ -2,11 +2,12 @@
 
 import logging
 import os
+import signal
 import sys
 
-import cyrusbus
 import gi
 
+from notebook.dao.cache import CachingNoteRepository
 from notebook.dao.delayed_persist import DelayedPersistNoteRepository
 from notebook.dao.mem import InMemoryNoteRepository
 from notebook.dao.storage import StorageNoteRepository
@@ -14,11 +15,17 @@ from notebook.dao.storage import StorageNoteRepository
 gi.require_version('Gtk', '3.0')
 gi.require_version('GtkSource', '3.0')
 gi.require_version('WebKit2', '3.0')
-from gi.repository import Gio, GObject, Gtk, GtkSource, WebKit2
+from gi.repository import Gio, GLib, GObject, Gtk, GtkSource, WebKit2
 
+from application.bus import EventBus
 from application.folder import FolderService
+from application.links import LinkService
 from application.note import NoteService
+from application.render_worker import RenderWorker
+from application.search import SearchService
 from application.settings import SettingsController, SettingsRepository
+from application.snapshot import StartupSnapshotService
+from application.watch import NotebookWatchService
 from notebook.storage.simple_fs import SimpleFileSystemStorage
 import ui.layout
 import ui.sourceview
@@ -43,13 +50,42 @@ class App(Gtk.Application):
                          flags=Gio.ApplicationFlags.FLAGS_NONE,
                          **kwargs)
         GObject.type_register(GtkSource.View)
-        self.bus = cyrusbus.bus.Bus()
+        self.bus = EventBus()
+        # Set WMSNOTES_BUS_METRICS to a file path to record bus metrics. They are written on SIGUSR1 and on shutdown.
+        self.bus_metrics_path = os.environ.get('WMSNOTES_BUS_METRICS')
+        if self.bus_metrics_path:
+            self.bus.enable_instrumentation()
+            GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR1, self.on_dump_bus_metrics)
         # self.note_repository = InMemoryNoteRepository()
+        self.notebook_storage = SimpleFileSystemStorage('resources/notebook')
+        self.note_cache = CachingNoteRepository(StorageNoteRepository(self.notebook_storage))
         self.note_repository = DelayedPersistNoteRepository(
             InMemoryNoteRepository(),
-            StorageNoteRepository(SimpleFileSystemStorage('resources/notebook')),
+            self.note_cache,
         )
+        self.note_repository.start_autosave()
         self.note_service = NoteService(self.note_repository, self.bus)
+        self.search_service = SearchService(
+            bus=self.bus,
+            note_repository=self.note_repository,
+            storage=self.notebook_storage,
+            index_path='resources/.notebook.wmsnotes-fulltext')
+        self.link_service = LinkService(
+            bus=self.bus,
+            note_repository=self.note_repository,
+            storage=self.notebook_storage)
+        self.snapshot_service = StartupSnapshotService(
+            bus=self.bus,
+            note_service=self.note_service,
+            storage=self.notebook_storage,
+            snapshot_path='resources/.notebook.wmsnotes-snapshot',
+            deliver=GLib.idle_add)
+        self.render_worker = RenderWorker(deliver=GLib.idle_add)
+        self.watch_service = NotebookWatchService(
+            bus=self.bus,
+            storage=self.notebook_storage,
+            deliver=GLib.idle_add,
+            note_cache=self.note_cache)
         self.settings_controller = SettingsController(SettingsRepository(os.path.expanduser('~/.wmsnotes.cfg')),
                                                       self.bus)
         self.builder = None  # type: Gtk.Builder
@@ -58,6 +94,19 @@ class App(Gtk.Application):
     #    def do_startup(self):
     #        super().do_startup()
 
+    def do_shutdown(self):
+        if self.bus.instrumentation is not None:
+            self.bus.instrumentation.dump(self.bus_metrics_path)
+        self.watch_service.stop()
+        self.snapshot_service.close()
+        self.settings_controller.close()
+        self.render_worker.stop()
+        self.note_repository.close()
+        self.search_service.close()
+        self.link_service.close()
+        self.notebook_storage.close()
+        Gtk.Application.do_shutdown(self)
+
     def do_activate(self):
         # We only allow a single window and raise any existing ones
         if not self.window:
@@ -110,7 +159,6 @@ class App(Gtk.Application):
         )
 
     def initialize_tree_view(self):
-        # TODO Refactor setup of search
         tree_store = ui.treeview.NotebookTreeStore(self.bus)
 
         tree_view = self.builder.get_object('tree_view')  # type: Gtk.TreeView
@@ -121,14 +169,12 @@ class App(Gtk.Application):
         tree_view.set_model(tree_store)
 
         tree_search_entry = self.builder.get_object('tree_search_entry')  # type: Gtk.SearchEntry
-        tree_view.set_enable_search(True)
-        tree_view.set_search_column(2)
-        tree_view.set_search_entry(tree_search_entry)
 
         ui.treeview.NotebookTreeViewHandler(
             bus=self.bus,
             tree_store=tree_store,
-            tree_view=tree_view)
+            tree_view=tree_view,
+            search_entry=tree_search_entry)
         ui.treeview.SaneExpandCollapseTreeViewHandler(tree_view=tree_view)
 
     def initialize_web_view(self):
@@ -137,11 +183,17 @@ class App(Gtk.Application):
         parent.add(webview)
         ui.webview.WebViewHandler(
             bus=self.bus,
-            web_view=webview)
+            web_view=webview,
+            render_worker=self.render_worker)
 
     def load(self):
         self.settings_controller.load_settings()
-        self.note_service.load_notebook()
+        # The watcher is started once the snapshot has been reconciled, so that changes are not reported twice.
+        self.snapshot_service.load_notebook(on_loaded=self.watch_service.start)
+
+    def on_dump_bus_metrics(self, *args):
+        self.bus.instrumentation.dump(self.bus_metrics_path)
+        return GLib.SOURCE_CONTINUE
 
     def on_button_clicked(self, *args, **kwargs):
         self.note_service.save()
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 
 __all__ = [
     'Note',
@@ -27,34 +28,105 @@ class NotePayloadChanged(object):
             **self.__dict__)
 
 
+class NotePayloadTextInserted(object):
+    def __init__(self, note_id: str, offset: int, text: str):
+        self.note_id = note_id
+        self.offset = offset
+        self.text = text
+
+    def apply_to(self, payload: str) -> str:
+        """Returns the payload with the inserted text."""
+        return payload[:self.offset] + self.text + payload[self.offset:]
+
+    def __repr__(self):
+        return '{cls}[{note_id}, offset={offset}, text length={len}]'.format(
+            cls=self.__class__.__name__,
+            len=len(self.text),
+            **self.__dict__)
+
+
+class NotePayloadTextDeleted(object):
+    def __init__(self, note_id: str, start_offset: int, end_offset: int):
+        self.note_id = note_id
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+
+    def apply_to(self, payload: str) -> str:
+        """Returns the payload without the deleted text."""
+        return payload[:self.start_offset] + payload[self.end_offset:]
+
+    def __repr__(self):
+        return '{cls}[{note_id}, start offset={start_offset}, end offset={end_offset}]'.format(
+            cls=self.__class__.__name__,
+            **self.__dict__)
+
+
 class FolderPath(object):
+    """The path of a folder in a notebook, as a tuple of path elements.
+
+    Folder paths are immutable and shared: constructing a folder path with the same elements as an existing one
+    returns the existing object, and the elements are interned strings. The thousands of notes in a folder therefore
+    refer to one object, and comparing or hashing a folder path is cheap. The table of folder paths is never pruned;
+    a notebook has far fewer folders than notes.
+
+    @ivar elements: The path elements, as a tuple of strings.
+    """
+
+    __slots__ = ('_elements', '_hash')
+
+    _folder_paths = {}  # type: dict[tuple, FolderPath]
+
     @staticmethod
     def from_string(string_path: str):
         if string_path is None:
-            return FolderPath([])
+            return FolderPath(())
         else:
             stripped_string_path = string_path.strip()
             if stripped_string_path == '':
-                return FolderPath([])
+                return FolderPath(())
             else:
                 return FolderPath(stripped_string_path.split(os.sep))
 
-    def __init__(self, elements):
-        self.elements = elements
+    def __new__(cls, elements=()):
+        """Returns the folder path with the given elements.
+
+        @param elements: An iterable of path elements.
+        """
+        elements = tuple(sys.intern(element) for element in elements)
+        folder_path = cls._folder_paths.get(elements)
+        if folder_path is None:
+            folder_path = super().__new__(cls)
+            object.__setattr__(folder_path, '_elements', elements)
+            object.__setattr__(folder_path, '_hash', hash(elements))
+            folder_path = cls._folder_paths.setdefault(elements, folder_path)
+        return folder_path
+
+    @property
+    def elements(self):
+        return self._elements
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{cls} is immutable'.format(cls=self.__class__.__name__))
+
+    def __reduce__(self):
+        return self.__class__, (self._elements,)
 
     def __eq__(self, other):
         return \
+            self is other or \
             isinstance(other, self.__class__) and \
-            self.elements == other.elements
+            self._elements == other._elements
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def __hash__(self):
+        return self._hash
+
     def __repr__(self):
         return '{cls}[{path}]'.format(
             cls=self.__class__.__name__,
-            path='/'.join(self.elements),
-            **self.__dict__
+            path='/'.join(self._elements)
         )
 
 
@@ -65,8 +137,15 @@ class Note(object):
     @ivar title: The title of the note.
     @ivar folder_path: The path of the note's folder.
     @ivar payload: The payload of the note.
+
+    The events returned by the methods that change the note are also recorded on the note, until a repository that
+    stores events (see notebook.dao.event_store) has written them and marks them as committed.
+
+    Notes are slotted, because a notebook can have a very large number of them.
     """
 
+    __slots__ = ('_note_id', '_title', '_folder_path', '_payload', '_uncommitted_events')
+
     def __init__(
             self,
             note_id: str,
@@ -85,9 +164,49 @@ class Note(object):
         self._note_id = note_id
         self._folder_path = folder_path
         self._payload = payload
+        # Created when the first event is recorded.
+        self._uncommitted_events = None  # type: list
 
     def create(self) -> NoteCreated:
-        return NoteCreated(self)
+        return self._record(NoteCreated(self))
+
+    def _record(self, event):
+        if self._uncommitted_events is None:
+            self._uncommitted_events = []
+        self._uncommitted_events.append(event)
+        return event
+
+    @property
+    def uncommitted_events(self):
+        """The events that have not been committed yet, oldest first."""
+        return list(self._uncommitted_events) if self._uncommitted_events is not None else []
+
+    def mark_events_committed(self, count: int):
+        """Forgets the oldest uncommitted events.
+
+        @param count: The number of events that have been committed. Events that were recorded in the meantime are
+            kept.
+        """
+        if self._uncommitted_events is not None:
+            del self._uncommitted_events[:count]
+
+    def apply(self, event):
+        """Changes the note as described by an event, without recording the event. Used to rebuild a note from its
+        history.
+
+        @param event: A NoteCreated, NotePayloadChanged, NotePayloadTextInserted or NotePayloadTextDeleted event.
+        @raise ValueError: If the event is of an unknown type.
+        """
+        if isinstance(event, NoteCreated):
+            self._note_id = event.note.note_id
+            self._title = event.note.title
+            self._folder_path = event.note.folder_path
+        elif isinstance(event, NotePayloadChanged):
+            self._payload = event.new_payload
+        elif isinstance(event, (NotePayloadTextInserted, NotePayloadTextDeleted)):
+            self._payload = event.apply_to(self._payload if self._payload is not None else '')
+        else:
+            raise ValueError('Cannot apply {event}'.format(event=event))
 
     @property
     def note_id(self):
@@ -115,11 +234,42 @@ class Note(object):
 
     def set_payload(self, payload) -> NotePayloadChanged:
         self._payload = payload
-        return NotePayloadChanged(self.note_id, payload)
+        return self._record(NotePayloadChanged(self.note_id, payload))
+
+    def insert_payload_text(self, offset: int, text: str) -> NotePayloadTextInserted:
+        """Inserts text into the payload.
+
+        @param offset: The character offset at which the text is inserted.
+        @param text: The text to insert.
+        @raise ValueError: If the offset is outside the payload.
+        """
+        payload = self._payload if self._payload is not None else ''
+        if not 0 <= offset <= len(payload):
+            raise ValueError('Offset {offset} outside payload of length {len}'.format(offset=offset, len=len(payload)))
+        event = NotePayloadTextInserted(self.note_id, offset, text)
+        self._payload = event.apply_to(payload)
+        return self._record(event)
+
+    def delete_payload_text(self, start_offset: int, end_offset: int) -> NotePayloadTextDeleted:
+        """Deletes a range of text from the payload.
+
+        @param start_offset: The character offset of the start of the range.
+        @param end_offset: The character offset of the end of the range (exclusive).
+        @raise ValueError: If the range is outside the payload.
+        """
+        payload = self._payload if self._payload is not None else ''
+        if not 0 <= start_offset <= end_offset <= len(payload):
+            raise ValueError('Range {start}-{end} outside payload of length {len}'.format(
+                start=start_offset, end=end_offset, len=len(payload)))
+        event = NotePayloadTextDeleted(self.note_id, start_offset, end_offset)
+        self._payload = event.apply_to(payload)
+        return self._record(event)
 
     def __repr__(self):
-        return '{cls}[id={_note_id}, folder={_folder_path}, title={_title}, payload={payload_length}]'.format(
+        return '{cls}[id={note_id}, folder={folder_path}, title={title}, payload={payload_length}]'.format(
             cls=self.__class__.__name__,
-            payload_length=len(self.payload) if self.payload is not None else 'N/A',
-            **self.__dict__
+            note_id=self._note_id,
+            folder_path=self._folder_path,
+            title=self._title,
+            payload_length=len(self.payload) if self.payload is not None else 'N/A'
         )
@@ -31,6 +31,18 @@ class NoteRepository(object):
         """
         raise NotImplementedError(self.get_note.__name__)
 
+    def get_note_payload(self, note_id) -> str:
+        """Loads the payload of a note.
+
+        Repositories that can load a payload without the rest of the note should override this.
+
+        @param note_id: The id of the note.
+        @return: The payload.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        @raise IOError: If the payload cannot be read.
+        """
+        return self.get_note(note_id).payload
+
     def has_note(self, note_id) -> bool:
         """Returns whether a note exists within the notebook.
 
@@ -38,3 +50,11 @@ class NoteRepository(object):
         @return Whether a note exists within the notebook.
         """
         raise NotImplementedError(self.has_note.__name__)
+
+    def remove_note(self, note_id):
+        """Removes a note from the repository.
+
+        @param note_id: The id of the note.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        """
+        raise NotImplementedError(self.remove_note.__name__)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import sys
+import threading
+from collections import OrderedDict
+
+from notebook.aggregate import Note
+from notebook.dao import NoteRepository
+
+
+class CachingNoteRepository(NoteRepository):
+    """Caches the notes of a storage repository in memory.
+
+    The metadata of all notes that have been seen is kept. Payloads are loaded on first access and kept in a least
+    recently used cache with a byte budget. The cache only holds clean payloads: writes go straight through to the
+    storage repository. Dirty notes are meant to be kept in front of this repository (see
+    DelayedPersistNoteRepository), which pins them until they have been persisted.
+
+    Every call to get_note() returns a new Note object, so evicting a payload never affects a note that is in use.
+
+    @ivar max_payload_bytes: The maximum number of bytes of payloads in the cache.
+    """
+
+    def __init__(self, repository: NoteRepository, max_payload_bytes: int = 64 * 1024 * 1024):
+        """Constructor.
+
+        @param repository: The repository to load notes from and to write them to.
+        @param max_payload_bytes: See the class documentation.
+        """
+        self.repository = repository
+        self.max_payload_bytes = max_payload_bytes
+        self._notes = {}  # type: dict[str, Note]
+        self._payloads = OrderedDict()  # type: dict[str, str]
+        self._payload_bytes = 0
+        self._hit_count = 0
+        self._miss_count = 0
+        self._eviction_count = 0
+        self._lock = threading.RLock()
+
+    def add_or_update_note(self, note: Note):
+        self.repository.add_or_update_note(note)
+        with self._lock:
+            self._notes[note.note_id] = self._copy_note(note, None)
+            self._cache_payload(note.note_id, note.payload)
+
+    def _cache_payload(self, note_id: str, payload: str):
+        self._uncache_payload(note_id)
+        if payload is None:
+            return
+        self._payloads[note_id] = payload
+        self._payload_bytes += sys.getsizeof(payload)
+        while self._payload_bytes > self.max_payload_bytes and self._payloads:
+            self._uncache_payload(next(iter(self._payloads)))
+            self._eviction_count += 1
+
+    @staticmethod
+    def _copy_note(note: Note, payload: str) -> Note:
+        return Note(
+            note_id=note.note_id,
+            title=note.title,
+            folder_path=note.folder_path,
+            payload=payload)
+
+    def get_all_notes(self):
+        for note in self.repository.get_all_notes():
+            with self._lock:
+                self._notes[note.note_id] = self._copy_note(note, None)
+            yield note
+
+    def get_note(self, note_id) -> Note:
+        with self._lock:
+            note = self._notes.get(note_id)
+            payload = self._payloads.get(note_id)
+            if payload is not None:
+                self._payloads.move_to_end(note_id)
+                self._hit_count += 1
+                return self._copy_note(note, payload)
+            self._miss_count += 1
+
+        if note is None:
+            note = self.repository.get_note(note_id)
+            payload = note.payload
+        else:
+            payload = self.repository.get_note_payload(note_id)
+        with self._lock:
+            self._notes[note_id] = self._copy_note(note, None)
+            self._cache_payload(note_id, payload)
+        return self._copy_note(note, payload)
+
+    def get_statistics(self) -> dict:
+        """Returns the counters of the cache, to help choosing the byte budget."""
+        with self._lock:
+            return {
+                'hits': self._hit_count,
+                'misses': self._miss_count,
+                'evictions': self._eviction_count,
+                'cached_payloads': len(self._payloads),
+                'cached_payload_bytes': self._payload_bytes,
+                'max_payload_bytes': self.max_payload_bytes,
+            }
+
+    def has_note(self, note_id) -> bool:
+        with self._lock:
+            if note_id in self._notes:
+                return True
+        return self.repository.has_note(note_id)
+
+    def invalidate_note(self, note_id):
+        """Forgets the cached metadata and payload of a note, e.g. because it was changed outside the application."""
+        with self._lock:
+            self._notes.pop(note_id, None)
+            self._uncache_payload(note_id)
+
+    def remove_note(self, note_id):
+        self.repository.remove_note(note_id)
+        self.invalidate_note(note_id)
+
+    def _uncache_payload(self, note_id: str):
+        payload = self._payloads.pop(note_id, None)
+        if payload is not None:
+            self._payload_bytes -= sys.getsizeof(payload)
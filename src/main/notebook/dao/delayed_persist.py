@@ -1,21 +1,51 @@
 # -*- coding: utf-8 -*-
+import logging
+import threading
+
 from notebook.aggregate import Note
 from notebook.dao import NoteRepository
 
 
 class DelayedPersistNoteRepository(NoteRepository):
-    """TODO
+    """Keeps changes to notes in a first repository and writes them to a second repository later.
+
+    Notes that are added or updated are marked dirty. Persisting writes only the dirty notes, and a note that is
+    updated many times before it is persisted is written once. Persisting can be done by a background thread, see
+    start_autosave(). Once a note has been persisted, it is removed from the first repository, so that only dirty
+    notes are kept there.
+
+    @ivar flush_interval: The number of seconds between two automatic persists.
+    @ivar max_batch_size: The maximum number of notes that is written while holding the persist lock.
     """
 
-    def __init__(self, repository1: NoteRepository, repository2: NoteRepository):
+    def __init__(
+            self,
+            repository1: NoteRepository,
+            repository2: NoteRepository,
+            flush_interval: float = 5.0,
+            max_batch_size: int = 50,
+    ):
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
         self.repository1 = repository1
         self.repository2 = repository2
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
         self.note_ids_added_or_updated = set()
         self.note_ids_deleted = set()
+        self._lock = threading.RLock()
+        self._persist_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._autosave_thread = None
 
     def add_or_update_note(self, note: Note):
-        self.repository1.add_or_update_note(note)
-        self.note_ids_added_or_updated.add(note.note_id)
+        with self._lock:
+            self.repository1.add_or_update_note(note)
+            self.note_ids_added_or_updated.add(note.note_id)
+
+    def close(self):
+        """Stops autosaving and persists all dirty notes."""
+        self.stop_autosave()
+        self.persist()
 
     def get_all_notes(self):
         notes1_ids = set()
@@ -27,15 +57,89 @@ class DelayedPersistNoteRepository(NoteRepository):
                 yield note
 
     def get_note(self, note_id) -> Note:
-        if self.repository1.has_note(note_id):
-            return self.repository1.get_note(note_id)
-        else:
-            return self.repository2.get_note(note_id)
+        with self._lock:
+            if self.repository1.has_note(note_id):
+                return self.repository1.get_note(note_id)
+        return self.repository2.get_note(note_id)
 
     def has_note(self, note_id) -> bool:
-        return self.repository1.has_note(note_id) or \
-               self.repository2.has_note(note_id)
+        with self._lock:
+            if self.repository1.has_note(note_id):
+                return True
+        return self.repository2.has_note(note_id)
+
+    def is_dirty(self, note_id=None) -> bool:
+        """Returns whether there are notes that have not been persisted.
+
+        @param note_id: The id of a note to check, or None to check all notes.
+        """
+        with self._lock:
+            if note_id is not None:
+                return note_id in self.note_ids_added_or_updated
+            return len(self.note_ids_added_or_updated) > 0
 
     def persist(self):
-        for note in self.repository1.get_all_notes():
-            self.repository2.add_or_update_note(note)
+        """Writes all dirty notes to the second repository.
+
+        @return: The number of notes written.
+        @raise IOError: If a note cannot be written. The notes that were not written remain dirty.
+        """
+        written_count = 0
+        while True:
+            batch_written_count = self._persist_batch()
+            if batch_written_count == 0:
+                return written_count
+            written_count += batch_written_count
+
+    def _persist_batch(self):
+        """Writes at most max_batch_size dirty notes to the second repository.
+
+        The notes are marked clean before they are written, so that a note that is updated while it is being written
+        is marked dirty again.
+
+        @return: The number of notes written.
+        """
+        with self._persist_lock:
+            with self._lock:
+                notes = []
+                while self.note_ids_added_or_updated and len(notes) < self.max_batch_size:
+                    notes.append(self.repository1.get_note(self.note_ids_added_or_updated.pop()))
+
+            written_count = 0
+            try:
+                for note in notes:
+                    self.repository2.add_or_update_note(note)
+                    written_count += 1
+            finally:
+                with self._lock:
+                    for note in notes[:written_count]:
+                        if note.note_id not in self.note_ids_added_or_updated:
+                            self.repository1.remove_note(note.note_id)
+                    self.note_ids_added_or_updated.update(note.note_id for note in notes[written_count:])
+        if written_count > 0:
+            self.log.debug(u'Persisted {count} notes'.format(count=written_count))
+        return written_count
+
+    def start_autosave(self):
+        """Starts a background thread that persists dirty notes every flush_interval seconds."""
+        if self._autosave_thread is not None:
+            return
+        self._stop_event.clear()
+        self._autosave_thread = threading.Thread(target=self._autosave, name='autosave', daemon=True)
+        self._autosave_thread.start()
+
+    def stop_autosave(self):
+        """Stops the autosave thread, waiting for a running persist to finish."""
+        if self._autosave_thread is None:
+            return
+        self._stop_event.set()
+        self._autosave_thread.join()
+        self._autosave_thread = None
+
+    def _autosave(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                while not self._stop_event.is_set() and self._persist_batch() > 0:
+                    pass
+            except Exception:
+                self.log.exception(u'Autosave failed')
@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+"""An event-sourced note repository."""
+
+import json
+import logging
+import os
+import threading
+
+from notebook.aggregate import FolderPath, Note, NoteCreated, NotePayloadChanged, NotePayloadTextDeleted, \
+    NotePayloadTextInserted
+from notebook.dao import NoteRepository
+from notebook.storage import NoteDoesNotExistError, ParseError
+
+__all__ = ['EventSourcedNoteRepository']
+
+CHECKPOINT_VERSION = 1
+
+EVENTS_FILE_NAME = 'events.jsonl'
+SNAPSHOTS_FILE_NAME = 'snapshots.jsonl'
+CHECKPOINT_FILE_NAME = 'checkpoint.json'
+
+# The type of the event log record of a removed note. The aggregate has no event for this, so the record is only
+# known to the repository.
+_NOTE_DELETED_TYPE = 'NoteDeleted'
+
+
+def _serialize_event(event) -> dict:
+    if isinstance(event, NoteCreated):
+        # The note of the event is the live aggregate, so only what cannot change afterwards is stored. The payload
+        # is set by the events that follow.
+        return {
+            'type': 'NoteCreated',
+            'note_id': event.note.note_id,
+            'title': event.note.title,
+            'folder_path': list(event.note.folder_path.elements),
+        }
+    elif isinstance(event, NotePayloadChanged):
+        return {'type': 'NotePayloadChanged', 'note_id': event.note_id, 'payload': event.new_payload}
+    elif isinstance(event, NotePayloadTextInserted):
+        return {'type': 'NotePayloadTextInserted', 'note_id': event.note_id, 'offset': event.offset, 'text': event.text}
+    elif isinstance(event, NotePayloadTextDeleted):
+        return {
+            'type': 'NotePayloadTextDeleted',
+            'note_id': event.note_id,
+            'start_offset': event.start_offset,
+            'end_offset': event.end_offset,
+        }
+    raise ValueError('Cannot store {event}'.format(event=event))
+
+
+def _deserialize_event(data: dict):
+    event_type = data.get('type')
+    if event_type == 'NoteCreated':
+        return NoteCreated(Note(data['note_id'], data['title'], FolderPath(data['folder_path'])))
+    elif event_type == 'NotePayloadChanged':
+        return NotePayloadChanged(data['note_id'], data['payload'])
+    elif event_type == 'NotePayloadTextInserted':
+        return NotePayloadTextInserted(data['note_id'], data['offset'], data['text'])
+    elif event_type == 'NotePayloadTextDeleted':
+        return NotePayloadTextDeleted(data['note_id'], data['start_offset'], data['end_offset'])
+    raise ParseError('Unknown event type {type}'.format(type=event_type))
+
+
+def _encode_line(data: dict) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class _NoteEntry(object):
+    """What the repository keeps in memory about a note.
+
+    @ivar event_offsets: The offsets of all events of the note in the event log, oldest first. The version of the note
+        is the number of events.
+    @ivar snapshot_version: The version of the latest snapshot, or 0 if there is none.
+    @ivar snapshot_offset: The offset of the latest snapshot in the snapshot log, or None if there is none.
+    """
+
+    def __init__(self, note_id: str, title: str, folder_path: FolderPath):
+        self.note_id = note_id
+        self.title = title
+        self.folder_path = folder_path
+        self.event_offsets = []  # type: list[int]
+        self.snapshot_version = 0
+        self.snapshot_offset = None  # type: int
+
+
+class EventSourcedNoteRepository(NoteRepository):
+    """Stores the events of notes instead of their current state.
+
+    Every event that a Note records (see Note.uncommitted_events) is appended to an event log when the note is added
+    or updated, as a line of JSON. Every snapshot_interval events of a note, the state of the note is appended to a
+    snapshot log, so loading a note replays at most snapshot_interval events on top of its latest snapshot. Notes that
+    do not carry events are compared with their stored state, and a NotePayloadChanged event is stored if their
+    payload differs. So are notes whose events do not start from their stored state (e.g. a note that was loaded
+    from a storage and then edited).
+
+    The metadata of all notes and the positions of their events and latest snapshot are kept in memory. On close(),
+    they are written to a checkpoint file, so that opening the repository only reads the part of the logs written
+    after the checkpoint. Both logs are only ever appended to; if the last line of a log was torn by a crash, it is
+    cut off.
+
+    Removing a note appends a record of the removal to the event log and forgets the events of the note. A note that
+    is added again with the same id starts at version 1.
+
+    The repository can be used from several threads.
+
+    @ivar path: The directory of the logs.
+    @ivar snapshot_interval: The number of events of a note after which a snapshot is written.
+    @ivar sync_writes: Whether every write is flushed to disk with fsync().
+    """
+
+    def __init__(self, path: str, snapshot_interval: int = 100, sync_writes: bool = False):
+        """Constructor.
+
+        @param path: See the class documentation. The directory is created if it does not exist.
+        @param snapshot_interval: See the class documentation.
+        @param sync_writes: See the class documentation.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.sync_writes = sync_writes
+
+        self.log.debug(u'path={0}'.format(self.path))
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._entries = {}  # type: dict[str, _NoteEntry]
+        self._load()
+        self._events_file = open(os.path.join(path, EVENTS_FILE_NAME), 'ab')
+        self._snapshots_file = open(os.path.join(path, SNAPSHOTS_FILE_NAME), 'ab')
+        self._events_reader = open(os.path.join(path, EVENTS_FILE_NAME), 'rb')
+        self._snapshots_reader = open(os.path.join(path, SNAPSHOTS_FILE_NAME), 'rb')
+
+    def _load(self):
+        events_start, snapshots_start = self._read_checkpoint()
+        self._scan_log(EVENTS_FILE_NAME, events_start, self._load_event)
+        self._scan_log(SNAPSHOTS_FILE_NAME, snapshots_start, self._load_snapshot)
+
+    def _read_checkpoint(self):
+        """Restores the entries from the checkpoint file.
+
+        @return: A tuple (event log offset, snapshot log offset) at which the logs must be scanned.
+        """
+        checkpoint_path = os.path.join(self.path, CHECKPOINT_FILE_NAME)
+        try:
+            with open(checkpoint_path, 'rb') as checkpoint_file:
+                checkpoint = json.loads(checkpoint_file.read().decode('utf-8'))
+        except FileNotFoundError:
+            return 0, 0
+        except (OSError, ValueError) as e:
+            self.log.warning(u'Ignoring unreadable checkpoint {path}: {e}'.format(path=checkpoint_path, e=e))
+            return 0, 0
+
+        events_size = checkpoint.get('events_size', 0)
+        snapshots_size = checkpoint.get('snapshots_size', 0)
+        if checkpoint.get('version') != CHECKPOINT_VERSION \
+                or events_size > self._get_log_size(EVENTS_FILE_NAME) \
+                or snapshots_size > self._get_log_size(SNAPSHOTS_FILE_NAME):
+            self.log.warning(u'Ignoring outdated checkpoint {path}'.format(path=checkpoint_path))
+            return 0, 0
+
+        for note_id, title, folder_path, snapshot_version, snapshot_offset, event_offsets in checkpoint['notes']:
+            entry = _NoteEntry(note_id, title, FolderPath(folder_path))
+            entry.snapshot_version = snapshot_version
+            entry.snapshot_offset = snapshot_offset
+            entry.event_offsets = event_offsets
+            self._entries[note_id] = entry
+        return events_size, snapshots_size
+
+    def _get_log_size(self, file_name: str) -> int:
+        try:
+            return os.path.getsize(os.path.join(self.path, file_name))
+        except FileNotFoundError:
+            return 0
+
+    def _scan_log(self, file_name: str, start_offset: int, load_record):
+        """Reads the lines of a log from an offset on, and cuts off a torn last line."""
+        log_path = os.path.join(self.path, file_name)
+        if not os.path.exists(log_path):
+            return
+        with open(log_path, 'r+b') as log_file:
+            log_file.seek(start_offset)
+            offset = start_offset
+            for line in log_file:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('Incomplete line')
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    self.log.warning(u'Cutting off torn record at offset {offset} of {path}'.format(
+                        offset=offset, path=log_path))
+                    log_file.truncate(offset)
+                    return
+                load_record(offset, record)
+                offset += len(line)
+
+    def _load_event(self, offset: int, record: dict):
+        event = record['event']
+        if event['type'] == _NOTE_DELETED_TYPE:
+            self._entries.pop(event['note_id'], None)
+            return
+        entry = self._entries.get(event['note_id'])
+        if entry is None:
+            if event['type'] != 'NoteCreated':
+                raise ParseError('Event at offset {offset} of a note that was not created'.format(offset=offset))
+            entry = _NoteEntry(event['note_id'], event['title'], FolderPath(event['folder_path']))
+            self._entries[entry.note_id] = entry
+        entry.event_offsets.append(offset)
+
+    def _load_snapshot(self, offset: int, record: dict):
+        entry = self._entries.get(record['note_id'])
+        version = record['version']
+        # A snapshot can be ahead of the event log if the end of the event log was lost.
+        if entry is None or not entry.snapshot_version < version <= len(entry.event_offsets):
+            return
+        # A snapshot can also belong to a removed note with the same id, which the offset of its last event tells.
+        if record.get('event_offset', entry.event_offsets[version - 1]) != entry.event_offsets[version - 1]:
+            return
+        entry.snapshot_version = version
+        entry.snapshot_offset = offset
+
+    def _read_line(self, reader, offset: int) -> dict:
+        reader.seek(offset)
+        return json.loads(reader.readline().decode('utf-8'))
+
+    def _replay(self, entry: _NoteEntry) -> Note:
+        if entry.snapshot_offset is None:
+            note = Note(entry.note_id, entry.title, entry.folder_path)
+        else:
+            snapshot = self._read_line(self._snapshots_reader, entry.snapshot_offset)
+            note = Note(entry.note_id, snapshot['title'], FolderPath(snapshot['folder_path']), snapshot['payload'])
+        for offset in entry.event_offsets[entry.snapshot_version:]:
+            note.apply(_deserialize_event(self._read_line(self._events_reader, offset)['event']))
+        return note
+
+    def _append(self, log_file, records) -> list:
+        """Appends records to a log and returns their offsets."""
+        offsets = []
+        offset = log_file.tell()
+        for record in records:
+            line = _encode_line(record)
+            log_file.write(line)
+            offsets.append(offset)
+            offset += len(line)
+        log_file.flush()
+        if self.sync_writes:
+            os.fsync(log_file.fileno())
+        return offsets
+
+    def _get_new_events(self, note: Note, entry: _NoteEntry, note_events: list) -> list:
+        """Returns the events to append for a note.
+
+        The uncommitted events of the note are only stored if replaying them on the stored state gives the current
+        payload. A note that is new to the repository must start with its NoteCreated event for that. Otherwise, e.g.
+        for a note that was loaded from a storage and then edited, the text deltas are based on a payload that the
+        repository does not have, and a NotePayloadChanged event with the current payload is stored instead.
+        """
+        if entry is None:
+            if note_events and isinstance(note_events[0], NoteCreated):
+                stored_note = Note(note.note_id, note.title, note.folder_path)
+            else:
+                stored_note = None
+        else:
+            stored_note = self._replay(entry)
+        if stored_note is not None:
+            for event in note_events:
+                stored_note.apply(event)
+            if stored_note.payload == note.payload:
+                return note_events
+        events = [NoteCreated(note)] if entry is None else []
+        if note.payload is not None:
+            events.append(NotePayloadChanged(note.note_id, note.payload))
+        return events
+
+    def add_or_update_note(self, note: Note):
+        """Appends the uncommitted events of a note to the event log and marks them as committed.
+
+        @param note: The note.
+        """
+        note_events = note.uncommitted_events
+        with self._lock:
+            entry = self._entries.get(note.note_id)
+            events = self._get_new_events(note, entry, note_events)
+            if events:
+                offsets = self._append(self._events_file, [
+                    {'version': version, 'event': _serialize_event(event)}
+                    for version, event in enumerate(events, len(entry.event_offsets) + 1 if entry else 1)
+                ])
+                if entry is None:
+                    entry = _NoteEntry(note.note_id, note.title, note.folder_path)
+                    self._entries[note.note_id] = entry
+                entry.event_offsets.extend(offsets)
+                if len(entry.event_offsets) - entry.snapshot_version >= self.snapshot_interval:
+                    self._write_snapshot(entry)
+        note.mark_events_committed(len(note_events))
+
+    def _write_snapshot(self, entry: _NoteEntry):
+        note = self._replay(entry)
+        version = len(entry.event_offsets)
+        entry.snapshot_offset, = self._append(self._snapshots_file, [{
+            'note_id': note.note_id,
+            'version': version,
+            'event_offset': entry.event_offsets[-1],
+            'title': note.title,
+            'folder_path': list(note.folder_path.elements),
+            'payload': note.payload,
+        }])
+        entry.snapshot_version = version
+
+    def get_all_notes(self):
+        """Loads the metadata of all notes, without replaying their events.
+
+        @return: An iterable returning Note objects without payloads.
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+        for entry in entries:
+            yield Note(entry.note_id, entry.title, entry.folder_path)
+
+    def get_note(self, note_id) -> Note:
+        """Loads a note by replaying its events since its latest snapshot.
+
+        @param note_id: The id of the note.
+        @return: A Note with its payload.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        """
+        with self._lock:
+            entry = self._entries.get(note_id)
+            if entry is None:
+                raise NoteDoesNotExistError(note_id)
+            return self._replay(entry)
+
+    def get_note_payload(self, note_id) -> str:
+        """Loads the payload of a note by replaying its events since its latest snapshot.
+
+        @param note_id: The id of the note.
+        @return: The payload.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        """
+        return self.get_note(note_id).payload
+
+    def get_note_history(self, note_id, since_version: int = 0) -> list:
+        """Loads the events of a note.
+
+        Only the requested events are read from the event log.
+
+        @param note_id: The id of the note.
+        @param since_version: The version of the note after which the events start. The first event has version 1.
+        @return: A list of events, oldest first.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        """
+        with self._lock:
+            entry = self._entries.get(note_id)
+            if entry is None:
+                raise NoteDoesNotExistError(note_id)
+            return [
+                _deserialize_event(self._read_line(self._events_reader, offset)['event'])
+                for offset in entry.event_offsets[since_version:]
+            ]
+
+    def get_note_version(self, note_id) -> int:
+        """Returns the number of events of a note.
+
+        @param note_id: The id of the note.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        """
+        with self._lock:
+            entry = self._entries.get(note_id)
+            if entry is None:
+                raise NoteDoesNotExistError(note_id)
+            return len(entry.event_offsets)
+
+    def has_note(self, note_id) -> bool:
+        with self._lock:
+            return note_id in self._entries
+
+    def remove_note(self, note_id):
+        """Appends the removal of a note to the event log and forgets its events.
+
+        @param note_id: The id of the note.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        """
+        with self._lock:
+            entry = self._entries.get(note_id)
+            if entry is None:
+                raise NoteDoesNotExistError(note_id)
+            self._append(self._events_file, [{
+                'version': len(entry.event_offsets) + 1,
+                'event': {'type': _NOTE_DELETED_TYPE, 'note_id': note_id},
+            }])
+            del self._entries[note_id]
+
+    def _write_checkpoint(self):
+        checkpoint = {
+            'version': CHECKPOINT_VERSION,
+            'events_size': self._events_file.tell(),
+            'snapshots_size': self._snapshots_file.tell(),
+            'notes': [
+                [
+                    entry.note_id,
+                    entry.title,
+                    list(entry.folder_path.elements),
+                    entry.snapshot_version,
+                    entry.snapshot_offset,
+                    entry.event_offsets,
+                ]
+                for entry in self._entries.values()
+            ],
+        }
+        checkpoint_path = os.path.join(self.path, CHECKPOINT_FILE_NAME)
+        temporary_path = checkpoint_path + '.tmp'
+        with open(temporary_path, 'wb') as checkpoint_file:
+            checkpoint_file.write(_encode_line(checkpoint))
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, checkpoint_path)
+
+    def close(self):
+        """Writes a checkpoint and closes the logs."""
+        with self._lock:
+            os.fsync(self._events_file.fileno())
+            os.fsync(self._snapshots_file.fileno())
+            self._write_checkpoint()
+            for log_file in (self._events_file, self._snapshots_file, self._events_reader, self._snapshots_reader):
+                log_file.close()
+
+    def __repr__(self):
+        return '{cls}[{path}]'.format(cls=self.__class__.__name__, path=self.path)
@@ -15,7 +15,7 @@ class InMemoryNoteRepository(NoteRepository):
         self.notes[note.note_id] = note
 
     def get_all_notes(self):
-        for note in self.notes.values():
+        for note in list(self.notes.values()):
             yield note
 
     def get_note(self, note_id) -> Note:
@@ -25,3 +25,8 @@ class InMemoryNoteRepository(NoteRepository):
 
     def has_note(self, note_id) -> bool:
         return note_id in self.notes
+
+    def remove_note(self, note_id):
+        if not self.has_note(note_id):
+            raise NoteDoesNotExistError
+        del self.notes[note_id]
@@ -14,7 +14,10 @@ class StorageNoteRepository(NoteRepository):
         self.storage = storage
 
     def add_or_update_note(self, note: Note):
+        # The storage only keeps the current state, so the events are not needed any more.
+        event_count = len(note.uncommitted_events)
         self.storage.set_note_payload(note.note_id, 'main', io.BytesIO(bytes(note.payload, encoding='utf-8')))
+        note.mark_events_committed(event_count)
 
     def get_all_notes(self):
         for note in self.storage.get_all_notes():
@@ -22,13 +25,20 @@ class StorageNoteRepository(NoteRepository):
 
     def get_note(self, note_id) -> Note:
         note = self.storage.get_note(note_id)
-        payload_file = self.storage.get_note_payload(note_id, 'main')
-        try:
-            # TODO
-            note._payload = str(payload_file.read(), encoding='utf-8')
-        finally:
-            payload_file.close()
+        # TODO
+        note._payload = self.get_note_payload(note_id)
         return note
 
+    def get_note_payload(self, note_id) -> str:
+        """Loads the payload of a note.
+
+        @param note_id: The id of the note.
+        @return: The payload.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        @raise IOError: If the payload cannot be read.
+        """
+        with self.storage.open_note_payload_buffer(note_id, 'main') as buffer:
+            return str(buffer, encoding='utf-8')
+
     def has_note(self, note_id) -> bool:
         return self.storage.has_note(note_id)
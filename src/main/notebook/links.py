@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Links between notes."""
+
+import os
+import re
+import urllib.parse
+
+__all__ = [
+    'LinkGraph',
+    'parse_links',
+]
+
+_FENCED_CODE_PATTERN = re.compile(r'^ {0,3}(`{3,}|~{3,}).*?(^ {0,3}\1|\Z)', re.MULTILINE | re.DOTALL)
+_CODE_SPAN_PATTERN = re.compile(r'(`+).+?\1')
+# Inline links [text](target "title") and reference definitions [label]: target. Images are excluded. A target in
+# angle brackets may contain spaces; it is the first group, and any other target is the second group.
+_INLINE_LINK_PATTERN = re.compile(r'(?<!!)\[[^\]]*\]\(\s*(?:<([^<>\n]*)>|([^)\s]+))(?:\s+[^)]*)?\)')
+_REFERENCE_DEFINITION_PATTERN = re.compile(r'^ {0,3}\[[^\]]+\]:\s*(?:<([^<>\n]*)>|(\S+))(?:\s|$)', re.MULTILINE)
+_SCHEME_PATTERN = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+
+def _resolve_link(note_id: str, target: str) -> str:
+    """Returns the id of the note that a link target refers to, or None if it does not refer to a note."""
+    if _SCHEME_PATTERN.match(target) or target.startswith(('/', '#')):
+        return None
+    path = urllib.parse.unquote(target.split('#', 1)[0].split('?', 1)[0])
+    if not path.endswith('.md'):
+        return None
+    linked_note_id = os.path.normpath(os.path.join(os.path.dirname(note_id), path.replace('/', os.sep)))
+    if linked_note_id == os.pardir or linked_note_id.startswith(os.pardir + os.sep):
+        return None
+    return linked_note_id
+
+
+def parse_links(note_id: str, payload: str):
+    """Finds the links from a note to other notes.
+
+    Relative links to .md files are resolved against the folder of the note, which gives the ids that
+    SimpleFileSystemStorage uses. Links in code, links with a scheme (http:, mailto:, ...), absolute links and links
+    outside the notebook are ignored.
+
+    @param note_id: The id of the note.
+    @param payload: The Markdown payload of the note.
+    @return: A set of the ids of the linked notes. They may not exist.
+    """
+    if not payload or ('](' not in payload and ']:' not in payload):
+        return set()
+    text = _CODE_SPAN_PATTERN.sub('', _FENCED_CODE_PATTERN.sub('', payload))
+    linked_note_ids = set()
+    for pattern in (_INLINE_LINK_PATTERN, _REFERENCE_DEFINITION_PATTERN):
+        for match in pattern.finditer(text):
+            target = match.group(1) if match.group(1) is not None else match.group(2)
+            linked_note_id = _resolve_link(note_id, target)
+            if linked_note_id is not None:
+                linked_note_ids.add(linked_note_id)
+    return linked_note_ids
+
+
+class LinkGraph(object):
+    """The links between the notes of a notebook.
+
+    The links of every note and the backlinks of every link target are kept, as are the targets that do not exist.
+    Changing the links of a note only touches the targets that were added or removed, and the queries take time
+    proportional to the size of their result.
+
+    Instances are not thread-safe.
+    """
+
+    def __init__(self):
+        self._links = {}  # type: dict[str, frozenset]
+        self._backlinks = {}  # type: dict[str, set]
+        self._note_ids = set()  # type: set[str]
+        self._missing_targets = set()  # type: set[str]
+
+    def __len__(self):
+        return len(self._note_ids)
+
+    def _add_backlink(self, target: str, note_id: str):
+        sources = self._backlinks.get(target)
+        if sources is None:
+            sources = self._backlinks[target] = set()
+            if target not in self._note_ids:
+                self._missing_targets.add(target)
+        sources.add(note_id)
+
+    def _remove_backlink(self, target: str, note_id: str):
+        sources = self._backlinks[target]
+        sources.discard(note_id)
+        if not sources:
+            del self._backlinks[target]
+            self._missing_targets.discard(target)
+
+    def set_note(self, note_id: str, linked_note_ids):
+        """Adds a note or replaces its links.
+
+        @param note_id: The id of the note.
+        @param linked_note_ids: The ids of the notes it links to.
+        """
+        if note_id not in self._note_ids:
+            self._note_ids.add(note_id)
+            self._missing_targets.discard(note_id)
+        old_links = self._links.get(note_id, frozenset())
+        new_links = frozenset(linked_note_ids)
+        for target in old_links - new_links:
+            self._remove_backlink(target, note_id)
+        for target in new_links - old_links:
+            self._add_backlink(target, note_id)
+        if new_links:
+            self._links[note_id] = new_links
+        else:
+            self._links.pop(note_id, None)
+
+    def update_note(self, note_id: str, payload: str):
+        """Adds a note or replaces its links with those in its payload. See parse_links()."""
+        self.set_note(note_id, parse_links(note_id, payload))
+
+    def remove_note(self, note_id: str):
+        """Removes a note and its links. Links to the note become broken."""
+        if note_id not in self._note_ids:
+            return
+        self.set_note(note_id, ())
+        self._note_ids.discard(note_id)
+        if note_id in self._backlinks:
+            self._missing_targets.add(note_id)
+
+    def has_note(self, note_id: str) -> bool:
+        return note_id in self._note_ids
+
+    def get_links(self, note_id: str):
+        """Returns the ids of the notes that a note links to, as a frozenset."""
+        return self._links.get(note_id, frozenset())
+
+    def get_backlinks(self, note_id: str):
+        """Returns the ids of the notes that link to a note, as a frozenset."""
+        return frozenset(self._backlinks.get(note_id, ()))
+
+    def get_broken_links(self):
+        """Returns the links to notes that do not exist.
+
+        @return: A list of tuples (id of the linking note, id of the missing note).
+        """
+        return [
+            (source, target)
+            for target in self._missing_targets
+            for source in self._backlinks[target]
+        ]
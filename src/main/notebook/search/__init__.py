@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Search indexes over notes."""
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""Full-text index over note payloads."""
+
+import collections
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from ..storage import NotebookStorage
+from ..storage.index import compute_content_hash
+
+__all__ = [
+    'FullTextIndex',
+    'SearchResult',
+    'tokenize',
+]
+
+INDEX_VERSION = 1
+
+SearchResult = namedtuple('SearchResult', ['note_id', 'score'])
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+_QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+# The worker processes are not forked, because the application has other threads when the index is built, and a fork
+# of a process with threads can deadlock.
+_MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# BM25 parameters.
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str):
+    """Splits a text into terms.
+
+    @param text: The text.
+    @return: A tuple (dict mapping every term to a tuple of its positions, number of tokens).
+    """
+    term_positions = {}
+    position = -1
+    for position, match in enumerate(_TOKEN_PATTERN.finditer(text.casefold())):
+        term_positions.setdefault(match.group(), []).append(position)
+    return {term: tuple(positions) for term, positions in term_positions.items()}, position + 1
+
+
+def _tokenize_notes(notes):
+    """Tokenizes a chunk of notes. Runs in a worker process.
+
+    @param notes: A list of tuples (note id, text, content hash).
+    @return: A list of tuples (note id, term positions, length, content hash).
+    """
+    return [(note_id,) + tokenize(text) + (content_hash,) for note_id, text, content_hash in notes]
+
+
+class FullTextIndex(object):
+    """A positional inverted index over the payloads of notes.
+
+    For every term, the index stores the notes that contain it and the positions of the term in them. Queries
+    consist of words and "quoted phrases"; a note matches if it contains all of them. Results are ranked with BM25.
+
+    The index remembers the content hash of every indexed payload, so that after loading it from disk, only notes
+    that changed have to be indexed again.
+    """
+
+    def __init__(self):
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self._postings = {}  # type: dict[str, dict[str, tuple]]
+        self._note_terms = {}  # type: dict[str, tuple]
+        self._note_lengths = {}  # type: dict[str, int]
+        self._content_hashes = {}  # type: dict[str, str]
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._note_lengths)
+
+    def _add_tokenized_note(self, note_id: str, term_positions: dict, length: int, content_hash: str):
+        self.remove_note(note_id)
+        for term, positions in term_positions.items():
+            note_positions = self._postings.get(term)
+            if note_positions is None:
+                note_positions = self._postings[term] = {}
+            note_positions[note_id] = positions
+        self._note_terms[note_id] = tuple(term_positions.keys())
+        self._note_lengths[note_id] = length
+        self._content_hashes[note_id] = content_hash
+        self._total_length += length
+
+    def build(self, storage: NotebookStorage, processes: int = None, chunk_size: int = 200):
+        """Indexes all notes in a storage that are not indexed with their current content.
+
+        Notes that no longer exist are removed from the index.
+
+        @param storage: The storage.
+        @param processes: The number of processes used for tokenizing. If it is 1, everything happens in this process.
+            If it is None, the number of CPUs is used. Worker processes are started with the forkserver method where
+            it is available, and with spawn otherwise.
+        @param chunk_size: The number of notes that are sent to a process at once.
+        @return: The number of notes that were indexed.
+        """
+        note_ids = set()
+        indexed_count = 0
+        executor = None
+        # The futures of the chunks that are being tokenized, in the order they were submitted. At most
+        # max_pending_chunks are in flight, so the payloads are not all held in memory at once.
+        futures = collections.deque()
+        max_pending_chunks = 2 * (processes or os.cpu_count() or 1)
+        chunk = []
+        try:
+            for note in storage.get_all_notes():
+                note_ids.add(note.note_id)
+                content_hash = storage.get_known_note_payload_hash(note.note_id, 'main')
+                if content_hash is not None and self._content_hashes.get(note.note_id) == content_hash:
+                    continue
+                with storage.open_note_payload_buffer(note.note_id, 'main') as buffer:
+                    text = str(buffer, encoding='utf-8')
+                    if content_hash is None:
+                        # The storage knows the hash once it has read the payload.
+                        content_hash = storage.get_note_payload_hash(note.note_id, 'main')
+                if self._content_hashes.get(note.note_id) == content_hash:
+                    continue
+                chunk.append((note.note_id, text, content_hash))
+                if len(chunk) < chunk_size:
+                    continue
+                # Full chunks are tokenized while the next ones are read.
+                if processes == 1:
+                    indexed_count += self._add_tokenized_chunk(_tokenize_notes(chunk))
+                else:
+                    if executor is None:
+                        executor = ProcessPoolExecutor(max_workers=processes, mp_context=_MP_CONTEXT)
+                    futures.append(executor.submit(_tokenize_notes, chunk))
+                    while futures and (futures[0].done() or len(futures) > max_pending_chunks):
+                        indexed_count += self._add_tokenized_chunk(futures.popleft().result())
+                chunk = []
+            # If all notes fit into one chunk, starting worker processes is not worth it.
+            if chunk and executor is None:
+                indexed_count += self._add_tokenized_chunk(_tokenize_notes(chunk))
+            elif chunk:
+                futures.append(executor.submit(_tokenize_notes, chunk))
+            while futures:
+                indexed_count += self._add_tokenized_chunk(futures.popleft().result())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        for note_id in set(self._note_lengths.keys()) - note_ids:
+            self.remove_note(note_id)
+        self.log.debug(u'Indexed {count} notes'.format(count=indexed_count))
+        return indexed_count
+
+    def _add_tokenized_chunk(self, tokenized_chunk) -> int:
+        for note_id, term_positions, length, content_hash in tokenized_chunk:
+            self._add_tokenized_note(note_id, term_positions, length, content_hash)
+        return len(tokenized_chunk)
+
+    def get_content_hash(self, note_id: str) -> str:
+        """Returns the content hash of the indexed payload of a note, or None if the note is not indexed."""
+        return self._content_hashes.get(note_id)
+
+    def index_note(self, note_id: str, text: str):
+        """Indexes the payload of a note, replacing its previous payload.
+
+        @param note_id: The id of the note.
+        @param text: The payload.
+        """
+        term_positions, length = tokenize(text)
+        self._add_tokenized_note(note_id, term_positions, length, compute_content_hash(text.encode('utf-8')))
+
+    @classmethod
+    def load(cls, path: str) -> 'FullTextIndex':
+        """Loads an index from disk.
+
+        @param path: The path of the index file.
+        @return: The FullTextIndex. It is empty if the file is missing, unreadable or incompatible.
+        """
+        index = cls()
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return index
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError) as e:
+            index.log.warning(u'Ignoring unreadable index {path}: {e}'.format(path=path, e=e))
+            return index
+        if data.get('version') != INDEX_VERSION:
+            return index
+        index._postings = data['postings']
+        index._note_terms = data['note_terms']
+        index._note_lengths = data['note_lengths']
+        index._content_hashes = data['content_hashes']
+        index._total_length = sum(index._note_lengths.values())
+        return index
+
+    def remove_note(self, note_id: str):
+        """Removes a note from the index. Nothing happens if it is not indexed."""
+        terms = self._note_terms.pop(note_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            note_positions = self._postings[term]
+            del note_positions[note_id]
+            if not note_positions:
+                del self._postings[term]
+        self._total_length -= self._note_lengths.pop(note_id)
+        del self._content_hashes[note_id]
+
+    def save(self, path: str):
+        """Writes the index to disk, replacing the file atomically.
+
+        @param path: The path of the index file.
+        """
+        data = {
+            'version': INDEX_VERSION,
+            'postings': self._postings,
+            'note_terms': self._note_terms,
+            'note_lengths': self._note_lengths,
+            'content_hashes': self._content_hashes,
+        }
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def search(self, query: str, limit: int = 50):
+        """Searches the index.
+
+        @param query: Words and "quoted phrases", all of which must occur in a note.
+        @param limit: The maximum number of results.
+        @return: A list of SearchResult objects, best first.
+        """
+        phrases = []
+        for phrase, word in _QUERY_PATTERN.findall(query):
+            terms = [match.group() for match in _TOKEN_PATTERN.finditer((phrase or word).casefold())]
+            if terms:
+                phrases.append(terms)
+        if not phrases:
+            return []
+
+        terms = {term for phrase in phrases for term in phrase}
+        term_postings = []
+        for term in terms:
+            note_positions = self._postings.get(term)
+            if note_positions is None:
+                return []
+            term_postings.append((term, note_positions))
+        term_postings.sort(key=lambda item: len(item[1]))
+
+        candidates = set(term_postings[0][1].keys())
+        for _, note_positions in term_postings[1:]:
+            candidates.intersection_update(note_positions.keys())
+            if not candidates:
+                return []
+
+        postings = dict(term_postings)
+        multi_term_phrases = [phrase for phrase in phrases if len(phrase) > 1]
+        if multi_term_phrases:
+            candidates = {
+                note_id for note_id in candidates
+                if all(self._contains_phrase(postings, note_id, phrase) for phrase in multi_term_phrases)
+            }
+
+        note_count = len(self._note_lengths)
+        average_length = self._total_length / note_count if note_count else 0
+        idfs = {
+            term: math.log(1 + (note_count - len(note_positions) + 0.5) / (len(note_positions) + 0.5))
+            for term, note_positions in term_postings
+        }
+        results = []
+        for note_id in candidates:
+            length_factor = _K1 * (1 - _B + _B * self._note_lengths[note_id] / average_length) if average_length else _K1
+            score = 0.0
+            for term, note_positions in term_postings:
+                frequency = len(note_positions[note_id])
+                score += idfs[term] * frequency * (_K1 + 1) / (frequency + length_factor)
+            results.append(SearchResult(note_id, score))
+        results.sort(key=lambda result: (-result.score, result.note_id))
+        return results[:limit]
+
+    @staticmethod
+    def _contains_phrase(postings: dict, note_id: str, phrase):
+        """Returns whether the terms of a phrase occur at consecutive positions in a note."""
+        starts = set(postings[phrase[0]][note_id])
+        for offset, term in enumerate(phrase[1:], start=1):
+            starts.intersection_update(position - offset for position in postings[term][note_id])
+            if not starts:
+                return False
+        return True
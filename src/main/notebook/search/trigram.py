@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Trigram index for substring and fuzzy matching of note titles and folder paths."""
+
+import math
+from collections import namedtuple
+
+__all__ = [
+    'TrigramIndex',
+    'TrigramMatch',
+    'get_trigrams',
+]
+
+TrigramMatch = namedtuple('TrigramMatch', ['key', 'score'])
+
+_EMPTY_SET = frozenset()
+
+# Scores of substring matches, depending on where the query occurs. Fuzzy matches score below 1.
+_TITLE_PREFIX_SCORE = 3.0
+_TITLE_SCORE = 2.0
+_PATH_SCORE = 1.0
+
+# The number of trigrams of the query that a fuzzy match must contain at least, unless the query has fewer.
+_MIN_FUZZY_TRIGRAM_COUNT = 2
+
+
+def get_trigrams(text: str):
+    """Returns the set of substrings of length 3 of a text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex(object):
+    """An index from trigrams to the titles and folder paths of notes.
+
+    Searching finds the entries whose title or path contains the query, ignoring case. Substring matches are ranked
+    by where the query occurs: at the start of the title, elsewhere in the title, or in the path. They are followed by
+    fuzzy matches, which contain a large enough fraction of the trigrams of the query, ranked by that fraction.
+    Queries that are shorter than a trigram only match the titles that start with them, which are indexed as well.
+
+    The index remembers the substring matches of the last query. If the next query contains the last one, as it does
+    when the user keeps typing, only those matches are checked again.
+    """
+
+    def __init__(self):
+        self._titles = {}  # type: dict[str, str]
+        self._texts = {}  # type: dict[str, str]
+        self._postings = {}  # type: dict[str, set]
+        self._title_prefixes = {}  # type: dict[str, set]
+        self._last_query = None  # type: str
+        self._last_matches = None  # type: list[str]
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, key: str, title: str, path: str = ''):
+        """Adds an entry to the index, replacing an existing entry with the same key.
+
+        @param key: The key of the entry, e.g. a note id.
+        @param title: The title.
+        @param path: The folder path, e.g. 'a/b'.
+        """
+        self.remove(key)
+        title = title.casefold()
+        text = path.casefold() + '/' + title if path else title
+        self._titles[key] = title
+        self._texts[key] = text
+        for trigram in get_trigrams(text):
+            keys = self._postings.get(trigram)
+            if keys is None:
+                keys = self._postings[trigram] = set()
+            keys.add(key)
+        for prefix in self._get_short_prefixes(title):
+            keys = self._title_prefixes.get(prefix)
+            if keys is None:
+                keys = self._title_prefixes[prefix] = set()
+            keys.add(key)
+        self._last_query = None
+
+    def remove(self, key: str):
+        """Removes an entry from the index. Nothing happens if there is no entry with the key."""
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        title = self._titles.pop(key)
+        for trigram in get_trigrams(text):
+            keys = self._postings[trigram]
+            keys.discard(key)
+            if not keys:
+                del self._postings[trigram]
+        for prefix in self._get_short_prefixes(title):
+            keys = self._title_prefixes[prefix]
+            keys.discard(key)
+            if not keys:
+                del self._title_prefixes[prefix]
+        self._last_query = None
+
+    @staticmethod
+    def _get_short_prefixes(title: str):
+        """Returns the prefixes of a title that are shorter than a trigram."""
+        return [title[:length] for length in range(1, min(len(title), 2) + 1)]
+
+    def _find_substring_matches(self, query: str):
+        if len(query) < 3:
+            # Checking every entry would take too long, and would find most of them anyway. The matches are not
+            # remembered, because they do not contain all entries that contain a longer query.
+            self._last_query = None
+            return list(self._title_prefixes.get(query, _EMPTY_SET))
+        if self._last_query is not None and self._last_query in query:
+            candidates = self._last_matches
+        else:
+            trigram_keys = sorted((self._postings.get(trigram, _EMPTY_SET) for trigram in get_trigrams(query)), key=len)
+            candidates = set(trigram_keys[0])
+            for keys in trigram_keys[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(keys)
+        texts = self._texts
+        matches = [key for key in candidates if query in texts[key]]
+        self._last_query = query
+        self._last_matches = matches
+        return matches
+
+    def _find_fuzzy_matches(self, query: str, min_similarity: float, excluded_keys):
+        trigrams = get_trigrams(query)
+        if not trigrams:
+            return []
+        required_count = max(
+            math.ceil(min_similarity * len(trigrams)), min(_MIN_FUZZY_TRIGRAM_COUNT, len(trigrams)))
+        trigram_keys = sorted((self._postings.get(trigram, _EMPTY_SET) for trigram in trigrams), key=len)
+        # Every match contains at least one of the rarest trigrams that cannot all be missing.
+        candidates = set()
+        for keys in trigram_keys[:len(trigrams) - required_count + 1]:
+            candidates.update(keys)
+        candidates.difference_update(excluded_keys)
+
+        matches = []
+        for key in candidates:
+            count = sum(1 for keys in trigram_keys if key in keys)
+            if count >= required_count:
+                matches.append(TrigramMatch(key, count / len(trigrams)))
+        return matches
+
+    def find(self, query: str, min_similarity: float = 0.5):
+        """Returns the keys of all entries that match a query, like search(), but without ranking them.
+
+        This is cheaper than search() when there are many matches.
+
+        @param query: The text to search for.
+        @param min_similarity: See search().
+        @return: A set of keys.
+        """
+        query = query.strip().casefold()
+        if not query:
+            return set()
+        keys = set(self._find_substring_matches(query))
+        if min_similarity is not None:
+            keys.update(match.key for match in self._find_fuzzy_matches(query, min_similarity, excluded_keys=keys))
+        return keys
+
+    def search(self, query: str, limit: int = None, min_similarity: float = 0.5):
+        """Searches the titles and folder paths.
+
+        @param query: The text to search for.
+        @param limit: The maximum number of results, or None for all of them. Fuzzy matches are only looked for if
+            there are fewer substring matches than this.
+        @param min_similarity: The fraction of the trigrams of the query that a fuzzy match must contain, or None to
+            find substring matches only. A fuzzy match must contain at least two trigrams of the query in any case
+            (or the only one of a query of three characters).
+        @return: A list of TrigramMatch objects, best first.
+        """
+        query = query.strip().casefold()
+        if not query:
+            return []
+
+        titles = self._titles
+        ranked_keys = []
+        for key in self._find_substring_matches(query):
+            title = titles[key]
+            if title.startswith(query):
+                score = _TITLE_PREFIX_SCORE
+            elif query in title:
+                score = _TITLE_SCORE
+            else:
+                score = _PATH_SCORE
+            ranked_keys.append((-score, len(title), key))
+        ranked_keys.sort()
+        matches = [TrigramMatch(key, -negative_score) for negative_score, _, key in ranked_keys]
+
+        if min_similarity is not None and (limit is None or len(matches) < limit):
+            fuzzy_matches = self._find_fuzzy_matches(
+                query, min_similarity, excluded_keys=[match.key for match in matches])
+            fuzzy_matches.sort(key=lambda match: (-match.score, len(titles[match.key]), match.key))
+            matches.extend(fuzzy_matches)
+        return matches[:limit] if limit is not None else matches
@@ -1,17 +1,29 @@
 # -*- coding: utf-8 -*-
 # TODO: Rename to "Note"
+import contextlib
+from collections import namedtuple
+
 from notebook.aggregate import Note
 
 __all__ = [
+    'ChangedNotes',
     'NotebookStorage',
     'NoteDoesNotExistError',
 ]
 
+# The ids of the notes that were created, modified and deleted, as sets.
+ChangedNotes = namedtuple('ChangedNotes', ['created', 'modified', 'deleted'])
+
 
 class NotebookStorage:
     """Classes implementing this interface can store notebooks.
     """
 
+    def close(self):
+        """Releases the resources held by the storage and writes any pending changes.
+        """
+        pass
+
     def get_all_notes(self):
         """Loads the metadata of all notes in the notebook.
 
@@ -44,6 +56,30 @@ class NotebookStorage:
         """
         raise NotImplementedError(self.get_note_payload.__name__)
 
+    def get_note_payload_hash(self, note_id, payload_name):
+        """Returns a hash of the contents of a payload, which can be used to detect changes.
+
+        @param note_id: The id of the note.
+        @param payload_name: The name of the payload.
+        @return: A string, which changes when the contents of the payload change.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        @raise IOError: If the payload cannot be read.
+        """
+        raise NotImplementedError(self.get_note_payload_hash.__name__)
+
+    def get_known_note_payload_hash(self, note_id, payload_name):
+        """Returns the hash of the contents of a payload if it is known without reading the payload.
+
+        Storages that keep the hashes of their payloads return the same as get_note_payload_hash(). Storages that
+        compute them override this, so that callers who read the payload anyway do not read it twice.
+
+        @param note_id: The id of the note.
+        @param payload_name: The name of the payload.
+        @return: The same as get_note_payload_hash(), or None if the payload would have to be read for it.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        """
+        return self.get_note_payload_hash(note_id, payload_name)
+
     def has_note(self, note_id):
         """Returns whether a note exists within the notebook.
 
@@ -52,6 +88,26 @@ class NotebookStorage:
         """
         raise NotImplementedError(self.has_note.__name__)
 
+    @contextlib.contextmanager
+    def open_note_payload_buffer(self, note_id, payload_name):
+        """Provides the data of a payload as a read-only buffer.
+
+        Storages can override this to avoid copying the data, e.g. by memory-mapping it. The buffer is only valid
+        inside the with block, and no views derived from it may be kept after it.
+
+        @param note_id: The id of the note.
+        @param payload_name: The name of the payload.
+        @return: A context manager returning a memoryview with the payload data.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        @raise IOError: If the payload cannot be read.
+        """
+        with self.get_note_payload(note_id, payload_name) as payload_file:
+            buffer = memoryview(payload_file.read())
+        try:
+            yield buffer
+        finally:
+            buffer.release()
+
     def set_note_payload(self, note_id, payload_name, payload_file):
         """Sets a payload for a note.
 
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Persistent metadata index for file system storage."""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+
+__all__ = [
+    'IndexedDirectory',
+    'IndexedNote',
+    'MetadataIndex',
+    'compute_content_hash',
+]
+
+INDEX_VERSION = 2
+
+# The modification time is in nanoseconds. The content hash is None if it is not known.
+IndexedNote = namedtuple('IndexedNote', ['note_id', 'folder_path', 'title', 'mtime', 'size', 'content_hash'])
+
+
+def compute_content_hash(data) -> str:
+    """Computes the content hash of payload data, as stored in the index.
+
+    @param data: A bytes-like object.
+    @return: A hexadecimal BLAKE2b digest.
+    """
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+class IndexedDirectory(object):
+    """The indexed contents of a directory in a notebook.
+
+    @ivar mtime: The modification time of the directory (in nanoseconds) when it was scanned.
+    @ivar subdirectories: The names of the subdirectories, sorted.
+    @ivar notes: A dict mapping note ids to IndexedNote objects.
+    """
+
+    def __init__(self, mtime: int, subdirectories, notes):
+        """Constructor.
+
+        @param mtime: See the class documentation.
+        @param subdirectories: See the class documentation.
+        @param notes: An iterable of IndexedNote objects.
+        """
+        self.mtime = mtime
+        self.subdirectories = subdirectories
+        self.notes = {note.note_id: note for note in notes}
+
+    def __repr__(self):
+        return '{cls}[mtime={mtime}, subdirectories={subdirectories}, notes={notes}]'.format(
+            cls=self.__class__.__name__,
+            mtime=self.mtime,
+            subdirectories=len(self.subdirectories),
+            notes=len(self.notes))
+
+
+class MetadataIndex(object):
+    """An on-disk index of the directories and notes in a notebook.
+
+    The index stores, per directory, the modification time of the directory, its subdirectories and its notes. A
+    directory whose modification time has not changed since it was indexed does not have to be listed again.
+
+    @ivar path: The path of the index file.
+    """
+
+    def __init__(self, path: str):
+        """Constructor.
+
+        @param path: See the class documentation.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.path = path
+        self._directories = {}
+        self._dirty = False
+        self._lock = threading.RLock()
+
+        self.log.debug(u'path={0}'.format(self.path))
+
+    def get_directory(self, directory_path: str) -> IndexedDirectory:
+        """Returns the indexed contents of a directory.
+
+        @param directory_path: The path of the directory, relative to the notebook. The root is ''.
+        @return: An IndexedDirectory, or None if the directory is not indexed.
+        """
+        with self._lock:
+            return self._directories.get(directory_path)
+
+    def get_note(self, note_id: str) -> IndexedNote:
+        """Returns the indexed metadata of a note.
+
+        @param note_id: The id of the note.
+        @return: An IndexedNote, or None if the note is not indexed.
+        """
+        with self._lock:
+            directory = self._directories.get(os.path.dirname(note_id))
+            if directory is None:
+                return None
+            return directory.notes.get(note_id)
+
+    def load(self):
+        """Loads the index from disk.
+
+        A missing, unreadable or incompatible index file results in an empty index.
+        """
+        with self._lock:
+            self._directories = {}
+            self._dirty = False
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                return
+            except (OSError, ValueError) as e:
+                self.log.warning(u'Ignoring unreadable index {path}: {e}'.format(path=self.path, e=e))
+                return
+            if data.get('version') != INDEX_VERSION:
+                self.log.info(u'Ignoring index {path} with version {version}'.format(
+                    path=self.path, version=data.get('version')))
+                return
+            for directory_path, raw_directory in data['directories'].items():
+                self._directories[directory_path] = IndexedDirectory(
+                    mtime=raw_directory['mtime'],
+                    subdirectories=raw_directory['subdirectories'],
+                    notes=[IndexedNote(*raw_note) for raw_note in raw_directory['notes']])
+
+    def remove_directory(self, directory_path: str):
+        """Removes a directory and its notes from the index. Its subdirectories are not removed.
+
+        @param directory_path: The path of the directory, relative to the notebook.
+        """
+        with self._lock:
+            if self._directories.pop(directory_path, None) is not None:
+                self._dirty = True
+
+    def retain_directories(self, directory_paths):
+        """Removes all directories from the index except the given ones.
+
+        @param directory_paths: A collection of directory paths that should remain in the index.
+        """
+        with self._lock:
+            for directory_path in list(self._directories.keys()):
+                if directory_path not in directory_paths:
+                    del self._directories[directory_path]
+                    self._dirty = True
+
+    def save(self):
+        """Writes the index to disk, if it has changed.
+
+        The index is written to a temporary file first, which then replaces the index file.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                'version': INDEX_VERSION,
+                'directories': {
+                    directory_path: {
+                        'mtime': directory.mtime,
+                        'subdirectories': directory.subdirectories,
+                        'notes': [list(note) for note in directory.notes.values()],
+                    }
+                    for directory_path, directory in self._directories.items()
+                },
+            }
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+            self._dirty = False
+
+    def set_directory(self, directory_path: str, directory: IndexedDirectory):
+        """Stores the indexed contents of a directory.
+
+        @param directory_path: The path of the directory, relative to the notebook. The root is ''.
+        @param directory: An IndexedDirectory.
+        """
+        with self._lock:
+            self._directories[directory_path] = directory
+            self._dirty = True
+
+    def set_note(self, note: IndexedNote):
+        """Stores the indexed metadata of a note.
+
+        The directory of the note must already be indexed, otherwise nothing happens.
+
+        @param note: An IndexedNote.
+        """
+        with self._lock:
+            directory = self._directories.get(note.folder_path)
+            if directory is not None:
+                directory.notes[note.note_id] = note
+                self._dirty = True
+
+    def __repr__(self):
+        return '{cls}[{path}]'.format(cls=self.__class__.__name__, path=self.path)
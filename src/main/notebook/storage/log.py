@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+"""Log-structured storage."""
+
+import contextlib
+import io
+import logging
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import namedtuple
+
+from . import NotebookStorage, NoteDoesNotExistError, ParseError, PayloadDoesNotExistError
+from .index import compute_content_hash
+from ..aggregate import Note, FolderPath
+
+__all__ = ['LogStructuredStorage']
+
+_NOTE_RECORD = 1
+_PAYLOAD_RECORD = 2
+
+# A record is a header (CRC-32 of the rest of the record, record type, key length, value length), the key and the
+# value. The key of a note record is the note id and its value is the folder path and the title, separated by a NUL
+# character. The key of a payload record is the note id and the payload name, separated by a NUL character, and its
+# value is the payload data.
+_RECORD_HEADER = struct.Struct('<IBHI')
+
+# A hint entry describes the last record of a key in a segment: record type, key length, value offset, value length,
+# extra length. It is followed by the key and the extra data: the value of a note record, or the content hash of a
+# payload record.
+_HINT_HEADER = struct.Struct('<BHIIH')
+
+# The numbers are zero-padded to at least 8 and 4 digits, and can have more.
+_SEGMENT_FILE_PATTERN = re.compile(r'^(\d{8,})-(\d{4,})\.log$')
+
+# Where the value of a record is stored. record_size is the size of the whole record, which is used to track how much
+# of a segment is garbage. content_hash is only set for payload records.
+_Location = namedtuple('_Location', ['segment_id', 'offset', 'length', 'record_size', 'content_hash'])
+
+
+def _get_segment_file_name(segment_id, extension: str) -> str:
+    return '{major:08d}-{minor:04d}.{extension}'.format(major=segment_id[0], minor=segment_id[1], extension=extension)
+
+
+def _encode_key(record_type: int, note_id: str, payload_name: str = None) -> bytes:
+    if record_type == _NOTE_RECORD:
+        return note_id.encode('utf-8')
+    return (note_id + '\0' + payload_name).encode('utf-8')
+
+
+def _encode_record(record_type: int, key: bytes, value: bytes) -> bytes:
+    body = _RECORD_HEADER.pack(0, record_type, len(key), len(value))[4:] + key + value
+    return struct.pack('<I', zlib.crc32(body)) + body
+
+
+def _iterate_records(data: bytes):
+    """Parses the records of a segment.
+
+    @param data: The contents of the segment.
+    @return: An iterable returning tuples (record type, key, value offset, value length, record size). It stops at the
+        first record that is incomplete or corrupt; the offset of that record is in the StopIteration value.
+    """
+    offset = 0
+    while offset + _RECORD_HEADER.size <= len(data):
+        crc, record_type, key_length, value_length = _RECORD_HEADER.unpack_from(data, offset)
+        record_size = _RECORD_HEADER.size + key_length + value_length
+        if offset + record_size > len(data) or zlib.crc32(data[offset + 4:offset + record_size]) != crc:
+            break
+        key_offset = offset + _RECORD_HEADER.size
+        yield record_type, bytes(data[key_offset:key_offset + key_length]), key_offset + key_length, value_length, \
+            record_size
+        offset += record_size
+    return offset
+
+
+class LogStructuredStorage(NotebookStorage):
+    """Stores notes in append-only segment files.
+
+    Every change appends a record to the active segment, so writes are sequential. An in-memory index maps every note
+    and payload to the location of its latest record, so reading a payload is a single pread(). When the active
+    segment reaches max_segment_size, it is closed and a hint file is written next to it, which lists the records of
+    the segment without their payloads. At startup the index is rebuilt from the hint files, and only segments without
+    a hint file (e.g. after a crash) are read completely. A record that was only partly written is cut off.
+
+    Records that are superseded by later records are garbage. Compaction rewrites the live records of the closed
+    segments into new segments and deletes the old ones. It can run on a background thread, see start_compaction().
+    New segments get ids that sort after the segments they replace but before the active segment, so that the order
+    of the segments always says which record of a key is the latest.
+
+    Notes cannot be deleted.
+
+    @ivar max_segment_size: The size in bytes at which the active segment is closed.
+    @ivar compaction_threshold: The fraction of the closed segments that must be garbage before compaction starts.
+    """
+
+    def __init__(
+            self,
+            dir: str,
+            max_segment_size: int = 64 * 1024 * 1024,
+            compaction_threshold: float = 0.5,
+            sync_writes: bool = False,
+    ):
+        """Constructor.
+
+        @param dir: The path to the directory to store the segments in.
+        @param max_segment_size: See the class documentation.
+        @param compaction_threshold: See the class documentation.
+        @param sync_writes: Whether every write is flushed to disk before it returns.
+        @raise ParseError: If a closed segment is corrupt.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.dir = dir
+        self.max_segment_size = max_segment_size
+        self.compaction_threshold = compaction_threshold
+        self.sync_writes = sync_writes
+
+        self.log.debug(u'dir={0}'.format(self.dir))
+        if not os.path.exists(self.dir):
+            os.makedirs(self.dir)
+
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        self._notes = {}  # type: dict[str, tuple]
+        self._locations = {}  # type: dict[tuple, _Location]
+        self._segment_sizes = {}  # type: dict[tuple, int]
+        self._live_sizes = {}  # type: dict[tuple, int]
+        self._read_fds = {}  # type: dict[tuple, int]
+        self._active_segment_id = None
+        self._active_fd = None
+        self._active_hints = {}  # type: dict[tuple, tuple]
+        self._stop_event = threading.Event()
+        self._compaction_thread = None
+
+        self._load()
+
+    # Loading
+
+    def _get_segment_path(self, segment_id, extension: str = 'log') -> str:
+        return os.path.join(self.dir, _get_segment_file_name(segment_id, extension))
+
+    def _list_segment_ids(self):
+        segment_ids = []
+        for name in os.listdir(self.dir):
+            match = _SEGMENT_FILE_PATTERN.match(name)
+            if match is not None:
+                segment_ids.append((int(match.group(1)), int(match.group(2))))
+            elif name.endswith('.tmp'):
+                # Left behind by an interrupted compaction or hint file write.
+                os.remove(os.path.join(self.dir, name))
+        return sorted(segment_ids)
+
+    def _load(self):
+        segment_ids = self._list_segment_ids()
+        for i, segment_id in enumerate(segment_ids):
+            self._segment_sizes[segment_id] = 0
+            self._live_sizes[segment_id] = 0
+            if not self._load_hints(segment_id):
+                self._scan_segment(segment_id, is_last=i == len(segment_ids) - 1)
+            self._read_fds[segment_id] = os.open(self._get_segment_path(segment_id), os.O_RDONLY)
+        next_major = segment_ids[-1][0] + 1 if segment_ids else 0
+        self._open_active_segment((next_major, 0))
+        self.log.debug(u'Loaded {notes} notes from {segments} segments'.format(
+            notes=len(self._notes), segments=len(segment_ids)))
+
+    def _load_hints(self, segment_id) -> bool:
+        """Adds the records listed in the hint file of a segment to the index.
+
+        @return: Whether the segment has a readable hint file.
+        """
+        try:
+            with open(self._get_segment_path(segment_id, 'hint'), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        self._segment_sizes[segment_id] = os.stat(self._get_segment_path(segment_id)).st_size
+        offset = 0
+        while offset < len(data):
+            record_type, key_length, value_offset, value_length, extra_length = _HINT_HEADER.unpack_from(data, offset)
+            offset += _HINT_HEADER.size
+            key = data[offset:offset + key_length]
+            offset += key_length
+            extra = data[offset:offset + extra_length]
+            offset += extra_length
+            record_size = _RECORD_HEADER.size + key_length + value_length
+            self._add_to_index(segment_id, record_type, key, value_offset, value_length, record_size, extra)
+        return True
+
+    def _scan_segment(self, segment_id, is_last: bool):
+        """Adds all records of a segment to the index, reading the whole segment, and writes its hint file.
+
+        @param is_last: Whether this is the last segment, which may end with a partly written record.
+        """
+        path = self._get_segment_path(segment_id)
+        with open(path, 'rb') as f:
+            data = f.read()
+        records = _iterate_records(data)
+        hints = {}
+        while True:
+            try:
+                record_type, key, value_offset, value_length, record_size = next(records)
+            except StopIteration as e:
+                valid_size = e.value
+                break
+            value = data[value_offset:value_offset + value_length]
+            extra = value if record_type == _NOTE_RECORD else bytes.fromhex(compute_content_hash(value))
+            self._add_to_index(segment_id, record_type, key, value_offset, value_length, record_size, extra)
+            hints[(record_type, key)] = (record_type, key, value_offset, value_length, extra)
+        if valid_size < len(data):
+            if not is_last:
+                raise ParseError('Corrupt record at offset {offset} in {path}'.format(offset=valid_size, path=path))
+            self.log.warning(u'Truncating {count} bytes of an incomplete record from {path}'.format(
+                count=len(data) - valid_size, path=path))
+            os.truncate(path, valid_size)
+        self._segment_sizes[segment_id] = valid_size
+        # The segment is never written to again, so the next start can use the hint file.
+        self._write_hints(segment_id, hints.values())
+
+    def _add_to_index(self, segment_id, record_type, key: bytes, value_offset, value_length, record_size, extra):
+        """Makes a record the latest record of its key.
+
+        @param extra: The value of a note record, or the binary content hash of a payload record.
+        """
+        if record_type == _NOTE_RECORD:
+            index_key = (_NOTE_RECORD, key.decode('utf-8'))
+            folder_path, title = bytes(extra).decode('utf-8').split('\0')
+            self._notes[index_key[1]] = (folder_path, title)
+            content_hash = None
+        elif record_type == _PAYLOAD_RECORD:
+            index_key = (_PAYLOAD_RECORD,) + tuple(key.decode('utf-8').split('\0'))
+            content_hash = bytes(extra).hex()
+        else:
+            raise ParseError('Unknown record type {type} in segment {segment}'.format(
+                type=record_type, segment=_get_segment_file_name(segment_id, 'log')))
+        previous = self._locations.get(index_key)
+        if previous is not None:
+            self._live_sizes[previous.segment_id] -= previous.record_size
+        self._locations[index_key] = _Location(segment_id, value_offset, value_length, record_size, content_hash)
+        self._live_sizes[segment_id] += record_size
+
+    # Writing
+
+    def _open_active_segment(self, segment_id):
+        self._active_segment_id = segment_id
+        path = self._get_segment_path(segment_id)
+        self._active_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._read_fds[segment_id] = os.open(path, os.O_RDONLY)
+        self._segment_sizes[segment_id] = 0
+        self._live_sizes[segment_id] = 0
+        self._active_hints = {}
+
+    def _close_active_segment(self):
+        """Closes the active segment and writes its hint file. An empty active segment is deleted instead."""
+        segment_id = self._active_segment_id
+        os.fsync(self._active_fd)
+        os.close(self._active_fd)
+        self._active_fd = None
+        if self._segment_sizes[segment_id] == 0:
+            self._delete_segment(segment_id)
+        else:
+            self._write_hints(segment_id, self._active_hints.values())
+
+    def _write_hints(self, segment_id, hints):
+        """Writes a hint file atomically.
+
+        @param hints: An iterable of tuples (record type, key, value offset, value length, extra).
+        """
+        data = io.BytesIO()
+        for record_type, key, value_offset, value_length, extra in hints:
+            data.write(_HINT_HEADER.pack(record_type, len(key), value_offset, value_length, len(extra)))
+            data.write(key)
+            data.write(extra)
+        path = self._get_segment_path(segment_id, 'hint')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def _append(self, record_type: int, key: bytes, value: bytes, extra: bytes):
+        with self._lock:
+            if self._segment_sizes[self._active_segment_id] >= self.max_segment_size:
+                self._close_active_segment()
+                self._open_active_segment((self._active_segment_id[0] + 1, 0))
+            segment_id = self._active_segment_id
+            record = _encode_record(record_type, key, value)
+            record_offset = self._segment_sizes[segment_id]
+            os.write(self._active_fd, record)
+            if self.sync_writes:
+                os.fsync(self._active_fd)
+            self._segment_sizes[segment_id] += len(record)
+            value_offset = record_offset + _RECORD_HEADER.size + len(key)
+            self._active_hints[(record_type, key)] = (record_type, key, value_offset, len(value), extra)
+            self._add_to_index(segment_id, record_type, key, value_offset, len(value), len(record), extra)
+
+    def add_note(self, note: Note):
+        """Adds a note without payloads, or changes the title and folder of an existing note.
+
+        @param note: The note.
+        """
+        value = (os.sep.join(note.folder_path.elements) + '\0' + note.title).encode('utf-8')
+        self._append(_NOTE_RECORD, _encode_key(_NOTE_RECORD, note.note_id), value, value)
+
+    def set_note_payload(self, note_id, payload_name, payload_file):
+        """Sets a payload for a note.
+
+        A payload whose content hash is unchanged is not written.
+        """
+        data = payload_file.read()
+        payload_hash = compute_content_hash(data)
+        with self._lock:
+            if note_id not in self._notes:
+                raise NoteDoesNotExistError(note_id)
+            location = self._locations.get((_PAYLOAD_RECORD, note_id, payload_name))
+            if location is not None and location.content_hash == payload_hash:
+                return
+            self._append(
+                _PAYLOAD_RECORD, _encode_key(_PAYLOAD_RECORD, note_id, payload_name), data,
+                bytes.fromhex(payload_hash))
+
+    # Reading
+
+    def get_all_notes(self):
+        self.log.debug(u'Loading all notes')
+        with self._lock:
+            notes = sorted(self._notes.items())
+        for note_id, (folder_path, title) in notes:
+            yield Note(note_id=note_id, title=title, folder_path=FolderPath.from_string(folder_path))
+
+    def get_note(self, note_id):
+        with self._lock:
+            metadata = self._notes.get(note_id)
+        if metadata is None:
+            raise NoteDoesNotExistError(note_id)
+        folder_path, title = metadata
+        return Note(note_id=note_id, title=title, folder_path=FolderPath.from_string(folder_path))
+
+    def _get_payload_location(self, note_id, payload_name) -> _Location:
+        location = self._locations.get((_PAYLOAD_RECORD, note_id, payload_name))
+        if location is None:
+            if note_id not in self._notes:
+                raise NoteDoesNotExistError(note_id)
+            raise PayloadDoesNotExistError(note_id, payload_name)
+        return location
+
+    def _read_payload(self, note_id, payload_name) -> bytes:
+        with self._lock:
+            location = self._get_payload_location(note_id, payload_name)
+            return os.pread(self._read_fds[location.segment_id], location.length, location.offset)
+
+    def get_note_payload(self, note_id, payload_name):
+        return io.BytesIO(self._read_payload(note_id, payload_name))
+
+    def get_note_payload_hash(self, note_id, payload_name):
+        with self._lock:
+            return self._get_payload_location(note_id, payload_name).content_hash
+
+    def has_note(self, note_id):
+        with self._lock:
+            return note_id in self._notes
+
+    @contextlib.contextmanager
+    def open_note_payload_buffer(self, note_id, payload_name):
+        buffer = memoryview(self._read_payload(note_id, payload_name))
+        try:
+            yield buffer
+        finally:
+            buffer.release()
+
+    # Compaction
+
+    def get_garbage_ratio(self) -> float:
+        """Returns the fraction of the closed segments that is garbage."""
+        with self._lock:
+            closed_segment_ids = [
+                segment_id for segment_id in self._segment_sizes if segment_id != self._active_segment_id]
+            total_size = sum(self._segment_sizes[segment_id] for segment_id in closed_segment_ids)
+            live_size = sum(self._live_sizes[segment_id] for segment_id in closed_segment_ids)
+        return 1 - live_size / total_size if total_size else 0.0
+
+    def compact(self) -> int:
+        """Rewrites the live records of all closed segments into new segments and deletes the closed segments.
+
+        Writes can continue while the records are copied.
+
+        @return: The number of bytes of garbage that were dropped.
+        """
+        with self._compaction_lock:
+            with self._lock:
+                segment_ids = sorted(
+                    segment_id for segment_id in self._segment_sizes if segment_id != self._active_segment_id)
+                if not segment_ids:
+                    return 0
+                old_size = sum(self._segment_sizes[segment_id] for segment_id in segment_ids)
+                compacted_segment_ids = set(segment_ids)
+                live_records = sorted(
+                    (location.segment_id, location.offset, index_key, location)
+                    for index_key, location in self._locations.items()
+                    if location.segment_id in compacted_segment_ids)
+            self.log.debug(u'Compacting {count} segments'.format(count=len(segment_ids)))
+
+            last_major = segment_ids[-1][0]
+            next_minor = max(minor for major, minor in segment_ids if major == last_major) + 1
+            moved_locations = []
+            output_id = None
+            output_file = None
+            output_hints = []
+            output_size = 0
+            try:
+                for segment_id, _, index_key, location in live_records:
+                    if output_file is None or output_size >= self.max_segment_size:
+                        if output_file is not None:
+                            self._finish_compacted_segment(output_id, output_file, output_hints)
+                        output_id = (last_major, next_minor)
+                        next_minor += 1
+                        output_file = open(self._get_segment_path(output_id, 'log.tmp'), 'wb')
+                        output_hints = []
+                        output_size = 0
+                    record_type = index_key[0]
+                    key = _encode_key(*index_key)
+                    value = os.pread(self._read_fds[segment_id], location.length, location.offset)
+                    record = _encode_record(record_type, key, value)
+                    output_file.write(record)
+                    value_offset = output_size + _RECORD_HEADER.size + len(key)
+                    extra = value if record_type == _NOTE_RECORD else bytes.fromhex(location.content_hash)
+                    output_hints.append((record_type, key, value_offset, len(value), extra))
+                    moved_locations.append((index_key, location, _Location(
+                        output_id, value_offset, len(value), len(record), location.content_hash)))
+                    output_size += len(record)
+                if output_file is not None:
+                    self._finish_compacted_segment(output_id, output_file, output_hints)
+            except BaseException:
+                if output_file is not None:
+                    output_file.close()
+                    os.remove(self._get_segment_path(output_id, 'log.tmp'))
+                raise
+
+            with self._lock:
+                output_ids = sorted({new_location.segment_id for _, _, new_location in moved_locations})
+                for output_id in output_ids:
+                    self._segment_sizes[output_id] = os.stat(self._get_segment_path(output_id)).st_size
+                    self._live_sizes[output_id] = 0
+                    self._read_fds[output_id] = os.open(self._get_segment_path(output_id), os.O_RDONLY)
+                for index_key, old_location, new_location in moved_locations:
+                    # Records that were written during the compaction are newer than the copies.
+                    if self._locations.get(index_key) == old_location:
+                        self._locations[index_key] = new_location
+                        self._live_sizes[new_location.segment_id] += new_location.record_size
+                for segment_id in segment_ids:
+                    self._delete_segment(segment_id)
+                new_size = sum(self._segment_sizes[output_id] for output_id in output_ids)
+            self.log.debug(u'Compacted {old} bytes into {new} bytes'.format(old=old_size, new=new_size))
+            return old_size - new_size
+
+    def _finish_compacted_segment(self, segment_id, output_file, hints):
+        """Moves a compacted segment into place. Until then, it is not loaded if the application crashes."""
+        output_file.flush()
+        os.fsync(output_file.fileno())
+        output_file.close()
+        os.replace(self._get_segment_path(segment_id, 'log.tmp'), self._get_segment_path(segment_id))
+        self._write_hints(segment_id, hints)
+
+    def _delete_segment(self, segment_id):
+        fd = self._read_fds.pop(segment_id, None)
+        if fd is not None:
+            os.close(fd)
+        self._segment_sizes.pop(segment_id, None)
+        self._live_sizes.pop(segment_id, None)
+        for extension in ('hint', 'log'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._get_segment_path(segment_id, extension))
+
+    def start_compaction(self, interval: float = 60.0):
+        """Starts a background thread that compacts the segments when enough of them is garbage.
+
+        @param interval: The number of seconds between two checks.
+        """
+        if self._compaction_thread is not None:
+            return
+        self._stop_event.clear()
+        self._compaction_thread = threading.Thread(
+            target=self._compact_periodically, args=(interval,), name='compaction', daemon=True)
+        self._compaction_thread.start()
+
+    def stop_compaction(self):
+        """Stops the compaction thread, waiting for a running compaction to finish."""
+        if self._compaction_thread is None:
+            return
+        self._stop_event.set()
+        self._compaction_thread.join()
+        self._compaction_thread = None
+
+    def _compact_periodically(self, interval: float):
+        while not self._stop_event.wait(interval):
+            try:
+                if self.get_garbage_ratio() >= self.compaction_threshold:
+                    self.compact()
+            except Exception:
+                self.log.exception(u'Compaction failed')
+
+    def close(self):
+        """Stops compaction, closes the active segment and writes its hint file."""
+        self.stop_compaction()
+        with self._lock:
+            if self._active_fd is not None:
+                self._close_active_segment()
+            for fd in self._read_fds.values():
+                os.close(fd)
+            self._read_fds.clear()
+
+    def __repr__(self):
+        return '{cls}[{dir}]'.format(cls=self.__class__.__name__, dir=self.dir)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Copies a notebook from one storage to another.
+
+Usage, from the src/main directory:
+
+    python -m notebook.storage.migrate NOTEBOOK_DIR DATABASE_FILE
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from . import NotebookStorage
+from .simple_fs import SimpleFileSystemStorage
+from .sqlite import SqliteStorage
+
+__all__ = ['migrate']
+
+PAYLOAD_NAMES = ('main',)
+
+
+def _copy_batch(source: NotebookStorage, target: SqliteStorage, notes):
+    payloads = []
+    for note in notes:
+        for payload_name in PAYLOAD_NAMES:
+            with source.get_note_payload(note.note_id, payload_name) as payload_file:
+                payloads.append((note.note_id, payload_name, payload_file.read()))
+    with target.transaction():
+        target.add_notes(notes)
+        target.set_note_payloads(payloads)
+
+
+def migrate(source: NotebookStorage, target: SqliteStorage, batch_size: int = 500) -> int:
+    """Copies all notes and their payloads from one storage to another.
+
+    Every batch of notes is written in one transaction. Notes that exist in the target already are not added again,
+    but their payloads are overwritten, so an interrupted migration can be run again.
+
+    @param source: The storage to copy from.
+    @param target: The storage to copy to.
+    @param batch_size: The number of notes per transaction.
+    @return: The number of notes copied.
+    """
+    count = 0
+    batch = []
+    for note in source.get_all_notes():
+        batch.append(note)
+        if len(batch) >= batch_size:
+            _copy_batch(source, target, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        _copy_batch(source, target, batch)
+        count += len(batch)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copies a notebook directory into an SQLite database.')
+    parser.add_argument('notebook_dir', help='the notebook directory')
+    parser.add_argument('database_file', help='the database file, which is created if it does not exist')
+    parser.add_argument('--batch-size', type=int, default=500, help='the number of notes per transaction')
+    args = parser.parse_args()
+    if not os.path.isdir(args.notebook_dir):
+        parser.error('{dir} is not a directory'.format(dir=args.notebook_dir))
+
+    logging.basicConfig(format='%(asctime)s %(levelname)5s %(msg)s [%(name)s]', level=logging.INFO)
+    source = SimpleFileSystemStorage(args.notebook_dir)
+    target = SqliteStorage(args.database_file)
+    start = time.perf_counter()
+    try:
+        count = migrate(source, target, batch_size=args.batch_size)
+    finally:
+        target.close()
+        source.close()
+    print('Copied {count} notes in {duration:.1f} s'.format(count=count, duration=time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,22 +3,28 @@
 
 from __future__ import absolute_import
 
-import hashlib
+import contextlib
 import io
 import logging
+import mmap
 import os
+import threading
 
 from . import *
+from .index import IndexedDirectory, IndexedNote, MetadataIndex, compute_content_hash
+from .walker import ParallelDirectoryWalker
 from ..aggregate import Note, FolderPath
 
 __all__ = ['SimpleFileSystemStorage']
 
 
 class SimpleFileSystemStorage(NotebookStorage):
-    def __init__(self, dir):
+    def __init__(self, dir, index_path=None, scan_workers=8):
         """Constructor.
 
         @param dir: The path to the directory to store notes in.
+        @param index_path: The path of the metadata index file. Defaults to a hidden file next to the directory.
+        @param scan_workers: The maximum number of directories that are scanned concurrently.
         """
         self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
         self.dir = dir
@@ -27,26 +33,94 @@ class SimpleFileSystemStorage(NotebookStorage):
         if not os.path.exists(self.dir):
             os.makedirs(self.dir)
 
+        if index_path is None:
+            absolute_dir = os.path.abspath(self.dir)
+            index_path = os.path.join(
+                os.path.dirname(absolute_dir),
+                '.{name}.wmsnotes-index.json'.format(name=os.path.basename(absolute_dir)))
+        self.index = MetadataIndex(index_path)
+        self.index.load()
+        self.walker = ParallelDirectoryWalker(self._scan_directory, max_workers=scan_workers)
+        # Makes writing a payload and updating its index entry atomic with respect to hashing payloads and refreshing
+        # directories, which would otherwise see the new file with the old index entry and report it as modified.
+        self._lock = threading.RLock()
+
     def get_all_notes(self):
+        """Loads the metadata of all notes in the notebook.
+
+        Directories that have not been modified since they were indexed are not listed again. The other directories
+        are scanned concurrently.
+        """
         self.log.debug(u'Loading all notes')
 
-        def handle_error(e):
-            raise e
+        visited_directory_paths = set()
+        for directory_path, directory in self.walker.walk():  # type: str, IndexedDirectory
+            visited_directory_paths.add(directory_path)
+            for indexed_note in directory.notes.values():
+                yield self._create_note(indexed_note.note_id)
+
+        self.index.retain_directories(visited_directory_paths)
+        self.index.save()
+
+    def _scan_directory(self, directory_path: str, force: bool = False):
+        """Returns the contents of a directory, from the index if the directory has not been modified.
+
+        This method is called from the threads of the directory walker.
 
-        for (dirpath, dirnames, filenames) in os.walk(self.dir, onerror=handle_error):
-            dirpath = os.path.relpath(dirpath, self.dir)
-            for filename in filenames:  # type: str
-                if filename.endswith('.md'):
-                    note_id = os.path.normpath(os.path.join(dirpath, filename))
-                    self.log.debug(u'Found a note with id "{note_id}" in {path}'.format(note_id=note_id, path=dirpath))
-                    yield self.get_note(note_id)
+        @param directory_path: The path of the directory, relative to the notebook.
+        @param force: Whether to list the directory even if it has not been modified.
+        @return: A tuple (IndexedDirectory, subdirectory names).
+        @raise OSError: If the directory cannot be read.
+        """
+        absolute_path = os.path.join(self.dir, directory_path)
+        mtime = os.stat(absolute_path).st_mtime_ns
+        previous = self.index.get_directory(directory_path)
+        if previous is not None and previous.mtime == mtime and not force:
+            return previous, previous.subdirectories
+
+        self.log.debug(u'Scanning directory "{path}"'.format(path=directory_path))
+        subdirectories = []
+        notes = []
+        with os.scandir(absolute_path) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):  # type: os.DirEntry
+                if entry.is_dir():
+                    subdirectories.append(entry.name)
+                elif entry.name.endswith('.md'):
+                    note_id = os.path.join(directory_path, entry.name)
+                    notes.append(self._create_indexed_note(
+                        note_id, entry.stat(), previous.notes.get(note_id) if previous is not None else None))
+        directory = IndexedDirectory(mtime=mtime, subdirectories=subdirectories, notes=notes)
+        self.index.set_directory(directory_path, directory)
+        return directory, subdirectories
+
+    @staticmethod
+    def _create_indexed_note(note_id, file_stat, previous: IndexedNote = None) -> IndexedNote:
+        """Creates the index entry of a note.
+
+        @param note_id: The id of the note.
+        @param file_stat: The result of os.stat() for the note file.
+        @param previous: The previous index entry of the note, if any. Its content hash is kept if the file has not
+            been modified.
+        @return: An IndexedNote.
+        """
+        if previous is not None and previous.mtime == file_stat.st_mtime_ns and previous.size == file_stat.st_size:
+            content_hash = previous.content_hash
+        else:
+            content_hash = None
+        return IndexedNote(
+            note_id=note_id,
+            folder_path=os.path.dirname(note_id),
+            title=os.path.basename(note_id)[:-3],
+            mtime=file_stat.st_mtime_ns,
+            size=file_stat.st_size,
+            content_hash=content_hash)
 
     def get_note(self, note_id):
         self.log.debug(u'Loading note {note_id}'.format(note_id=note_id))
         if not self.has_note(note_id):
             raise NoteDoesNotExistError()
 
-        return self._read_note(note_id)
+        return self._create_note(note_id)
 
     def _get_note_directory_path(self, note_id):
         # return os.path.join(self.dir, note_id)
@@ -67,6 +141,95 @@ class SimpleFileSystemStorage(NotebookStorage):
 
         return io.open(self._get_note_payload_file_path(note_id, payload_name), mode='rb')
 
+    def get_note_payload_hash(self, note_id, payload_name):
+        """Returns the content hash of a payload.
+
+        The hash is taken from the metadata index if the file has not been modified since it was hashed. Otherwise the
+        file is read and hashed, and the index is updated.
+
+        @param note_id: The id of the note.
+        @param payload_name: The name of the payload.
+        @return: The content hash, as computed by compute_content_hash().
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        """
+        file_path = self._get_note_payload_file_path(note_id, payload_name)
+        with self._lock:
+            try:
+                file_stat = os.stat(file_path)
+            except FileNotFoundError:
+                raise NoteDoesNotExistError(note_id)
+            indexed_note = self.index.get_note(note_id)
+            if self._is_index_up_to_date(indexed_note, file_stat):
+                return indexed_note.content_hash
+
+            with self._open_payload_buffer(note_id, payload_name) as (_, payload_hash):
+                return payload_hash
+
+    def get_known_note_payload_hash(self, note_id, payload_name):
+        """Returns the content hash of a payload if the metadata index has it for the current file, otherwise None.
+
+        @param note_id: The id of the note.
+        @param payload_name: The name of the payload.
+        @return: The content hash, or None.
+        @raise NoteDoesNotExistError: If a note with the id does not exist.
+        """
+        try:
+            file_stat = os.stat(self._get_note_payload_file_path(note_id, payload_name))
+        except FileNotFoundError:
+            raise NoteDoesNotExistError(note_id)
+        indexed_note = self.index.get_note(note_id)
+        return indexed_note.content_hash if self._is_index_up_to_date(indexed_note, file_stat) else None
+
+    @contextlib.contextmanager
+    def open_note_payload_buffer(self, note_id, payload_name):
+        """Provides the data of a payload as a read-only buffer.
+
+        The file is memory-mapped, so the data is not copied. Empty files, and files on file systems that do not
+        support memory mapping, are read into memory instead. Unless the metadata index already has the content hash
+        of the payload, the hash is computed and recorded, so that the payload is not read again only to hash it.
+        """
+        with self._open_payload_buffer(note_id, payload_name) as (buffer, _):
+            yield buffer
+
+    @contextlib.contextmanager
+    def _open_payload_buffer(self, note_id, payload_name):
+        """Like open_note_payload_buffer(), but provides a tuple (buffer, content hash)."""
+        with self.get_note_payload(note_id, payload_name) as payload_file:
+            file_stat = os.fstat(payload_file.fileno())
+            try:
+                mapped_file = mmap.mmap(payload_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                mapped_file = None
+                buffer = memoryview(payload_file.read())
+            else:
+                buffer = memoryview(mapped_file)
+            try:
+                yield buffer, self._record_payload_hash(note_id, payload_file, file_stat, buffer)
+            finally:
+                buffer.release()
+                if mapped_file is not None:
+                    mapped_file.close()
+
+    def _record_payload_hash(self, note_id, payload_file, file_stat, buffer) -> str:
+        """Returns the content hash of a payload that has been read, and records it in the metadata index.
+
+        @param note_id: The id of the note.
+        @param payload_file: The open payload file.
+        @param file_stat: The result of os.fstat() for the payload file before it was read.
+        @param buffer: The data of the payload.
+        @return: The content hash, as computed by compute_content_hash().
+        """
+        with self._lock:
+            indexed_note = self.index.get_note(note_id)
+            if self._is_index_up_to_date(indexed_note, file_stat):
+                return indexed_note.content_hash
+            payload_hash = compute_content_hash(buffer)
+            # A file that was rewritten while it was read into memory may not match the hash, so it is not recorded.
+            current_stat = os.fstat(payload_file.fileno())
+            if current_stat.st_mtime_ns == file_stat.st_mtime_ns and current_stat.st_size == file_stat.st_size:
+                self.index.set_note(self._create_indexed_note(note_id, file_stat)._replace(content_hash=payload_hash))
+            return payload_hash
+
     def _get_note_payload_directory_path(self, note_id):
         # return os.path.join(self.dir, note_id, 'payload')
         return self._get_note_directory_path(note_id)
@@ -81,8 +244,17 @@ class SimpleFileSystemStorage(NotebookStorage):
     # def has_note_payload(self, note_id, payload_name):
     #     return os.path.exists(self._get_note_payload_file_path(note_id, payload_name))
 
-    def _read_note(self, note_id):
-        """Reads a note.
+    @staticmethod
+    def _is_index_up_to_date(indexed_note: IndexedNote, file_stat):
+        """Returns whether the index entry of a note has a content hash that matches the file."""
+        return \
+            indexed_note is not None and \
+            indexed_note.content_hash is not None and \
+            indexed_note.mtime == file_stat.st_mtime_ns and \
+            indexed_note.size == file_stat.st_size
+
+    def _create_note(self, note_id):
+        """Creates the Note object for a note.
 
         @param note_id: The id of the note.
         @return: A Note.
@@ -94,23 +266,92 @@ class SimpleFileSystemStorage(NotebookStorage):
             title=title,
             folder_path=FolderPath.from_string(path))
 
+    def refresh_directories(self, directory_paths, recursive: bool = False) -> ChangedNotes:
+        """Updates the metadata index after other programs changed directories of the notebook.
+
+        The directories are listed again, even if their modification time has not changed, so that modified notes are
+        found as well. New subdirectories are scanned completely and subdirectories that disappeared are removed from
+        the index. Payloads written by this storage do not count as modified.
+
+        @param directory_paths: An iterable of directory paths, relative to the notebook. Directories that no longer
+            exist are allowed.
+        @param recursive: Whether to list all existing subdirectories again as well.
+        @return: A ChangedNotes.
+        """
+        directory_paths = set(directory_paths)
+        changes = ChangedNotes(created=set(), modified=set(), deleted=set())
+        for directory_path in sorted(directory_paths):
+            with self._lock:
+                self._refresh_directory(directory_path, recursive, changes)
+        self.log.debug(u'Refreshed {count} directories: {created} notes created, {modified} modified, {deleted} deleted'
+                       .format(count=len(directory_paths), created=len(changes.created),
+                               modified=len(changes.modified), deleted=len(changes.deleted)))
+        return changes
+
+    def _refresh_directory(self, directory_path: str, recursive: bool, changes: ChangedNotes):
+        previous = self.index.get_directory(directory_path)
+        try:
+            directory, subdirectories = self._scan_directory(directory_path, force=True)
+        except (FileNotFoundError, NotADirectoryError):
+            self._remove_indexed_directory(directory_path, changes)
+            return
+
+        previous_notes = previous.notes if previous is not None else {}
+        previous_subdirectories = previous.subdirectories if previous is not None else []
+        for note_id, indexed_note in directory.notes.items():
+            previous_note = previous_notes.get(note_id)
+            if previous_note is None:
+                changes.created.add(note_id)
+            elif previous_note.mtime != indexed_note.mtime or previous_note.size != indexed_note.size:
+                changes.modified.add(note_id)
+        changes.deleted.update(note_id for note_id in previous_notes if note_id not in directory.notes)
+
+        for name in previous_subdirectories:
+            if name not in subdirectories:
+                self._remove_indexed_directory(os.path.join(directory_path, name), changes)
+        for name in subdirectories:
+            if recursive or name not in previous_subdirectories:
+                self._refresh_directory(os.path.join(directory_path, name), recursive, changes)
+
+    def _remove_indexed_directory(self, directory_path: str, changes: ChangedNotes):
+        """Removes a directory and its subdirectories from the index, marking their notes deleted."""
+        directory = self.index.get_directory(directory_path)
+        if directory is None:
+            return
+        changes.deleted.update(directory.notes.keys())
+        for name in directory.subdirectories:
+            self._remove_indexed_directory(os.path.join(directory_path, name), changes)
+        self.index.remove_directory(directory_path)
+
     def set_note_payload(self, note_id, payload_name, payload_file):
-        self.log.debug(u'Storing payload "{name}" to note {note_id}'.format(note_id=note_id, name=payload_name))
-        if not self.has_note(note_id):
-            raise NoteDoesNotExistError(note_id)
+        """Sets a payload for a note.
+
+        If the metadata index shows that the file already has the same content, the file is not written.
+        """
+        file_path = self._get_note_payload_file_path(note_id, payload_name)
+        data = payload_file.read()
+        payload_hash = compute_content_hash(data)
+        with self._lock:
+            try:
+                file_stat = os.stat(file_path)
+            except FileNotFoundError:
+                raise NoteDoesNotExistError(note_id)
+            indexed_note = self.index.get_note(note_id)
+            if self._is_index_up_to_date(indexed_note, file_stat) and indexed_note.content_hash == payload_hash:
+                self.log.debug(u'Payload "{name}" of note {note_id} is unchanged'.format(
+                    note_id=note_id, name=payload_name))
+                return
 
-        directory_path = self._get_note_payload_directory_path(note_id)
-        if not os.path.exists(directory_path):
-            os.makedirs(directory_path)
+            self.log.debug(u'Storing payload "{name}" to note {note_id}'.format(note_id=note_id, name=payload_name))
+            with io.open(file_path, mode='wb') as f:
+                f.write(data)
 
-        with io.open(self._get_note_payload_file_path(note_id, payload_name), mode='wb') as f:
-            data = payload_file.read()
-            f.write(data)
-            payload_hash = hashlib.md5(data).hexdigest()
+            self.index.set_note(
+                self._create_indexed_note(note_id, os.stat(file_path))._replace(content_hash=payload_hash))
 
-        # stored_note = self.get_note(note_id)
-        # stored_note.payloads.append(StoredNotePayload(payload_name, payload_hash))
-        # self._write_note(note_id, stored_note)
+    def close(self):
+        """Writes pending changes to the metadata index."""
+        self.index.save()
 
     def __repr__(self):
         return '{cls}[{dir}]'.format(cls=self.__class__.__name__, **self.__dict__)
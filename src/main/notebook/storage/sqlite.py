@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""SQLite storage."""
+
+import contextlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+
+from . import NotebookStorage, NoteDoesNotExistError, ParseError, PayloadDoesNotExistError
+from .index import compute_content_hash
+from ..aggregate import Note, FolderPath
+
+__all__ = ['SqliteStorage']
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = [
+    '''CREATE TABLE note (
+        note_id TEXT PRIMARY KEY,
+        folder_path TEXT NOT NULL,
+        title TEXT NOT NULL
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE payload (
+        note_id TEXT NOT NULL REFERENCES note (note_id) ON DELETE CASCADE,
+        name TEXT NOT NULL,
+        data BLOB NOT NULL,
+        content_hash TEXT NOT NULL,
+        PRIMARY KEY (note_id, name)
+    )''',
+]
+
+# The statements are kept constant, so that the sqlite3 module prepares each of them once and reuses it from its
+# statement cache.
+_SELECT_ALL_NOTES = 'SELECT note_id, folder_path, title FROM note ORDER BY note_id'
+_SELECT_NOTE = 'SELECT note_id, folder_path, title FROM note WHERE note_id = ?'
+_SELECT_PAYLOAD = 'SELECT data FROM payload WHERE note_id = ? AND name = ?'
+_SELECT_PAYLOAD_HASH = 'SELECT content_hash FROM payload WHERE note_id = ? AND name = ?'
+_INSERT_NOTE = 'INSERT OR IGNORE INTO note (note_id, folder_path, title) VALUES (?, ?, ?)'
+_UPSERT_PAYLOAD = 'INSERT OR REPLACE INTO payload (note_id, name, data, content_hash) VALUES (?, ?, ?, ?)'
+
+
+class SqliteStorage(NotebookStorage):
+    """Stores the metadata and payloads of all notes in a single SQLite database.
+
+    The database runs in write-ahead logging mode, so readers do not block the writer. Looking up a note is an indexed
+    query instead of a file system probe, which makes a difference for notebooks with many notes. The bulk methods
+    (add_notes(), get_note_payloads() and set_note_payloads()) do all their work in one transaction, and so does a
+    with block around transaction().
+
+    Note ids, titles and folder paths are the same as those of SimpleFileSystemStorage, so notebooks can be migrated
+    (see notebook.storage.migrate).
+
+    The storage can be used from several threads; access to the connection is serialized.
+    """
+
+    def __init__(self, path: str):
+        """Constructor.
+
+        @param path: The path of the database file. It is created if it does not exist.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.path = path
+
+        self.log.debug(u'path={0}'.format(self.path))
+        self._lock = threading.RLock()
+        self._transaction_depth = 0
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=32)
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.transaction() as connection:
+            version = connection.execute('PRAGMA user_version').fetchone()[0]
+            if version == SCHEMA_VERSION:
+                return
+            if version != 0:
+                raise ParseError('Unsupported schema version {version} in {path}'.format(
+                    version=version, path=self.path))
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            connection.execute('PRAGMA user_version = {version}'.format(version=SCHEMA_VERSION))
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Runs a with block in a single transaction, which is rolled back if the block raises an exception.
+
+        Transactions can be nested; only the outermost one commits. Other threads wait until it has finished.
+
+        @return: A context manager returning the sqlite3 connection.
+        """
+        with self._lock:
+            if self._transaction_depth > 0:
+                self._transaction_depth += 1
+                try:
+                    yield self._connection
+                finally:
+                    self._transaction_depth -= 1
+                return
+
+            self._connection.execute('BEGIN')
+            self._transaction_depth = 1
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            else:
+                self._connection.execute('COMMIT')
+            finally:
+                self._transaction_depth = 0
+
+    def _query_one(self, statement: str, parameters):
+        with self._lock:
+            return self._connection.execute(statement, parameters).fetchone()
+
+    def add_note(self, note: Note):
+        """Adds a note without payloads. Nothing happens if a note with the same id exists.
+
+        @param note: The note.
+        """
+        self.add_notes([note])
+
+    def add_notes(self, notes):
+        """Adds notes without payloads, in one transaction. Notes whose id exists already are skipped.
+
+        @param notes: An iterable of Note objects.
+        """
+        with self.transaction() as connection:
+            connection.executemany(_INSERT_NOTE, (
+                (note.note_id, os.sep.join(note.folder_path.elements), note.title)
+                for note in notes
+            ))
+
+    def close(self):
+        """Closes the database. Committed changes are moved from the write-ahead log into the database file."""
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def _create_note(row) -> Note:
+        note_id, folder_path, title = row
+        return Note(
+            note_id=note_id,
+            title=title,
+            folder_path=FolderPath.from_string(folder_path))
+
+    def get_all_notes(self):
+        self.log.debug(u'Loading all notes')
+        with self._lock:
+            rows = self._connection.execute(_SELECT_ALL_NOTES).fetchall()
+        for row in rows:
+            yield self._create_note(row)
+
+    def get_note(self, note_id):
+        row = self._query_one(_SELECT_NOTE, (note_id,))
+        if row is None:
+            raise NoteDoesNotExistError(note_id)
+        return self._create_note(row)
+
+    def _get_payload_data(self, note_id, payload_name) -> bytes:
+        row = self._query_one(_SELECT_PAYLOAD, (note_id, payload_name))
+        if row is None:
+            if not self.has_note(note_id):
+                raise NoteDoesNotExistError(note_id)
+            raise PayloadDoesNotExistError(note_id, payload_name)
+        return row[0]
+
+    def get_note_payload(self, note_id, payload_name):
+        return io.BytesIO(self._get_payload_data(note_id, payload_name))
+
+    def get_note_payload_hash(self, note_id, payload_name):
+        row = self._query_one(_SELECT_PAYLOAD_HASH, (note_id, payload_name))
+        if row is None:
+            if not self.has_note(note_id):
+                raise NoteDoesNotExistError(note_id)
+            raise PayloadDoesNotExistError(note_id, payload_name)
+        return row[0]
+
+    def get_note_payloads(self, note_ids, payload_name) -> dict:
+        """Loads a payload of many notes, in one transaction.
+
+        @param note_ids: An iterable of note ids.
+        @param payload_name: The name of the payload.
+        @return: A dict mapping note ids to payload data (bytes). Notes without the payload are left out.
+        """
+        payloads = {}
+        with self.transaction() as connection:
+            for note_id in note_ids:
+                row = connection.execute(_SELECT_PAYLOAD, (note_id, payload_name)).fetchone()
+                if row is not None:
+                    payloads[note_id] = row[0]
+        return payloads
+
+    def has_note(self, note_id):
+        return self._query_one(_SELECT_NOTE, (note_id,)) is not None
+
+    @contextlib.contextmanager
+    def open_note_payload_buffer(self, note_id, payload_name):
+        buffer = memoryview(self._get_payload_data(note_id, payload_name))
+        try:
+            yield buffer
+        finally:
+            buffer.release()
+
+    def set_note_payload(self, note_id, payload_name, payload_file):
+        """Sets a payload for a note.
+
+        A payload whose content hash is unchanged is not written.
+        """
+        self.set_note_payloads([(note_id, payload_name, payload_file.read())])
+
+    def set_note_payloads(self, payloads):
+        """Sets payloads of many notes, in one transaction.
+
+        Payloads whose content hash is unchanged are not written. If a note does not exist, nothing is written.
+
+        @param payloads: An iterable of tuples (note id, payload name, data as bytes).
+        @raise NoteDoesNotExistError: If a note does not exist.
+        """
+        with self.transaction() as connection:
+            for note_id, payload_name, data in payloads:
+                payload_hash = compute_content_hash(data)
+                row = connection.execute(_SELECT_PAYLOAD_HASH, (note_id, payload_name)).fetchone()
+                if row is not None:
+                    if row[0] == payload_hash:
+                        continue
+                elif connection.execute(_SELECT_NOTE, (note_id,)).fetchone() is None:
+                    raise NoteDoesNotExistError(note_id)
+                connection.execute(_UPSERT_PAYLOAD, (note_id, payload_name, data, payload_hash))
+
+    def __repr__(self):
+        return '{cls}[{path}]'.format(cls=self.__class__.__name__, path=self.path)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Concurrent directory tree walking."""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ['ParallelDirectoryWalker']
+
+
+class ParallelDirectoryWalker(object):
+    """Walks a directory tree, scanning directories concurrently.
+
+    Scanning a directory is delegated to a function that is run on a thread pool. As soon as a directory has been
+    scanned, the thread that scanned it submits all of its subdirectories to the pool, without waiting for the results
+    to be consumed. So directories with a high access latency (e.g. on network file systems) are scanned in parallel,
+    also in deep and narrow trees. The results are nevertheless yielded in a deterministic pre-order.
+
+    @ivar scan_directory: A function that takes the path of a directory (relative to the root) and returns a tuple
+        (result, subdirectory names).
+    @ivar max_workers: The maximum number of directories that are scanned at the same time.
+    """
+
+    def __init__(self, scan_directory, max_workers: int = 8):
+        """Constructor.
+
+        @param scan_directory: See the class documentation.
+        @param max_workers: See the class documentation.
+        """
+        self.scan_directory = scan_directory
+        self.max_workers = max_workers
+
+    def walk(self, root_path: str = ''):
+        """Walks the directory tree.
+
+        If the iterable is abandoned, directories that have not been scanned yet are not scanned any more.
+
+        @param root_path: The path of the root directory.
+        @return: An iterable returning tuples (directory path, result), in pre-order and with subdirectories in the
+            order returned by the scan function.
+        @raise Exception: Any exception raised by the scan function.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        # Guards submitting scans against shutting the executor down.
+        lock = threading.Lock()
+        stopped = threading.Event()
+
+        def scan(directory_path):
+            """Scans a directory and submits the scans of its subdirectories.
+
+            @return: A tuple (result, list of tuples (subdirectory path, future)).
+            """
+            result, subdirectory_names = self.scan_directory(directory_path)
+            children = []
+            with lock:
+                if not stopped.is_set():
+                    for name in subdirectory_names:
+                        subdirectory_path = os.path.join(directory_path, name)
+                        children.append((subdirectory_path, executor.submit(scan, subdirectory_path)))
+            return result, children
+
+        try:
+            stack = [(root_path, executor.submit(scan, root_path))]
+            while stack:
+                directory_path, future = stack.pop()
+                result, children = future.result()
+                stack.extend(reversed(children))
+                yield directory_path, result
+        finally:
+            with lock:
+                stopped.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+            executor.shutdown()
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""Watching a notebook directory for changes made by other programs."""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+__all__ = [
+    'InotifyWatcher',
+    'PollingWatcher',
+    'create_watcher',
+    'is_inotify_available',
+]
+
+# Constants from <sys/inotify.h>.
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_CLOEXEC = 0o2000000
+_IN_NONBLOCK = 0o4000
+
+_WATCH_MASK = \
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | \
+    _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        for name in ('inotify_init1', 'inotify_add_watch', 'inotify_rm_watch'):
+            getattr(libc, name)
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+_libc = _load_libc()
+
+
+def is_inotify_available() -> bool:
+    """Returns whether inotify can be used on this system."""
+    return _libc is not None
+
+
+class _Watcher(object):
+    """Base class of watchers.
+
+    A watcher calls a callback on a background thread with the directories in which something may have changed, as
+    paths relative to the watched directory. The callback decides what actually changed, e.g. with
+    SimpleFileSystemStorage.refresh_directories().
+
+    @ivar callback: A function taking a set of directory paths and a boolean that says whether their subdirectories
+        must be checked as well.
+    """
+
+    def __init__(self, root: str, callback):
+        """Constructor.
+
+        @param root: The path of the directory to watch.
+        @param callback: See the class documentation.
+        """
+        self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
+        self.root = root
+        self.callback = callback
+        self._thread = None
+
+    def _notify(self, directory_paths, recursive: bool):
+        try:
+            self.callback(directory_paths, recursive)
+        except Exception:
+            self.log.exception(u'Handling changes in {count} directories failed'.format(count=len(directory_paths)))
+
+    def _run(self):
+        raise NotImplementedError(self._run.__name__)
+
+    def start(self):
+        """Starts watching on a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops watching. A callback that is running is allowed to finish."""
+        raise NotImplementedError(self.stop.__name__)
+
+
+class PollingWatcher(_Watcher):
+    """Reports the whole directory tree as possibly changed every few seconds.
+
+    This is the fallback for systems without inotify. Every report makes the callback list the whole tree.
+
+    @ivar interval: The number of seconds between two reports.
+    """
+
+    def __init__(self, root: str, callback, interval: float = 5.0):
+        """Constructor.
+
+        @param root: The path of the directory to watch.
+        @param callback: See _Watcher.
+        @param interval: See the class documentation.
+        """
+        super().__init__(root, callback)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._notify({''}, True)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+
+class InotifyWatcher(_Watcher):
+    """Watches a directory tree with inotify.
+
+    Every directory in the tree is watched, and directories that are created or moved into the tree are watched as
+    they appear. Events are coalesced: after the first event, events are collected until there has been no event for
+    coalesce_delay seconds, or until max_delay seconds have passed, and the callback is called once with all
+    directories in which notes were touched. A large checkout therefore results in a few batches instead of thousands
+    of callbacks. If the kernel drops events because its queue overflowed, the whole tree is reported.
+
+    @ivar coalesce_delay: The number of seconds without events after which a batch is reported.
+    @ivar max_delay: The maximum number of seconds that a batch is held back.
+    """
+
+    def __init__(self, root: str, callback, coalesce_delay: float = 0.2, max_delay: float = 2.0):
+        """Constructor.
+
+        @param root: The path of the directory to watch.
+        @param callback: See _Watcher.
+        @param coalesce_delay: See the class documentation.
+        @param max_delay: See the class documentation.
+        @raise OSError: If inotify is not available or the directory cannot be watched.
+        """
+        super().__init__(root, callback)
+        if _libc is None:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.coalesce_delay = coalesce_delay
+        self.max_delay = max_delay
+        self._fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._wake_read_fd, self._wake_write_fd = os.pipe()
+        self._paths_by_descriptor = {}  # type: dict[int, str]
+        self._descriptors_by_path = {}  # type: dict[str, int]
+        self._add_watches('')
+
+    def _add_watches(self, directory_path: str):
+        """Watches a directory and all of its subdirectories."""
+        for dir_path, dir_names, _ in os.walk(os.path.join(self.root, directory_path)):
+            relative_path = os.path.relpath(dir_path, self.root)
+            self._add_watch('' if relative_path == '.' else relative_path)
+
+    def _add_watch(self, directory_path: str):
+        descriptor = _libc.inotify_add_watch(
+            self._fd, os.fsencode(os.path.join(self.root, directory_path)), _WATCH_MASK)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                self.log.warning(u'Cannot watch {path}, the limit of inotify watches has been reached'.format(
+                    path=directory_path))
+            elif error not in (errno.ENOENT, errno.ENOTDIR):
+                self.log.warning(u'Cannot watch {path}: {error}'.format(
+                    path=directory_path, error=os.strerror(error)))
+            return
+        self._paths_by_descriptor[descriptor] = directory_path
+        self._descriptors_by_path[directory_path] = descriptor
+
+    def _remove_watches(self, directory_path: str):
+        """Stops watching a directory that was moved away, and its subdirectories."""
+        prefix = directory_path + os.sep
+        for path in [path for path in self._descriptors_by_path if path == directory_path or path.startswith(prefix)]:
+            descriptor = self._descriptors_by_path.pop(path)
+            del self._paths_by_descriptor[descriptor]
+            _libc.inotify_rm_watch(self._fd, descriptor)
+
+    def _read_events(self, changed_directory_paths: set) -> bool:
+        """Reads the available events and adds the directories in which something changed.
+
+        @param changed_directory_paths: The set to add the directory paths to.
+        @return: Whether the event queue overflowed.
+        """
+        overflowed = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return overflowed
+            offset = 0
+            while offset < len(data):
+                descriptor, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + name_length].rstrip(b'\0'))
+                offset += name_length
+
+                if mask & _IN_Q_OVERFLOW:
+                    overflowed = True
+                    continue
+                directory_path = self._paths_by_descriptor.get(descriptor)
+                if mask & _IN_IGNORED:
+                    if directory_path is not None and self._descriptors_by_path.get(directory_path) == descriptor:
+                        del self._descriptors_by_path[directory_path]
+                    self._paths_by_descriptor.pop(descriptor, None)
+                    continue
+                if directory_path is None or not name:
+                    continue
+                path = os.path.join(directory_path, name)
+                if mask & _IN_ISDIR:
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        self._add_watches(path)
+                    elif mask & _IN_MOVED_FROM:
+                        self._remove_watches(path)
+                    changed_directory_paths.add(directory_path)
+                elif name.endswith('.md'):
+                    changed_directory_paths.add(directory_path)
+
+    def _run(self):
+        poll_fds = [self._fd, self._wake_read_fd]
+        try:
+            while True:
+                readable_fds, _, _ = select.select(poll_fds, [], [])
+                if self._wake_read_fd in readable_fds:
+                    return
+                changed_directory_paths = set()
+                overflowed = self._read_events(changed_directory_paths)
+                deadline = time.monotonic() + self.max_delay
+                while True:
+                    timeout = min(self.coalesce_delay, deadline - time.monotonic())
+                    if timeout <= 0:
+                        break
+                    readable_fds, _, _ = select.select(poll_fds, [], [], timeout)
+                    if self._wake_read_fd in readable_fds:
+                        return
+                    if not readable_fds:
+                        break
+                    overflowed |= self._read_events(changed_directory_paths)
+
+                if overflowed:
+                    self.log.warning(u'The inotify event queue overflowed, checking the whole notebook')
+                    self._add_watches('')
+                    self._notify({''}, True)
+                elif changed_directory_paths:
+                    self._notify(changed_directory_paths, False)
+        finally:
+            self._close()
+
+    def _close(self):
+        os.close(self._fd)
+        os.close(self._wake_read_fd)
+        os.close(self._wake_write_fd)
+        self._fd = None
+
+    def stop(self):
+        """Stops watching and releases the inotify file descriptor. The watcher cannot be started again."""
+        if self._fd is None:
+            return
+        if self._thread is None:
+            self._close()
+            return
+        os.write(self._wake_write_fd, b'\0')
+        self._thread.join()
+        self._thread = None
+
+
+def create_watcher(
+        root: str,
+        callback,
+        polling_interval: float = 5.0,
+        coalesce_delay: float = 0.2,
+        max_delay: float = 2.0,
+):
+    """Creates an InotifyWatcher, or a PollingWatcher if inotify cannot be used.
+
+    @param root: The path of the directory to watch.
+    @param callback: See _Watcher.
+    @param polling_interval: The interval of a PollingWatcher. See PollingWatcher.
+    @param coalesce_delay: The coalesce delay of an InotifyWatcher. See InotifyWatcher.
+    @param max_delay: The maximum delay of an InotifyWatcher. See InotifyWatcher.
+    @return: The watcher. It has not been started yet.
+    """
+    log = logging.getLogger(__name__)
+    if is_inotify_available():
+        try:
+            return InotifyWatcher(root, callback, coalesce_delay=coalesce_delay, max_delay=max_delay)
+        except OSError as e:
+            log.warning(u'Falling back to polling for changes in {root}: {e}'.format(root=root, e=e))
+    return PollingWatcher(root, callback, interval=polling_interval)
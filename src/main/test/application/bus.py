@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+from application.bus import EventBus
+
+
+class BaseEvent(object):
+    pass
+
+
+class DerivedEvent(BaseEvent):
+    pass
+
+
+class TestEventBus(TestCase):
+    def setUp(self):
+        self.bus = EventBus()
+        self.received = []
+
+    def _handler(self, name):
+        return lambda event: self.received.append((name, type(event)))
+
+    def test_publish_dispatches_by_type(self):
+        self.bus.subscribe(BaseEvent, self._handler('base'))
+        self.bus.subscribe(DerivedEvent, self._handler('derived'))
+        self.bus.subscribe(object, self._handler('all'))
+
+        self.bus.publish(BaseEvent())
+        self.bus.publish(DerivedEvent())
+        self.bus.publish('other')
+
+        self.assertEqual([
+            ('base', BaseEvent), ('all', BaseEvent),
+            ('base', DerivedEvent), ('derived', DerivedEvent), ('all', DerivedEvent),
+            ('all', str),
+        ], self.received)
+
+    def test_publish_all(self):
+        self.bus.subscribe(DerivedEvent, self._handler('derived'))
+
+        self.bus.publish_all([BaseEvent(), DerivedEvent(), DerivedEvent()])
+
+        self.assertEqual([('derived', DerivedEvent), ('derived', DerivedEvent)], self.received)
+
+    def test_subscribe_after_publish(self):
+        self.bus.publish(BaseEvent())
+        handler = self._handler('base')
+        self.bus.subscribe(BaseEvent, handler)
+        self.bus.publish(BaseEvent())
+        self.bus.unsubscribe(BaseEvent, handler)
+        self.bus.publish(BaseEvent())
+
+        self.assertEqual([('base', BaseEvent)], self.received)
+
+    def test_instrumentation(self):
+        self.bus.subscribe(BaseEvent, self._handler('base'))
+        instrumentation = self.bus.enable_instrumentation()
+
+        self.bus.publish(BaseEvent())
+        self.bus.publish_all([DerivedEvent(), DerivedEvent()])
+        self.bus.disable_instrumentation()
+        self.bus.publish(BaseEvent())
+
+        metrics = instrumentation.to_dict()
+        self.assertEqual({'test.application.bus.BaseEvent': 1, 'test.application.bus.DerivedEvent': 2},
+                         metrics['events'])
+        self.assertEqual([3], [handler['count'] for handler in metrics['handlers'].values()])
+        self.assertEqual(4, len(self.received))
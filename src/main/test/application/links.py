@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from application.bus import EventBus
+from application.links import BacklinksFound, FindBacklinksCommand, LinkService
+from application.note import NotebookLoaded, NoteService
+from notebook.dao.delayed_persist import DelayedPersistNoteRepository
+from notebook.dao.mem import InMemoryNoteRepository
+from notebook.dao.storage import StorageNoteRepository
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+
+
+class TestLinkService(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        notebook_dir = os.path.join(self.temp_dir, 'notebook')
+        os.makedirs(notebook_dir)
+        for note_id, text in (('A.md', '[B](B.md)'), ('B.md', 'No links'), ('C.md', '[B](B.md) [D](D.md)')):
+            with open(os.path.join(notebook_dir, note_id), 'w', encoding='utf-8') as f:
+                f.write(text)
+        self.storage = SimpleFileSystemStorage(notebook_dir, index_path=os.path.join(self.temp_dir, 'index.json'))
+        self.bus = EventBus()
+        self.note_service = NoteService(
+            DelayedPersistNoteRepository(InMemoryNoteRepository(), StorageNoteRepository(self.storage)), self.bus)
+        self.service = LinkService(self.bus, self.note_service.note_repository, self.storage)
+        self.bus.publish(NotebookLoaded(list(self.storage.get_all_notes())))
+        self.service.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_backlinks(self):
+        found = []
+        self.bus.subscribe(BacklinksFound, found.append)
+
+        self.bus.publish(FindBacklinksCommand('B.md'))
+
+        self.assertEqual(['A.md', 'C.md'], found[0].note_ids)
+        self.assertEqual([('C.md', 'D.md')], self.service.get_broken_links())
+
+    def test_changed_note(self):
+        self.note_service.update_note_payload('A.md', 'Now [D](D.md)')
+        self.note_service.insert_note_text('B.md', 0, '[A](A.md) ')
+
+        self.assertEqual(['C.md'], self.service.get_backlinks('B.md'))
+        self.assertEqual(['B.md'], self.service.get_backlinks('A.md'))
+        self.assertEqual([('A.md', 'D.md'), ('C.md', 'D.md')], self.service.get_broken_links())
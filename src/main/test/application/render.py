@@ -0,0 +1,104 @@
+import re
+import unittest
+from unittest import TestCase
+
+try:
+    from application.render import BlockRenderer, render_markdown, split_blocks
+except ImportError:
+    BlockRenderer = None
+
+DOCUMENT = '''# Title
+
+A paragraph
+that continues.
+
+```python
+def f():
+
+    return 1
+```
+
+1. One
+
+2. Two
+
+   Still two.
+
+* Other list
+
+## Section
+
+Text with `code`.
+'''
+
+
+@unittest.skipIf(BlockRenderer is None, 'markdown is not available')
+class TestBlockRenderer(TestCase):
+    def setUp(self):
+        self.renderer = BlockRenderer()
+
+    def assertRenderedLikeDocument(self, text):
+        blocks = self.renderer.render(text)
+        # The whole document may have blank lines between elements, e.g. after fenced code, which do not matter.
+        self.assertEqual(
+            re.sub(r'>\n\n+<', '>\n<', render_markdown(text)), '\n'.join(block.html for block in blocks))
+        return blocks
+
+    def test_split_blocks(self):
+        self.assertEqual([
+            '# Title',
+            'A paragraph\nthat continues.',
+            '```python\ndef f():\n\n    return 1\n```',
+            '1. One\n\n2. Two\n\n   Still two.\n\n* Other list',
+            '## Section',
+            'Text with `code`.',
+        ], split_blocks(DOCUMENT))
+
+    def test_document(self):
+        self.assertRenderedLikeDocument(DOCUMENT)
+
+    def test_fenced_code_spanning_blocks(self):
+        text = '~~~~\nfirst\n\n~~~\n\n```python\nsecond\n~~~~\n\nafter'
+        self.assertEqual(['~~~~\nfirst\n\n~~~\n\n```python\nsecond\n~~~~', 'after'], split_blocks(text))
+        self.assertRenderedLikeDocument(text)
+        self.assertRenderedLikeDocument('```\nunclosed\n\nfence')
+
+    def test_lists(self):
+        self.assertRenderedLikeDocument('* a\n\n* b\n\n    indented\n\nparagraph\n\n1. one\n2. two\n\n3. three')
+        self.assertRenderedLikeDocument('- item\n\n  continued\n- next\n\n---\n\n- after the rule')
+
+    def test_block_quotes(self):
+        self.assertEqual(['> a\n\n> b'], split_blocks('> a\n\n> b\n'))
+        self.assertRenderedLikeDocument('> a\n\n> b\n')
+        self.assertEqual(['> a', 'b', '> c'], split_blocks('> a\n\nb\n\n> c'))
+        self.assertRenderedLikeDocument('> a\n\nb\n\n> c')
+
+    def test_duplicate_heading_ids(self):
+        for text in [
+            '# Notes\n\ntext\n\n## Notes',
+            '# Notes!\n\ntext\n\nNotes\n-----',
+            'Two\nlines\n=====\n\n# Two lines',
+            '> # Quoted\n\n# Quoted',
+            '# Café\n\n# Cafe',
+        ]:
+            self.assertEqual([text], split_blocks(text))
+            self.assertRenderedLikeDocument(text)
+        self.assertEqual(3, len(self.assertRenderedLikeDocument('# Notes\n\n# More notes\n\ntext')))
+
+    def test_document_wide_constructs(self):
+        for text in ['[TOC]\n\n# A\n\n# B', 'A [link][1].\n\n[1]: http://example.com', '<div>\n\n*a*\n\n</div>']:
+            self.assertEqual([text], split_blocks(text))
+            self.assertRenderedLikeDocument(text)
+
+    def test_edits_at_block_boundaries(self):
+        blocks = self.assertRenderedLikeDocument(DOCUMENT)
+
+        joined_blocks = self.assertRenderedLikeDocument(DOCUMENT.replace('continues.\n\n```', 'continues.\n```'))
+        split_paragraph = self.assertRenderedLikeDocument(DOCUMENT.replace('A paragraph\n', 'A paragraph\n\n'))
+        self.assertRenderedLikeDocument(DOCUMENT.replace('* Other list\n\n', '* Other list\n'))
+        self.assertRenderedLikeDocument(DOCUMENT + '\n\n    indented after the end')
+
+        self.assertEqual(blocks[0], joined_blocks[0])
+        self.assertEqual(blocks[-1], joined_blocks[-1])
+        self.assertEqual(len(blocks) + 1, len(split_paragraph))
+        self.assertEqual(blocks[2:], split_paragraph[3:])
@@ -0,0 +1,98 @@
+import threading
+import unittest
+from unittest import TestCase
+
+try:
+    from application.render_worker import RenderWorker
+except ImportError:
+    RenderWorker = None
+
+
+class BlockingRenderer(object):
+    """Renders a payload as a list of its lines, waiting for may_render after it has started."""
+
+    def __init__(self):
+        self.rendering = threading.Event()
+        self.may_render = threading.Event()
+        self.payloads = []
+
+    def render(self, payload):
+        self.payloads.append(payload)
+        self.rendering.set()
+        self.may_render.wait(5)
+        if payload == 'fail':
+            raise ValueError(payload)
+        return payload.split('\n')
+
+
+@unittest.skipIf(RenderWorker is None, 'markdown is not available')
+class TestRenderWorker(TestCase):
+    def setUp(self):
+        self.renderer = BlockingRenderer()
+        self.worker = RenderWorker(lambda callback, result: callback(result), self.renderer)
+        self.results = []
+        self.delivered = threading.Semaphore(0)
+
+    def tearDown(self):
+        self.renderer.may_render.set()
+        self.worker.stop()
+
+    def _on_rendered(self, result):
+        self.results.append(result)
+        self.delivered.release()
+
+    def _submit_while_rendering(self, *requests):
+        """Submits requests while the first one is being rendered."""
+        self.worker.submit(*requests[0], callback=self._on_rendered)
+        self.assertTrue(self.renderer.rendering.wait(5))
+        for request in requests[1:]:
+            self.worker.submit(*request, callback=self._on_rendered)
+
+    def test_latest_wins(self):
+        self._submit_while_rendering(('a.md', 1, 'one'), ('a.md', 2, 'two'), ('a.md', 3, 'three'))
+        self.renderer.may_render.set()
+
+        self.assertTrue(self.delivered.acquire(timeout=5))
+        self.assertEqual([('a.md', 3, ['three'])], [result[:3] for result in self.results])
+        statistics = self.worker.get_statistics()
+        self.assertEqual(3, statistics['submitted'])
+        self.assertEqual(1, statistics['rendered'])
+        self.assertEqual(2, statistics['superseded'])
+        self.assertEqual(0, statistics['queue_depth'])
+        self.assertEqual(['one', 'three'], self.renderer.payloads)
+
+    def test_notes_are_rendered_in_order(self):
+        self._submit_while_rendering(('a.md', 1, 'a'), ('b.md', 1, 'b'), ('c.md', 1, 'c\nd'))
+        self.assertEqual(2, self.worker.get_statistics()['queue_depth'])
+        self.renderer.may_render.set()
+
+        for _ in range(3):
+            self.assertTrue(self.delivered.acquire(timeout=5))
+        self.assertEqual(['a.md', 'b.md', 'c.md'], [result.note_id for result in self.results])
+        self.assertEqual(['c', 'd'], self.results[2].blocks)
+        statistics = self.worker.get_statistics()
+        self.assertEqual(3, statistics['rendered'])
+        self.assertEqual(0, statistics['superseded'])
+        self.assertGreaterEqual(statistics['max_latency'], statistics['average_latency'])
+        self.assertEqual(self.results[2].latency, statistics['last_latency'])
+
+    def test_failed_render(self):
+        self._submit_while_rendering(('a.md', 1, 'fail'), ('b.md', 1, 'b'))
+        self.renderer.may_render.set()
+
+        self.assertTrue(self.delivered.acquire(timeout=5))
+        self.assertEqual(['b.md'], [result.note_id for result in self.results])
+        self.assertEqual(1, self.worker.get_statistics()['rendered'])
+
+    def test_stop(self):
+        self._submit_while_rendering(('a.md', 1, 'a'), ('b.md', 1, 'b'))
+        stop_thread = threading.Thread(target=self.worker.stop)
+        stop_thread.start()
+        while self.worker.get_statistics()['queue_depth']:
+            stop_thread.join(0.01)
+        self.renderer.may_render.set()
+        stop_thread.join(5)
+
+        self.assertFalse(stop_thread.is_alive())
+        self.assertEqual([], self.results)
+        self.assertEqual(['a'], self.renderer.payloads)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase, mock
+
+from application.bus import EventBus
+from application.note import NotebookLoaded, NoteService
+from application.search import NotesFound, SearchNotesCommand, SearchService
+from notebook.dao.delayed_persist import DelayedPersistNoteRepository
+from notebook.dao.mem import InMemoryNoteRepository
+from notebook.dao.storage import StorageNoteRepository
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+
+
+class BlockingStorage(SimpleFileSystemStorage):
+    """Blocks the building of the index until may_build is set."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.building = threading.Event()
+        self.may_build = threading.Event()
+
+    def get_all_notes(self):
+        if threading.current_thread().name == 'fulltext-index':
+            self.building.set()
+            self.may_build.wait(5)
+        return super().get_all_notes()
+
+
+class BlockingNoteRepository(object):
+    """Blocks the first note lookup of the index build until may_index is set."""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.indexing = threading.Event()
+        self.may_index = threading.Event()
+
+    def get_note(self, note_id):
+        return self.repository.get_note(note_id)
+
+    def has_note(self, note_id):
+        if threading.current_thread().name == 'fulltext-index' and not self.indexing.is_set():
+            self.indexing.set()
+            self.may_index.wait(5)
+        return self.repository.has_note(note_id)
+
+
+class TestSearchService(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        notebook_dir = os.path.join(self.temp_dir, 'notebook')
+        os.makedirs(notebook_dir)
+        for note_id, text in (('A.md', 'apple banana'), ('B.md', 'banana cherry')):
+            with open(os.path.join(notebook_dir, note_id), 'w', encoding='utf-8') as f:
+                f.write(text)
+        self.storage = BlockingStorage(notebook_dir, index_path=os.path.join(self.temp_dir, 'index.json'))
+        self.bus = EventBus()
+        self.note_service = NoteService(
+            DelayedPersistNoteRepository(InMemoryNoteRepository(), StorageNoteRepository(self.storage)), self.bus)
+        self.service = SearchService(
+            self.bus, self.note_service.note_repository, self.storage, os.path.join(self.temp_dir, 'fulltext'),
+            processes=1)
+
+    def tearDown(self):
+        self.storage.may_build.set()
+        self.service.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _search(self, query):
+        return [result.note_id for result in self.service.search(query)]
+
+    def test_search_command(self):
+        found = []
+        self.bus.subscribe(NotesFound, found.append)
+        self.storage.may_build.set()
+        self.bus.publish(NotebookLoaded(list(self.storage.get_all_notes())))
+        self.service.close()
+
+        self.bus.publish(SearchNotesCommand('banana'))
+
+        self.assertEqual(['A.md', 'B.md'], sorted(result.note_id for result in found[0].results))
+
+    def test_changes_during_build(self):
+        self.bus.publish(NotebookLoaded(list(self.storage.get_all_notes())))
+        self.assertTrue(self.storage.building.wait(5))
+
+        self.note_service.update_note_payload('A.md', 'date')
+        # The search during the build indexes the change in the old index.
+        self.assertEqual(['A.md'], self._search('date'))
+        self.storage.may_build.set()
+        self.service.close()
+
+        self.assertEqual(['A.md'], self._search('date'))
+        self.assertEqual([], self._search('apple'))
+        self.assertEqual(['B.md'], self._search('cherry'))
+
+    @mock.patch.object(threading, 'excepthook')
+    def test_changes_while_changes_are_indexed(self, excepthook):
+        note_repository = BlockingNoteRepository(self.note_service.note_repository)
+        self.service.note_repository = note_repository
+        self.bus.publish(NotebookLoaded(list(self.storage.get_all_notes())))
+        self.assertTrue(self.storage.building.wait(5))
+        self.note_service.update_note_payload('A.md', 'date')
+        self.storage.may_build.set()
+        self.assertTrue(note_repository.indexing.wait(5))
+
+        update_thread = threading.Thread(target=self.note_service.update_note_payload, args=('B.md', 'elder'))
+        update_thread.start()
+        update_thread.join(0.1)
+        note_repository.may_index.set()
+        update_thread.join()
+        self.service.close()
+
+        self.assertEqual(['A.md'], self._search('date'))
+        self.assertEqual(['B.md'], self._search('elder'))
+        excepthook.assert_not_called()
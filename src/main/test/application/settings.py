@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from application.bus import EventBus
+from application.settings import Settings, SettingsController, SettingsRepository, WindowSizeAndLocation, \
+    WindowState
+
+
+class CountingSettingsRepository(SettingsRepository):
+    def __init__(self, config_file_path):
+        super().__init__(config_file_path)
+        self.load_count = 0
+        self.save_count = 0
+
+    def load(self):
+        self.load_count += 1
+        return super().load()
+
+    def save(self, settings):
+        super().save(settings)
+        self.save_count += 1
+
+
+class BlockingSettingsRepository(CountingSettingsRepository):
+    def __init__(self, config_file_path):
+        super().__init__(config_file_path)
+        self.saving = threading.Event()
+        self.may_save = threading.Event()
+
+    def save(self, settings):
+        self.saving.set()
+        self.may_save.wait(5)
+        super().save(settings)
+
+
+class TestSettingsRepository(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.repository = SettingsRepository(os.path.join(self.temp_dir, 'settings.cfg'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_defaults(self):
+        settings = self.repository.load()
+
+        self.assertIsNone(settings.window_size_and_location)
+        self.assertEqual(WindowState.NORMAL, settings.window_state)
+        self.assertEqual(300, settings.main_split_position)
+
+    def test_save_and_load(self):
+        self.repository.save(Settings(
+            window_size_and_location=WindowSizeAndLocation(800, 600, 10, 20),
+            window_state=WindowState.MAXIMIZED,
+            main_split_position=123,
+            editor_viewer_split_position=456))
+
+        settings = self.repository.load()
+
+        self.assertEqual(WindowSizeAndLocation(800, 600, 10, 20), settings.window_size_and_location)
+        self.assertEqual(WindowState.MAXIMIZED, settings.window_state)
+        self.assertEqual(123, settings.main_split_position)
+        self.assertEqual(456, settings.editor_viewer_split_position)
+        self.assertEqual(['settings.cfg'], os.listdir(self.temp_dir))
+
+
+class TestSettingsController(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.repository = CountingSettingsRepository(os.path.join(self.temp_dir, 'settings.cfg'))
+        self.bus = EventBus()
+        self.published = []
+        self.bus.subscribe(Settings, self.published.append)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def _set_main_split_position(position):
+        def f(settings):
+            settings.main_split_position = position
+        return f
+
+    def test_updates_are_kept_in_memory(self):
+        controller = SettingsController(self.repository, self.bus, flush_delay=60)
+        controller.load_settings()
+
+        for position in range(100):
+            controller.update(self._set_main_split_position(position))
+
+        self.assertEqual(1, len(self.published))
+        self.assertEqual(1, self.repository.load_count)
+        self.assertEqual(0, self.repository.save_count)
+        controller.close()
+        self.assertEqual(1, self.repository.save_count)
+        self.assertEqual(99, SettingsRepository(self.repository.config_file_path).load().main_split_position)
+
+    def test_debounced_flush(self):
+        controller = SettingsController(self.repository, self.bus, flush_delay=0.05)
+
+        for position in range(5):
+            controller.update(self._set_main_split_position(position))
+            time.sleep(0.02)
+        deadline = time.monotonic() + 5
+        while self.repository.save_count == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(1, self.repository.save_count)
+        self.assertEqual(4, SettingsRepository(self.repository.config_file_path).load().main_split_position)
+        controller.close()
+        self.assertEqual(1, self.repository.save_count)
+
+    def test_update_does_not_wait_for_save(self):
+        repository = BlockingSettingsRepository(self.repository.config_file_path)
+        controller = SettingsController(repository, self.bus, flush_delay=60)
+        controller.update(self._set_main_split_position(1))
+        flush_thread = threading.Thread(target=controller.flush, daemon=True)
+        flush_thread.start()
+        self.assertTrue(repository.saving.wait(5))
+
+        controller.update(self._set_main_split_position(2))
+        repository.may_save.set()
+        flush_thread.join(5)
+
+        self.assertEqual(1, SettingsRepository(repository.config_file_path).load().main_split_position)
+        controller.close()
+        self.assertEqual(2, repository.save_count)
+        self.assertEqual(2, SettingsRepository(repository.config_file_path).load().main_split_position)
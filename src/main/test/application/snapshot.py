@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from application.bus import EventBus
+from application.note import NotebookChanged, NotebookLoaded, NoteOpened, NoteService
+from application.snapshot import NotebookSnapshot, StartupSnapshotService, read_snapshot, write_snapshot
+from notebook.aggregate import FolderPath, Note
+from notebook.dao.delayed_persist import DelayedPersistNoteRepository
+from notebook.dao.mem import InMemoryNoteRepository
+from notebook.dao.storage import StorageNoteRepository
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+
+
+class TestSnapshotFile(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_write_and_read(self):
+        write_snapshot(self.path, NotebookSnapshot(
+            notebook_dir='/notebook',
+            notes=[
+                Note('Foo/A.md', 'A', FolderPath(['Foo'])),
+                Note('Foo/B.md', 'B', FolderPath(['Foo'])),
+                Note('C.md', 'C', FolderPath([])),
+            ],
+            open_note_id='Foo/B.md'))
+
+        snapshot = read_snapshot(self.path)
+
+        self.assertEqual('/notebook', snapshot.notebook_dir)
+        self.assertEqual(['Foo/A.md', 'Foo/B.md', 'C.md'], [note.note_id for note in snapshot.notes])
+        self.assertEqual(['A', 'B', 'C'], [note.title for note in snapshot.notes])
+        self.assertEqual(FolderPath(['Foo']), snapshot.notes[0].folder_path)
+        self.assertIs(snapshot.notes[0].folder_path, snapshot.notes[1].folder_path)
+        self.assertEqual('Foo/B.md', snapshot.open_note_id)
+
+    def test_read_unusable(self):
+        self.assertIsNone(read_snapshot(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(b'something else')
+        self.assertIsNone(read_snapshot(self.path))
+
+
+class TestStartupSnapshotService(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.notebook_dir = os.path.join(self.temp_dir, 'notebook')
+        self.snapshot_path = os.path.join(self.temp_dir, 'snapshot')
+        self._write('Root.md')
+        self._write(os.path.join('Foo', 'Shallow.md'))
+        self.events = []
+        self.loaded = []
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, note_id):
+        path = os.path.join(self.notebook_dir, note_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(note_id)
+
+    def _start(self):
+        bus = EventBus()
+        for event_type in (NotebookLoaded, NotebookChanged, NoteOpened):
+            bus.subscribe(event_type, self.events.append)
+        storage = SimpleFileSystemStorage(
+            self.notebook_dir, index_path=os.path.join(self.temp_dir, 'index.json'), scan_workers=1)
+        note_service = NoteService(
+            DelayedPersistNoteRepository(InMemoryNoteRepository(), StorageNoteRepository(storage)), bus)
+        service = StartupSnapshotService(
+            bus=bus,
+            note_service=note_service,
+            storage=storage,
+            snapshot_path=self.snapshot_path,
+            deliver=lambda function, event: function(event))
+        service.load_notebook(on_loaded=lambda: self.loaded.append(True))
+        return service, note_service
+
+    def test_without_snapshot(self):
+        service, _ = self._start()
+        service.close()
+
+        self.assertEqual([NotebookLoaded], [type(event) for event in self.events])
+        self.assertEqual(2, len(self.events[0].notes))
+        self.assertEqual([True], self.loaded)
+        self.assertEqual(2, len(read_snapshot(self.snapshot_path).notes))
+
+    def test_with_snapshot(self):
+        service, note_service = self._start()
+        note_service.set_open_note('Root.md')
+        service.close()
+        self._write(os.path.join('Foo', 'New.md'))
+        os.remove(os.path.join(self.notebook_dir, 'Root.md'))
+        self.events.clear()
+
+        service, note_service = self._start()
+        service.close()
+
+        self.assertEqual([NotebookLoaded, NotebookChanged], [type(event) for event in self.events])
+        self.assertEqual(
+            ['Foo/Shallow.md', 'Root.md'],
+            sorted(note.note_id.replace(os.sep, '/') for note in self.events[0].notes))
+        self.assertEqual([os.path.join('Foo', 'New.md')], [note.note_id for note in self.events[1].created_notes])
+        self.assertEqual(['Root.md'], self.events[1].deleted_note_ids)
+        self.assertEqual([True, True], self.loaded)
+        self.assertEqual(
+            [os.path.join('Foo', 'New.md'), os.path.join('Foo', 'Shallow.md')],
+            [note.note_id for note in read_snapshot(self.snapshot_path).notes])
+
+    def test_with_snapshot_restores_open_note(self):
+        service, note_service = self._start()
+        note_service.set_open_note('Root.md')
+        service.close()
+        self.events.clear()
+
+        service, note_service = self._start()
+        service.close()
+
+        self.assertEqual([NotebookLoaded, NoteOpened], [type(event) for event in self.events])
+        self.assertEqual('Root.md', note_service.open_note_id)
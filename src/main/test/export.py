@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import TestCase
+
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+
+try:
+    import export
+except ImportError:
+    export = None
+
+
+@unittest.skipIf(export is None, 'markdown is not available')
+class TestExportNotebook(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.notebook_dir = os.path.join(self.temp_dir, 'notebook')
+        self.output_dir = os.path.join(self.temp_dir, 'html')
+        self._write('Root.md', '# Root')
+        self._write(os.path.join('Foo', 'Deep.md'), 'Deep')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, note_id, text):
+        path = os.path.join(self.notebook_dir, note_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def _export(self, force=False):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=os.path.join(self.temp_dir, 'index.json'))
+        try:
+            return export.export_notebook(storage, self.output_dir, processes=1, force=force)
+        finally:
+            storage.close()
+
+    def test_export(self):
+        self.assertEqual((2, 0, 0), tuple(self._export()))
+
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'Root.html')))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'Foo', 'Deep.html')))
+        with open(os.path.join(self.output_dir, 'index.html'), encoding='utf-8') as f:
+            self.assertIn('href="Foo/Deep.html"', f.read())
+
+    def test_only_changed_notes_are_rendered(self):
+        self._export()
+        self._write('Root.md', '# Changed')
+
+        self.assertEqual((1, 1, 0), tuple(self._export()))
+        self.assertEqual((0, 2, 0), tuple(self._export()))
+
+    def test_removed_notes(self):
+        self._export()
+        os.remove(os.path.join(self.notebook_dir, 'Foo', 'Deep.md'))
+
+        self.assertEqual((1, 0, 1), tuple(self._export(force=True)))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'Foo', 'Deep.html')))
+        self.assertEqual((0, 1, 0), tuple(self._export()))
@@ -1,6 +1,8 @@
+import os
+import pickle
 from unittest import TestCase
 
-from notebook.aggregate import FolderPath
+from notebook.aggregate import FolderPath, Note, NotePayloadChanged, NotePayloadTextInserted
 
 
 class TestFolderPathTest(TestCase):
@@ -8,3 +10,61 @@ class TestFolderPathTest(TestCase):
         self.assertEqual(FolderPath(['Foo', 'Bar']), FolderPath.from_string('Foo/Bar'))
         self.assertEqual(FolderPath([]), FolderPath.from_string(''))
         self.assertEqual(FolderPath([]), FolderPath.from_string(None))
+
+    def test_shared(self):
+        folder_path = FolderPath.from_string('Foo/Bar'.replace('/', os.sep))
+
+        self.assertIs(folder_path, FolderPath(('Foo', 'Bar')))
+        self.assertEqual(('Foo', 'Bar'), folder_path.elements)
+        self.assertEqual(hash(FolderPath(['Foo', 'Bar'])), hash(folder_path))
+        self.assertNotEqual(FolderPath(['Foo']), folder_path)
+        self.assertIs(folder_path, pickle.loads(pickle.dumps(folder_path)))
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            FolderPath(['Foo']).elements = ('Bar',)
+
+
+class TestNoteTest(TestCase):
+    def test_insert_payload_text(self):
+        note = Note('Foo.md', 'Foo', FolderPath([]), 'Hello world')
+
+        event = note.insert_payload_text(5, ',')
+
+        self.assertEqual('Hello, world', note.payload)
+        self.assertEqual('Hello, world', event.apply_to('Hello world'))
+
+    def test_delete_payload_text(self):
+        note = Note('Foo.md', 'Foo', FolderPath([]), 'Hello, world')
+
+        event = note.delete_payload_text(5, 6)
+
+        self.assertEqual('Hello world', note.payload)
+        self.assertEqual('Hello world', event.apply_to('Hello, world'))
+
+    def test_delete_payload_text_outside_payload(self):
+        note = Note('Foo.md', 'Foo', FolderPath([]), 'Hello')
+
+        with self.assertRaises(ValueError):
+            note.delete_payload_text(3, 6)
+
+    def test_uncommitted_events(self):
+        note = Note('Foo.md', 'Foo', FolderPath([]), 'Hello')
+        note.insert_payload_text(5, ' world')
+        event = note.set_payload('Bye')
+
+        self.assertEqual(2, len(note.uncommitted_events))
+        note.mark_events_committed(1)
+        self.assertEqual([event], note.uncommitted_events)
+
+    def test_apply(self):
+        note = Note('Foo.md', None, None)
+
+        note.apply(Note('Foo.md', 'Foo', FolderPath(['Bar'])).create())
+        note.apply(NotePayloadChanged('Foo.md', 'Hello'))
+        note.apply(NotePayloadTextInserted('Foo.md', 5, ' world'))
+
+        self.assertEqual('Foo', note.title)
+        self.assertEqual(FolderPath(['Bar']), note.folder_path)
+        self.assertEqual('Hello world', note.payload)
+        self.assertEqual([], note.uncommitted_events)
@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from notebook.aggregate import FolderPath, Note
+from notebook.dao.cache import CachingNoteRepository
+from notebook.dao.mem import InMemoryNoteRepository
+
+
+class PayloadNoteRepository(InMemoryNoteRepository):
+    def __init__(self, notes):
+        super().__init__()
+        self.payload_loads = 0
+        for note in notes:
+            self.add_or_update_note(note)
+
+    def get_note_payload(self, note_id):
+        self.payload_loads += 1
+        return self.get_note(note_id).payload
+
+
+class TestCachingNoteRepository(TestCase):
+    def setUp(self):
+        self.backing_repository = PayloadNoteRepository([
+            Note(note_id, note_id, FolderPath([]), note_id * 100) for note_id in ['a', 'b', 'c']
+        ])
+
+    def test_get_note_loads_payload_lazily(self):
+        repository = CachingNoteRepository(self.backing_repository)
+        list(repository.get_all_notes())
+        self.assertEqual(0, self.backing_repository.payload_loads)
+
+        self.assertEqual('a' * 100, repository.get_note('a').payload)
+        self.assertEqual('a' * 100, repository.get_note('a').payload)
+
+        self.assertEqual(1, self.backing_repository.payload_loads)
+        statistics = repository.get_statistics()
+        self.assertEqual(1, statistics['hits'])
+        self.assertEqual(1, statistics['misses'])
+
+    def test_get_note_evicts_least_recently_used_payload(self):
+        repository = CachingNoteRepository(self.backing_repository, max_payload_bytes=400)
+        list(repository.get_all_notes())
+
+        repository.get_note('a')
+        repository.get_note('b')
+        repository.get_note('a')
+        repository.get_note('c')
+        repository.get_note('a')
+        repository.get_note('b')
+
+        self.assertEqual(4, self.backing_repository.payload_loads)
+        self.assertLessEqual(repository.get_statistics()['cached_payload_bytes'], 400)
+        self.assertEqual(2, repository.get_statistics()['evictions'])
+
+    def test_add_or_update_note_writes_through(self):
+        repository = CachingNoteRepository(self.backing_repository)
+        note = repository.get_note('a')
+        note.set_payload('changed')
+
+        repository.add_or_update_note(note)
+
+        self.assertEqual('changed', self.backing_repository.get_note('a').payload)
+        self.assertEqual('changed', repository.get_note('a').payload)
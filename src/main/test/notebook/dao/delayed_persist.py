@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from notebook.aggregate import FolderPath, Note
+from notebook.dao.delayed_persist import DelayedPersistNoteRepository
+from notebook.dao.mem import InMemoryNoteRepository
+
+
+class RecordingNoteRepository(InMemoryNoteRepository):
+    def __init__(self):
+        super().__init__()
+        self.written_note_ids = []
+
+    def add_or_update_note(self, note: Note):
+        super().add_or_update_note(note)
+        self.written_note_ids.append(note.note_id)
+
+
+class TestDelayedPersistNoteRepository(TestCase):
+    def setUp(self):
+        self.repository2 = RecordingNoteRepository()
+        self.repository = DelayedPersistNoteRepository(InMemoryNoteRepository(), self.repository2, max_batch_size=2)
+
+    @staticmethod
+    def _create_note(note_id, payload):
+        return Note(note_id, note_id, FolderPath([]), payload)
+
+    def test_persist_writes_dirty_notes_once(self):
+        note = self._create_note('a', '1')
+        self.repository.add_or_update_note(note)
+        note.set_payload('2')
+        self.repository.add_or_update_note(note)
+        self.repository.add_or_update_note(self._create_note('b', '1'))
+        self.repository.add_or_update_note(self._create_note('c', '1'))
+
+        self.assertEqual(3, self.repository.persist())
+        self.assertEqual(['a', 'b', 'c'], sorted(self.repository2.written_note_ids))
+        self.assertEqual('2', self.repository2.get_note('a').payload)
+        self.assertFalse(self.repository.is_dirty())
+
+    def test_persist_does_not_write_clean_notes(self):
+        self.repository.add_or_update_note(self._create_note('a', '1'))
+        self.repository.persist()
+
+        self.assertEqual(0, self.repository.persist())
+        self.assertEqual(['a'], self.repository2.written_note_ids)
+
+    def test_persist_keeps_notes_dirty_on_failure(self):
+        def fail(note):
+            raise IOError()
+
+        self.repository2.add_or_update_note = fail
+        self.repository.add_or_update_note(self._create_note('a', '1'))
+
+        with self.assertRaises(IOError):
+            self.repository.persist()
+        self.assertTrue(self.repository.is_dirty())
+
+    def test_close_persists_dirty_notes(self):
+        self.repository.start_autosave()
+        self.repository.add_or_update_note(self._create_note('a', '1'))
+
+        self.repository.close()
+
+        self.assertEqual(['a'], self.repository2.written_note_ids)
@@ -0,0 +1,168 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from notebook.aggregate import FolderPath, Note, NoteCreated, NotePayloadTextInserted
+from notebook.dao.cache import CachingNoteRepository
+from notebook.dao.event_store import EventSourcedNoteRepository, SNAPSHOTS_FILE_NAME, EVENTS_FILE_NAME, \
+    CHECKPOINT_FILE_NAME
+from notebook.storage import NoteDoesNotExistError
+
+
+class TestEventSourcedNoteRepository(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.repository = self._open()
+
+    def tearDown(self):
+        self.repository.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _open(self):
+        return EventSourcedNoteRepository(self.temp_dir, snapshot_interval=10)
+
+    def _reopen(self):
+        self.repository.close()
+        self.repository = self._open()
+
+    def _create_note(self, payload='Hello'):
+        note = Note('Foo.md', 'Foo', FolderPath(['Bar']))
+        note.create()
+        note.set_payload(payload)
+        self.repository.add_or_update_note(note)
+        return note
+
+    def test_add_and_get_note(self):
+        note = self._create_note()
+        note.insert_payload_text(5, ' world')
+        self.repository.add_or_update_note(note)
+
+        self.assertEqual([], note.uncommitted_events)
+        loaded_note = self.repository.get_note('Foo.md')
+        self.assertEqual('Hello world', loaded_note.payload)
+        self.assertEqual('Foo', loaded_note.title)
+        self.assertEqual(FolderPath(['Bar']), loaded_note.folder_path)
+        self.assertEqual(['Foo.md'], [note.note_id for note in self.repository.get_all_notes()])
+        self.assertTrue(self.repository.has_note('Foo.md'))
+        self.assertFalse(self.repository.has_note('Missing.md'))
+        with self.assertRaises(NoteDoesNotExistError):
+            self.repository.get_note('Missing.md')
+
+    def test_note_without_events(self):
+        self.repository.add_or_update_note(Note('Foo.md', 'Foo', FolderPath([]), 'Hello'))
+        self.repository.add_or_update_note(Note('Foo.md', 'Foo', FolderPath([]), 'Hello'))
+        self.repository.add_or_update_note(Note('Foo.md', 'Foo', FolderPath([]), 'Bye'))
+
+        self.assertEqual('Bye', self.repository.get_note('Foo.md').payload)
+        self.assertEqual(3, self.repository.get_note_version('Foo.md'))
+
+    def test_events_of_note_loaded_elsewhere(self):
+        note = Note('Foo.md', 'Foo', FolderPath(['Bar']), 'Hello')
+        note.insert_payload_text(5, ' world')
+        self.repository.add_or_update_note(note)
+
+        self.assertEqual('Hello world', self.repository.get_note('Foo.md').payload)
+
+        note = Note('Foo.md', 'Foo', FolderPath(['Bar']), 'Stale')
+        note.insert_payload_text(5, '!')
+        self.repository.add_or_update_note(note)
+        self._reopen()
+
+        self.assertEqual('Stale!', self.repository.get_note('Foo.md').payload)
+
+    def test_history(self):
+        note = self._create_note()
+        note.delete_payload_text(0, 1)
+        note.insert_payload_text(0, 'J')
+        self.repository.add_or_update_note(note)
+
+        history = self.repository.get_note_history('Foo.md')
+
+        self.assertEqual(4, len(history))
+        self.assertIsInstance(history[0], NoteCreated)
+        self.assertEqual('Foo', history[0].note.title)
+        self.assertIsInstance(history[3], NotePayloadTextInserted)
+        self.assertEqual('J', history[3].text)
+        self.assertEqual(2, len(self.repository.get_note_history('Foo.md', since_version=2)))
+        replayed_note = Note('Foo.md', None, None)
+        for event in history:
+            replayed_note.apply(event)
+        self.assertEqual('Jello', replayed_note.payload)
+
+    def test_snapshots(self):
+        note = self._create_note(payload='')
+        for i in range(25):
+            note.insert_payload_text(i, str(i % 10))
+            self.repository.add_or_update_note(note)
+
+        self.assertEqual(27, self.repository.get_note_version('Foo.md'))
+        with open(os.path.join(self.temp_dir, SNAPSHOTS_FILE_NAME), 'rb') as snapshots_file:
+            self.assertEqual(2, len(snapshots_file.readlines()))
+        self.assertEqual('0123456789' * 2 + '01234', self.repository.get_note('Foo.md').payload)
+
+    def test_reopen(self):
+        note = self._create_note(payload='')
+        for i in range(15):
+            note.insert_payload_text(i, 'x')
+            self.repository.add_or_update_note(note)
+
+        self._reopen()
+        note = self.repository.get_note('Foo.md')
+        note.insert_payload_text(0, 'y')
+        self.repository.add_or_update_note(note)
+        # Without a checkpoint, the logs are read from the start.
+        self.repository.close()
+        os.remove(os.path.join(self.temp_dir, CHECKPOINT_FILE_NAME))
+        self.repository = self._open()
+
+        self.assertEqual('y' + 'x' * 15, self.repository.get_note('Foo.md').payload)
+        self.assertEqual(18, len(self.repository.get_note_history('Foo.md')))
+
+    def test_reopen_after_crash(self):
+        self._create_note()
+        self.repository.close()
+        with open(os.path.join(self.temp_dir, EVENTS_FILE_NAME), 'ab') as events_file:
+            events_file.write(b'{"version":3,"ev')
+
+        self.repository = self._open()
+        note = self.repository.get_note('Foo.md')
+        note.set_payload('Bye')
+        self.repository.add_or_update_note(note)
+        self._reopen()
+
+        self.assertEqual('Bye', self.repository.get_note('Foo.md').payload)
+        self.assertEqual(3, self.repository.get_note_version('Foo.md'))
+
+    def test_remove_note(self):
+        note = self._create_note(payload='')
+        for i in range(12):
+            note.insert_payload_text(i, 'x')
+            self.repository.add_or_update_note(note)
+
+        self.repository.remove_note('Foo.md')
+
+        self.assertFalse(self.repository.has_note('Foo.md'))
+        with self.assertRaises(NoteDoesNotExistError):
+            self.repository.remove_note('Foo.md')
+        note = self._create_note(payload='')
+        for i in range(10):
+            note.insert_payload_text(i, 'y')
+            self.repository.add_or_update_note(note)
+        # Without a checkpoint, the snapshot of the removed note must not be used.
+        self.repository.close()
+        os.remove(os.path.join(self.temp_dir, CHECKPOINT_FILE_NAME))
+        self.repository = self._open()
+        self.assertEqual('y' * 10, self.repository.get_note('Foo.md').payload)
+        self.assertEqual(12, self.repository.get_note_version('Foo.md'))
+
+    def test_caching_repository(self):
+        self._create_note()
+        repository = CachingNoteRepository(self.repository)
+
+        self.assertEqual(['Foo.md'], [note.note_id for note in repository.get_all_notes()])
+        self.assertEqual('Hello', repository.get_note('Foo.md').payload)
+        self.assertEqual('Hello', repository.get_note('Foo.md').payload)
+        self.assertEqual(1, repository.get_statistics()['hits'])
+        repository.remove_note('Foo.md')
+        self.assertFalse(repository.has_note('Foo.md'))
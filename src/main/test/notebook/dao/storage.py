@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from notebook.dao.storage import StorageNoteRepository
+from notebook.storage.index import compute_content_hash
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+
+
+class TestStorageNoteRepository(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.notebook_dir = os.path.join(self.temp_dir, 'notebook')
+        os.makedirs(self.notebook_dir)
+        with open(os.path.join(self.notebook_dir, 'Note.md'), 'w', encoding='utf-8') as f:
+            f.write('payload')
+        self.storage = SimpleFileSystemStorage(self.notebook_dir, index_path=os.path.join(self.temp_dir, 'index.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_get_note(self):
+        note = StorageNoteRepository(self.storage).get_note('Note.md')
+
+        self.assertEqual('Note', note.title)
+        self.assertEqual('payload', note.payload)
+
+    def test_get_note_records_content_hash(self):
+        list(self.storage.get_all_notes())
+        self.assertIsNone(self.storage.index.get_note('Note.md').content_hash)
+
+        StorageNoteRepository(self.storage).get_note('Note.md')
+
+        self.assertEqual(compute_content_hash(b'payload'), self.storage.index.get_note('Note.md').content_hash)
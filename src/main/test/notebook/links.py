@@ -0,0 +1,76 @@
+import os
+from unittest import TestCase
+
+from notebook.links import LinkGraph, parse_links
+
+
+def _id(path):
+    return path.replace('/', os.sep)
+
+
+class TestParseLinks(TestCase):
+    def test_relative_links(self):
+        payload = '\n'.join([
+            'See [a sibling](Sibling.md), [a child](Sub/Child%20Note.md#heading) and [the parent](../Parent.md).',
+            '[ref]: <Reference.md>',
+            '![an image](Image.md) and [a site](https://example.com/Page.md) and [an anchor](#Local.md)',
+            '[outside](../../Outside.md) [absolute](/Absolute.md) [text](Notes.txt)',
+            '`[code](Code.md)`',
+            '```',
+            '[fenced](Fenced.md)',
+            '```',
+        ])
+
+        self.assertEqual(
+            {_id('Foo/Sibling.md'), _id('Foo/Sub/Child Note.md'), 'Parent.md', _id('Foo/Reference.md')},
+            parse_links(_id('Foo/Note.md'), payload))
+
+    def test_targets_in_angle_brackets(self):
+        payload = '\n'.join([
+            '[spaces](<My Note.md>) [title](<Sub/Other Note.md> "Title") [empty](<>)',
+            '[ref]:  <Reference Note.md> "Title"',
+        ])
+
+        self.assertEqual(
+            {'My Note.md', _id('Sub/Other Note.md'), 'Reference Note.md'},
+            parse_links('Note.md', payload))
+
+    def test_no_links(self):
+        self.assertEqual(set(), parse_links('Note.md', 'Just text.'))
+        self.assertEqual(set(), parse_links('Note.md', None))
+
+
+class TestLinkGraph(TestCase):
+    def setUp(self):
+        self.graph = LinkGraph()
+        self.graph.set_note('A.md', ['B.md', 'Missing.md'])
+        self.graph.set_note('B.md', ['A.md'])
+        self.graph.set_note('C.md', ['B.md'])
+
+    def test_backlinks(self):
+        self.assertEqual({'A.md', 'C.md'}, self.graph.get_backlinks('B.md'))
+        self.assertEqual({'B.md'}, self.graph.get_backlinks('A.md'))
+        self.assertEqual(frozenset(), self.graph.get_backlinks('C.md'))
+        self.assertEqual({'B.md', 'Missing.md'}, self.graph.get_links('A.md'))
+
+    def test_update_note(self):
+        self.graph.update_note('C.md', 'Now [A](A.md) instead.')
+
+        self.assertEqual({'A.md'}, self.graph.get_backlinks('B.md'))
+        self.assertEqual({'B.md', 'C.md'}, self.graph.get_backlinks('A.md'))
+
+    def test_broken_links(self):
+        self.assertEqual([('A.md', 'Missing.md')], self.graph.get_broken_links())
+
+        self.graph.set_note('Missing.md', [])
+        self.assertEqual([], self.graph.get_broken_links())
+
+        self.graph.remove_note('B.md')
+        self.assertEqual(
+            [('A.md', 'B.md'), ('C.md', 'B.md')],
+            sorted(self.graph.get_broken_links()))
+        self.assertEqual(frozenset(), self.graph.get_backlinks('A.md'))
+
+        self.graph.set_note('A.md', [])
+        self.graph.set_note('C.md', [])
+        self.assertEqual([], self.graph.get_broken_links())
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase, mock
+
+from notebook.search.fulltext import FullTextIndex
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+
+
+class TestFullTextIndex(TestCase):
+    def setUp(self):
+        self.index = FullTextIndex()
+        self.index.index_note('a.md', 'The quick brown fox jumps over the lazy dog')
+        self.index.index_note('b.md', 'A brown dog. The dog is quick, the fox is not.')
+        self.index.index_note('c.md', 'Nothing to see here')
+
+    def test_search_words(self):
+        self.assertEqual({'a.md', 'b.md'}, {result.note_id for result in self.index.search('Quick FOX')})
+        self.assertEqual([], self.index.search('quick cat'))
+
+    def test_search_ranks_by_frequency(self):
+        self.assertEqual(['b.md', 'a.md'], [result.note_id for result in self.index.search('dog')])
+
+    def test_search_phrase(self):
+        self.assertEqual(['a.md'], [result.note_id for result in self.index.search('"brown fox"')])
+        self.assertEqual(['b.md'], [result.note_id for result in self.index.search('"brown dog" quick')])
+
+    def test_index_note_replaces_payload(self):
+        self.index.index_note('c.md', 'A quick fox')
+        self.index.remove_note('a.md')
+
+        self.assertEqual({'b.md', 'c.md'}, {result.note_id for result in self.index.search('quick fox')})
+        self.assertEqual([], self.index.search('lazy'))
+
+
+class TestFullTextIndexBuild(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.notebook_dir = os.path.join(self.temp_dir, 'notebook')
+        os.makedirs(self.notebook_dir)
+        for name, text in [('a.md', 'apple banana'), ('b.md', 'banana cherry')]:
+            with open(os.path.join(self.notebook_dir, name), 'w', encoding='utf-8') as f:
+                f.write(text)
+        self.storage = SimpleFileSystemStorage(self.notebook_dir, index_path=os.path.join(self.temp_dir, 'index'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_build_save_load(self):
+        index = FullTextIndex()
+        self.assertEqual(2, index.build(self.storage, processes=1))
+        path = os.path.join(self.temp_dir, 'fulltext')
+        index.save(path)
+
+        loaded_index = FullTextIndex.load(path)
+
+        self.assertEqual(['b.md'], [result.note_id for result in loaded_index.search('cherry')])
+        self.assertEqual(0, loaded_index.build(self.storage, processes=1))
+
+    def test_build_in_processes(self):
+        for i in range(10):
+            with open(os.path.join(self.notebook_dir, 'n{i}.md'.format(i=i)), 'w', encoding='utf-8') as f:
+                f.write('banana number{i}'.format(i=i))
+        index = FullTextIndex()
+        index.index_note('deleted.md', 'banana')
+
+        self.assertEqual(12, index.build(self.storage, processes=2, chunk_size=3))
+
+        self.assertEqual(12, len(index))
+        self.assertEqual(['n7.md'], [result.note_id for result in index.search('number7')])
+        self.assertEqual(12, len(index.search('banana')))
+        self.assertEqual(0, index.build(self.storage, processes=2, chunk_size=3))
+
+    def test_build_reads_every_payload_once(self):
+        with mock.patch.object(self.storage, 'get_note_payload', wraps=self.storage.get_note_payload) as get_payload:
+            self.assertEqual(2, FullTextIndex().build(self.storage, processes=1))
+
+        self.assertEqual(['a.md', 'b.md'], sorted(call.args[0] for call in get_payload.call_args_list))
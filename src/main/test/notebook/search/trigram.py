@@ -0,0 +1,65 @@
+from unittest import TestCase
+
+from notebook.search.trigram import TrigramIndex, get_trigrams
+
+
+class TestTrigramIndex(TestCase):
+    def setUp(self):
+        self.index = TrigramIndex()
+        self.index.add('1', 'Shopping list', 'home')
+        self.index.add('2', 'Reading list', 'books')
+        self.index.add('3', 'Listening', 'music')
+        self.index.add('4', 'Recipes', 'home/cooking')
+
+    def test_get_trigrams(self):
+        self.assertEqual({'abc', 'bcd'}, get_trigrams('abcd'))
+        self.assertEqual(set(), get_trigrams('ab'))
+
+    def test_search_ranks_title_prefix_then_title_then_path(self):
+        self.index.add('5', 'Notes', 'lists')
+
+        keys = [match.key for match in self.index.search('LIST', min_similarity=None)]
+
+        self.assertEqual(['3', '2', '1', '5'], keys)
+
+    def test_search_short_query(self):
+        self.assertEqual(['4', '2'], [match.key for match in self.index.search('re')])
+        self.assertEqual(['3'], [match.key for match in self.index.search('l')])
+        self.assertEqual([], self.index.search('ci'))
+
+    def test_short_query_does_not_narrow_next_results(self):
+        self.assertEqual({'3'}, self.index.find('li', min_similarity=None))
+
+        self.assertEqual({'1', '2', '3'}, self.index.find('lis', min_similarity=None))
+
+    def test_search_path(self):
+        self.assertEqual({'1', '4'}, {match.key for match in self.index.search('home', min_similarity=None)})
+
+    def test_search_fuzzy(self):
+        matches = self.index.search('recipies')
+
+        self.assertEqual(['4'], [match.key for match in matches])
+        self.assertLess(matches[0].score, 1)
+
+    def test_search_fuzzy_needs_two_trigrams(self):
+        self.index.add('5', 'Abc')
+        self.index.add('6', 'Xbcd')
+        self.index.add('7', 'Abcde')
+
+        self.assertEqual(['7'], [match.key for match in self.index.search('abcd')])
+        self.assertEqual(['7'], [match.key for match in self.index.search('abcdx')])
+
+    def test_search_narrows_previous_results(self):
+        self.assertEqual({'1', '2', '3'}, self.index.find('lis', min_similarity=None))
+        self.assertEqual({'1', '2'}, self.index.find('g list', min_similarity=None))
+        self.assertEqual({'3'}, self.index.find('listen', min_similarity=None))
+
+    def test_add_and_remove_invalidate_previous_results(self):
+        self.assertEqual({'1', '2', '3'}, self.index.find('lis', min_similarity=None))
+        self.index.add('5', 'Checklist')
+        self.index.remove('1')
+
+        self.assertEqual({'2', '3', '5'}, self.index.find('list', min_similarity=None))
+
+    def test_search_limit(self):
+        self.assertEqual(['3'], [match.key for match in self.index.search('list', limit=1)])
@@ -0,0 +1,101 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from notebook.aggregate import FolderPath, Note
+from notebook.storage import NoteDoesNotExistError
+from notebook.storage.index import compute_content_hash
+from notebook.storage import log
+from notebook.storage.log import LogStructuredStorage
+
+
+class TestLogStructuredStorage(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.storage = self._open()
+        self.storage.add_note(Note(note_id='Root.md', title='Root', folder_path=FolderPath([])))
+        self.storage.add_note(
+            Note(note_id=os.path.join('Foo', 'Deep.md'), title='Deep', folder_path=FolderPath(['Foo'])))
+        self.storage.set_note_payload('Root.md', 'main', io.BytesIO(b'root'))
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _open(self):
+        return LogStructuredStorage(self.temp_dir, max_segment_size=256)
+
+    def _reopen(self):
+        self.storage.close()
+        self.storage = self._open()
+
+    def _read(self, note_id):
+        with self.storage.get_note_payload(note_id, 'main') as payload_file:
+            return payload_file.read()
+
+    def test_get_notes(self):
+        self.assertEqual(
+            [os.path.join('Foo', 'Deep.md'), 'Root.md'],
+            [note.note_id for note in self.storage.get_all_notes()])
+        self.assertEqual(FolderPath(['Foo']), self.storage.get_note(os.path.join('Foo', 'Deep.md')).folder_path)
+        self.assertFalse(self.storage.has_note('Missing.md'))
+        with self.assertRaises(NoteDoesNotExistError):
+            self.storage.set_note_payload('Missing.md', 'main', io.BytesIO(b''))
+
+    def test_payloads(self):
+        self.storage.set_note_payload('Root.md', 'main', io.BytesIO(b'changed'))
+
+        self.assertEqual(b'changed', self._read('Root.md'))
+        with self.storage.open_note_payload_buffer('Root.md', 'main') as buffer:
+            self.assertEqual(b'changed', bytes(buffer))
+        self.assertEqual(compute_content_hash(b'changed'), self.storage.get_note_payload_hash('Root.md', 'main'))
+
+    def test_reopen_from_hint_files(self):
+        for i in range(20):
+            self.storage.set_note_payload('Root.md', 'main', io.BytesIO('revision {i}'.format(i=i).encode('utf-8')))
+
+        self._reopen()
+
+        self.assertEqual(2, len(list(self.storage.get_all_notes())))
+        self.assertEqual(b'revision 19', self._read('Root.md'))
+
+    def test_reopen_after_crash(self):
+        self.storage.set_note_payload('Root.md', 'main', io.BytesIO(b'latest'))
+        self.storage.close()
+        hint_names = sorted(name for name in os.listdir(self.temp_dir) if name.endswith('.hint'))
+        os.remove(os.path.join(self.temp_dir, hint_names[-1]))
+        with open(os.path.join(self.temp_dir, hint_names[-1][:-5] + '.log'), 'ab') as f:
+            f.write(b'\x01\x02partial record')
+
+        self.storage = self._open()
+
+        self.assertEqual(b'latest', self._read('Root.md'))
+        self.assertIn(hint_names[-1], os.listdir(self.temp_dir))
+        self._reopen()
+        self.assertEqual(b'latest', self._read('Root.md'))
+
+    def test_segment_with_five_digit_minor(self):
+        self.storage.set_note_payload('Root.md', 'main', io.BytesIO(b'latest'))
+        self.storage.close()
+        self.assertEqual('00000001-10000.log', log._get_segment_file_name((1, 10000), 'log'))
+        for name in os.listdir(self.temp_dir):
+            os.rename(os.path.join(self.temp_dir, name), os.path.join(self.temp_dir, name.replace('-0000.', '-10000.')))
+
+        self.storage = self._open()
+
+        self.assertEqual(b'latest', self._read('Root.md'))
+
+    def test_compact(self):
+        for i in range(50):
+            self.storage.set_note_payload('Root.md', 'main', io.BytesIO('revision {i}'.format(i=i).encode('utf-8')))
+        self.assertGreater(self.storage.get_garbage_ratio(), 0.5)
+
+        self.assertGreater(self.storage.compact(), 0)
+
+        self.assertEqual(0.0, self.storage.get_garbage_ratio())
+        self.assertEqual(b'revision 49', self._read('Root.md'))
+        self._reopen()
+        self.assertEqual(b'revision 49', self._read('Root.md'))
+        self.assertEqual('Deep', self.storage.get_note(os.path.join('Foo', 'Deep.md')).title)
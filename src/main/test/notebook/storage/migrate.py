@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from notebook.storage.migrate import migrate
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+from notebook.storage.sqlite import SqliteStorage
+
+
+class TestMigrate(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.notebook_dir = os.path.join(self.temp_dir, 'notebook')
+        for note_id, text in [('Root.md', 'root'), (os.path.join('Foo', 'Note.md'), 'note')]:
+            path = os.path.join(self.notebook_dir, note_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_migrate(self):
+        source = SimpleFileSystemStorage(self.notebook_dir, index_path=os.path.join(self.temp_dir, 'index.json'))
+        target = SqliteStorage(os.path.join(self.temp_dir, 'notebook.sqlite'))
+        try:
+            self.assertEqual(2, migrate(source, target, batch_size=1))
+            self.assertEqual(2, migrate(source, target))
+
+            self.assertEqual(
+                sorted(note.note_id for note in source.get_all_notes()),
+                [note.note_id for note in target.get_all_notes()])
+            with target.get_note_payload(os.path.join('Foo', 'Note.md'), 'main') as payload_file:
+                self.assertEqual(b'note', payload_file.read())
+        finally:
+            target.close()
@@ -0,0 +1,168 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from notebook.aggregate import FolderPath
+from notebook.storage.index import compute_content_hash
+from notebook.storage.simple_fs import SimpleFileSystemStorage
+
+
+class TestSimpleFileSystemStorage(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.notebook_dir = os.path.join(self.temp_dir, 'notebook')
+        self.index_path = os.path.join(self.temp_dir, 'index.json')
+        self._write('Root.md', 'root')
+        self._write(os.path.join('Foo', 'Bar', 'Deep.md'), 'deep')
+        self._write(os.path.join('Foo', 'Shallow.md'), 'shallow')
+        self._write(os.path.join('Foo', 'image.gif'), 'not a note')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, note_id, text):
+        path = os.path.join(self.notebook_dir, note_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def _get_all_note_ids(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+        return [note.note_id for note in storage.get_all_notes()]
+
+    def test_get_all_notes(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+
+        notes = list(storage.get_all_notes())
+
+        self.assertEqual(
+            ['Root.md', os.path.join('Foo', 'Shallow.md'), os.path.join('Foo', 'Bar', 'Deep.md')],
+            [note.note_id for note in notes])
+        self.assertEqual('Deep', notes[2].title)
+        self.assertEqual(FolderPath(['Foo', 'Bar']), notes[2].folder_path)
+
+    def test_get_all_notes_from_index(self):
+        expected = self._get_all_note_ids()
+        self.assertTrue(os.path.exists(self.index_path))
+
+        self.assertEqual(expected, self._get_all_note_ids())
+
+    def test_get_all_notes_rescans_modified_directory(self):
+        self._get_all_note_ids()
+        os.remove(os.path.join(self.notebook_dir, 'Foo', 'Shallow.md'))
+        self._write(os.path.join('Foo', 'Bar', 'New.md'), 'new')
+
+        self.assertEqual(
+            ['Root.md', os.path.join('Foo', 'Bar', 'Deep.md'), os.path.join('Foo', 'Bar', 'New.md')],
+            self._get_all_note_ids())
+
+    def test_set_note_payload(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+        list(storage.get_all_notes())
+
+        storage.set_note_payload('Root.md', 'main', io.BytesIO(b'changed'))
+
+        with storage.get_note_payload('Root.md', 'main') as f:
+            self.assertEqual(b'changed', f.read())
+        self.assertIsNotNone(storage.index.get_note('Root.md').content_hash)
+
+    def test_set_note_payload_skips_unchanged_payload(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+        list(storage.get_all_notes())
+        storage.set_note_payload('Root.md', 'main', io.BytesIO(b'changed'))
+        path = os.path.join(self.notebook_dir, 'Root.md')
+        os.utime(path, ns=(1000000000, 1000000000))
+        storage.get_note_payload_hash('Root.md', 'main')
+
+        storage.set_note_payload('Root.md', 'main', io.BytesIO(b'changed'))
+
+        self.assertEqual(1000000000, os.stat(path).st_mtime_ns)
+
+    def test_get_note_payload_hash(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+        list(storage.get_all_notes())
+        original_hash = storage.get_note_payload_hash('Root.md', 'main')
+
+        self._write('Root.md', 'modified outside')
+
+        self.assertNotEqual(original_hash, storage.get_note_payload_hash('Root.md', 'main'))
+
+    def test_get_known_note_payload_hash(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+        list(storage.get_all_notes())
+        self.assertIsNone(storage.get_known_note_payload_hash('Root.md', 'main'))
+
+        payload_hash = storage.get_note_payload_hash('Root.md', 'main')
+
+        self.assertEqual(payload_hash, storage.get_known_note_payload_hash('Root.md', 'main'))
+
+    def test_open_note_payload_buffer(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+
+        with storage.open_note_payload_buffer('Root.md', 'main') as buffer:
+            self.assertEqual(b'root', bytes(buffer))
+
+    def test_open_note_payload_buffer_records_content_hash(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+        list(storage.get_all_notes())
+
+        with storage.open_note_payload_buffer('Root.md', 'main'):
+            pass
+
+        self.assertEqual(compute_content_hash(b'root'), storage.index.get_note('Root.md').content_hash)
+
+    def test_open_note_payload_buffer_of_empty_file(self):
+        self._write('Empty.md', '')
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+
+        with storage.open_note_payload_buffer('Empty.md', 'main') as buffer:
+            self.assertEqual(b'', bytes(buffer))
+
+    def test_refresh_directories(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+        list(storage.get_all_notes())
+        storage.set_note_payload('Root.md', 'main', io.BytesIO(b'written by the storage'))
+        self._write(os.path.join('Foo', 'Shallow.md'), 'modified outside')
+        self._write(os.path.join('Foo', 'New', 'Created.md'), 'created')
+        shutil.rmtree(os.path.join(self.notebook_dir, 'Foo', 'Bar'))
+
+        changes = storage.refresh_directories(['', 'Foo'])
+
+        self.assertEqual({os.path.join('Foo', 'New', 'Created.md')}, changes.created)
+        self.assertEqual({os.path.join('Foo', 'Shallow.md')}, changes.modified)
+        self.assertEqual({os.path.join('Foo', 'Bar', 'Deep.md')}, changes.deleted)
+        self.assertEqual((set(), set(), set()), storage.refresh_directories([''], recursive=True))
+
+    def test_refresh_deleted_directory(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+        list(storage.get_all_notes())
+        shutil.rmtree(os.path.join(self.notebook_dir, 'Foo'))
+
+        changes = storage.refresh_directories([os.path.join('Foo', 'Bar')])
+
+        self.assertEqual({os.path.join('Foo', 'Bar', 'Deep.md')}, changes.deleted)
+        self.assertEqual(
+            {os.path.join('Foo', 'Shallow.md')},
+            storage.refresh_directories([''], recursive=True).deleted)
+
+    def test_refresh_directories_while_writing(self):
+        storage = SimpleFileSystemStorage(self.notebook_dir, index_path=self.index_path)
+        list(storage.get_all_notes())
+        stopped = threading.Event()
+
+        def write():
+            for i in range(300):
+                storage.set_note_payload('Root.md', 'main', io.BytesIO(b'x' * (i % 50 + 1)))
+            stopped.set()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        changes = []
+        while not stopped.is_set():
+            changes.append(storage.refresh_directories(['']))
+        writer.join()
+
+        self.assertEqual([], [change for change in changes if change.modified])
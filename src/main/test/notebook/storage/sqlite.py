@@ -0,0 +1,67 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from notebook.aggregate import FolderPath, Note
+from notebook.storage import NoteDoesNotExistError
+from notebook.storage.index import compute_content_hash
+from notebook.storage.sqlite import SqliteStorage
+
+
+class TestSqliteStorage(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'notebook.sqlite')
+        self.storage = SqliteStorage(self.path)
+        self.storage.add_notes([
+            Note(note_id='Root.md', title='Root', folder_path=FolderPath([])),
+            Note(note_id=os.path.join('Foo', 'Bar', 'Deep.md'), title='Deep', folder_path=FolderPath(['Foo', 'Bar'])),
+        ])
+        self.storage.set_note_payloads([
+            ('Root.md', 'main', b'root'),
+            (os.path.join('Foo', 'Bar', 'Deep.md'), 'main', b'deep'),
+        ])
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_get_all_notes(self):
+        notes = list(self.storage.get_all_notes())
+
+        self.assertEqual([os.path.join('Foo', 'Bar', 'Deep.md'), 'Root.md'], [note.note_id for note in notes])
+        self.assertEqual('Deep', notes[0].title)
+        self.assertEqual(FolderPath(['Foo', 'Bar']), notes[0].folder_path)
+
+    def test_get_note(self):
+        self.assertEqual('Root', self.storage.get_note('Root.md').title)
+        self.assertTrue(self.storage.has_note('Root.md'))
+        self.assertFalse(self.storage.has_note('Missing.md'))
+        with self.assertRaises(NoteDoesNotExistError):
+            self.storage.get_note('Missing.md')
+
+    def test_payloads(self):
+        self.storage.set_note_payload('Root.md', 'main', io.BytesIO(b'changed'))
+
+        with self.storage.get_note_payload('Root.md', 'main') as payload_file:
+            self.assertEqual(b'changed', payload_file.read())
+        with self.storage.open_note_payload_buffer('Root.md', 'main') as buffer:
+            self.assertEqual(b'changed', bytes(buffer))
+        self.assertEqual(compute_content_hash(b'changed'), self.storage.get_note_payload_hash('Root.md', 'main'))
+        self.assertEqual({'Root.md': b'changed'}, self.storage.get_note_payloads(['Root.md', 'Missing.md'], 'main'))
+
+    def test_set_note_payloads_is_atomic(self):
+        with self.assertRaises(NoteDoesNotExistError):
+            self.storage.set_note_payloads([('Root.md', 'main', b'changed'), ('Missing.md', 'main', b'missing')])
+
+        with self.storage.get_note_payload('Root.md', 'main') as payload_file:
+            self.assertEqual(b'root', payload_file.read())
+
+    def test_reopen(self):
+        self.storage.close()
+        self.storage = SqliteStorage(self.path)
+
+        self.assertEqual(2, len(list(self.storage.get_all_notes())))
+        self.assertEqual('wal', self.storage._connection.execute('PRAGMA journal_mode').fetchone()[0])
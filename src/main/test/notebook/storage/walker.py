@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from unittest import TestCase
+
+from notebook.storage.walker import ParallelDirectoryWalker
+
+TREE = {
+    '': ['b', 'a'],
+    'b': ['d', 'c'],
+    os.path.join('b', 'd'): [],
+    os.path.join('b', 'c'): [],
+    'a': ['e'],
+    os.path.join('a', 'e'): [],
+}
+
+
+class TestParallelDirectoryWalker(TestCase):
+    def setUp(self):
+        self.scanned_paths = []
+
+    def _scan(self, directory_path):
+        self.scanned_paths.append(directory_path)
+        return directory_path.upper(), TREE[directory_path]
+
+    def test_pre_order(self):
+        walker = ParallelDirectoryWalker(self._scan, max_workers=4)
+
+        self.assertEqual([
+            ('', ''),
+            ('b', 'B'),
+            (os.path.join('b', 'd'), os.path.join('B', 'D')),
+            (os.path.join('b', 'c'), os.path.join('B', 'C')),
+            ('a', 'A'),
+            (os.path.join('a', 'e'), os.path.join('A', 'E')),
+        ], list(walker.walk()))
+        self.assertEqual(sorted(TREE), sorted(self.scanned_paths))
+
+    def test_order_of_subdirectories(self):
+        delays = {'b': 0.05, os.path.join('b', 'd'): 0.05}
+
+        def scan(directory_path):
+            # The later subdirectories are scanned first.
+            time.sleep(delays.get(directory_path, 0))
+            return self._scan(directory_path)
+
+        walker = ParallelDirectoryWalker(scan, max_workers=4)
+
+        self.assertEqual(
+            ['', 'b', os.path.join('b', 'd'), os.path.join('b', 'c'), 'a', os.path.join('a', 'e')],
+            [directory_path for directory_path, _ in walker.walk()])
+
+    def test_scan_error(self):
+        def scan(directory_path):
+            if directory_path == 'a':
+                raise OSError('unreadable')
+            return self._scan(directory_path)
+
+        walked_paths = []
+        with self.assertRaises(OSError):
+            for directory_path, _ in ParallelDirectoryWalker(scan).walk():
+                walked_paths.append(directory_path)
+
+        self.assertEqual(['', 'b', os.path.join('b', 'd'), os.path.join('b', 'c')], walked_paths)
+
+    def test_scans_ahead_of_consumer(self):
+        deepest_path = os.path.join(*'abcdefgh')
+        deepest_scanned = threading.Event()
+
+        def scan(directory_path):
+            if directory_path == deepest_path:
+                deepest_scanned.set()
+                return None, []
+            return None, ['abcdefgh'[len(directory_path.split(os.sep)) if directory_path else 0]]
+
+        walk = ParallelDirectoryWalker(scan, max_workers=2).walk()
+        next(walk)
+
+        self.assertTrue(deepest_scanned.wait(5))
+        walk.close()
+
+    def test_abandoned_walk(self):
+        children = [str(i) for i in range(20)]
+        scanned_paths = []
+
+        def scan(directory_path):
+            scanned_paths.append(directory_path)
+            if directory_path:
+                time.sleep(0.05)
+            return None, children if not directory_path else []
+
+        walk = ParallelDirectoryWalker(scan, max_workers=1).walk()
+        next(walk)
+        walk.close()
+        scanned_count = len(scanned_paths)
+        time.sleep(0.1)
+
+        self.assertLess(scanned_count, 5)
+        self.assertEqual(scanned_count, len(scanned_paths))
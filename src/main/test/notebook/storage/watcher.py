@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import TestCase, mock
+
+from notebook.storage import watcher as watcher_module
+from notebook.storage.watcher import InotifyWatcher, PollingWatcher, create_watcher, is_inotify_available
+
+
+class _ReportCollector(object):
+    def __init__(self):
+        self.directory_paths = set()
+        self.recursive = False
+        self.event = threading.Event()
+
+    def __call__(self, directory_paths, recursive):
+        self.directory_paths.update(directory_paths)
+        self.recursive |= recursive
+        self.event.set()
+
+
+@unittest.skipUnless(is_inotify_available(), 'inotify is not available')
+class TestInotifyWatcher(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.temp_dir, 'Foo'))
+        self.collector = _ReportCollector()
+        self.watcher = InotifyWatcher(self.temp_dir, self.collector, coalesce_delay=0.05)
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_coalesces_changes(self):
+        self.watcher.start()
+        for i in range(100):
+            with open(os.path.join(self.temp_dir, 'Foo', '{i}.md'.format(i=i)), 'w') as f:
+                f.write('note')
+        with open(os.path.join(self.temp_dir, 'ignored.txt'), 'w') as f:
+            f.write('not a note')
+
+        self.assertTrue(self.collector.event.wait(5))
+        self.assertEqual({'Foo'}, self.collector.directory_paths)
+        self.assertFalse(self.collector.recursive)
+
+    def test_watches_new_directories(self):
+        self.watcher.start()
+        os.makedirs(os.path.join(self.temp_dir, 'Bar'))
+        self.assertTrue(self.collector.event.wait(5))
+        self.collector.event.clear()
+
+        with open(os.path.join(self.temp_dir, 'Bar', 'Note.md'), 'w') as f:
+            f.write('note')
+
+        self.assertTrue(self.collector.event.wait(5))
+        self.assertIn('Bar', self.collector.directory_paths)
+
+
+class TestPollingWatcher(TestCase):
+    def test_reports_whole_tree(self):
+        collector = _ReportCollector()
+        watcher = PollingWatcher('.', collector, interval=0.01)
+        watcher.start()
+        try:
+            self.assertTrue(collector.event.wait(5))
+        finally:
+            watcher.stop()
+
+        self.assertEqual({''}, collector.directory_paths)
+        self.assertTrue(collector.recursive)
+
+
+class TestCreateWatcher(TestCase):
+    @unittest.skipUnless(is_inotify_available(), 'inotify is not available')
+    def test_inotify_options(self):
+        watcher = create_watcher('.', _ReportCollector(), polling_interval=0.01, coalesce_delay=0.05, max_delay=1.0)
+        try:
+            self.assertIsInstance(watcher, InotifyWatcher)
+            self.assertEqual(0.05, watcher.coalesce_delay)
+            self.assertEqual(1.0, watcher.max_delay)
+        finally:
+            watcher.stop()
+
+    def test_polling_fallback_options(self):
+        with mock.patch.object(watcher_module, 'is_inotify_available', return_value=False):
+            watcher = create_watcher('.', _ReportCollector(), polling_interval=0.01, coalesce_delay=0.05)
+
+        self.assertIsInstance(watcher, PollingWatcher)
+        self.assertEqual(0.01, watcher.interval)
@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+from ui.treeindex import TreeRowIndex, get_folder_key, get_folder_paths_with_ancestors
+
+
+class TestTreeRowIndex(TestCase):
+    def setUp(self):
+        self.index = TreeRowIndex()
+        self.index.add_folder(('Foo',), 'folder Foo')
+        self.index.add_folder(('Foo', 'Bar'), 'folder Foo/Bar')
+        self.index.add_note('Foo/Note.md', ('Foo', 'Note'), 'note Foo/Note.md')
+
+    def test_get_rows(self):
+        self.assertEqual('folder Foo/Bar', self.index.get_folder_row(('Foo', 'Bar')))
+        self.assertEqual('note Foo/Note.md', self.index.get_note_row('Foo/Note.md'))
+        self.assertEqual('folder Foo', self.index.get_row(('Foo',)))
+        self.assertEqual('note Foo/Note.md', self.index.get_row(('Foo', 'Note')))
+        self.assertIsNone(self.index.get_row(('Foo', 'Missing')))
+        self.assertIsNone(self.index.get_folder_row(('Foo', 'Note')))
+        self.assertEqual(3, len(self.index))
+
+    def test_remove_rows(self):
+        self.index.remove_note('Foo/Note.md', ('Foo', 'Note'))
+        self.index.remove_folder(('Foo', 'Bar'))
+        self.index.remove_folder(('Missing',))
+
+        self.assertIsNone(self.index.get_note_row('Foo/Note.md'))
+        self.assertIsNone(self.index.get_row(('Foo', 'Note')))
+        self.assertIsNone(self.index.get_row(('Foo', 'Bar')))
+        self.assertEqual(1, len(self.index))
+
+    def test_rename_note(self):
+        self.index.remove_note('Foo/Note.md', ('Foo', 'Note'))
+        self.index.add_note('Foo/Note.md', ('Foo', 'Renamed'), 'note Foo/Note.md')
+
+        self.assertEqual('note Foo/Note.md', self.index.get_row(('Foo', 'Renamed')))
+        self.assertIsNone(self.index.get_row(('Foo', 'Note')))
+
+    def test_path_of_other_note_is_kept(self):
+        self.index.add_note('Foo/Other.md', ('Foo', 'Note'), 'note Foo/Other.md')
+        self.index.remove_note('Foo/Note.md', ('Foo', 'Note'))
+
+        self.assertEqual('note Foo/Other.md', self.index.get_row(('Foo', 'Note')))
+
+    def test_clear(self):
+        self.index.clear()
+
+        self.assertEqual(0, len(self.index))
+        self.assertIsNone(self.index.get_row(('Foo',)))
+
+
+class TestFolderPaths(TestCase):
+    def test_get_folder_key(self):
+        self.assertEqual('Foo/Bar', get_folder_key(('Foo', 'Bar')))
+        self.assertEqual('', get_folder_key(()))
+
+    def test_get_folder_paths_with_ancestors(self):
+        self.assertEqual(
+            {('Foo',), ('Foo', 'Bar'), ('Foo', 'Bar', 'Baz'), ('Qux',)},
+            get_folder_paths_with_ancestors([('Foo', 'Bar', 'Baz'), ('Foo', 'Bar'), (), ('Qux',)]))
+        self.assertEqual(set(), get_folder_paths_with_ancestors([]))
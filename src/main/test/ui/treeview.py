@@ -0,0 +1,70 @@
+import unittest
+from unittest import TestCase
+
+try:
+    import gi
+    gi.require_version('Gtk', '3.0')
+    from gi.repository import Gtk
+except (ImportError, ValueError):
+    Gtk = None
+
+from application.bus import EventBus
+from notebook.aggregate import FolderPath, Note
+
+if Gtk is not None:
+    from ui.treeview import NotebookTreeStore
+
+
+@unittest.skipIf(Gtk is None, 'GTK is not available')
+class TestNotebookTreeStore(TestCase):
+    def setUp(self):
+        self.store = NotebookTreeStore(EventBus())
+        self.store.add_notes([
+            Note('Foo/Bar/Deep.md', 'Deep', FolderPath(['Foo', 'Bar'])),
+            Note('Foo/Shallow.md', 'Shallow', FolderPath(['Foo'])),
+            Note('Root.md', 'Root', FolderPath([])),
+        ])
+
+    def _get_path_elements(self, note_id):
+        return self.store.get_path_elements_from_iter(self.store.get_iter_from_note_id(note_id))
+
+    def test_lookups(self):
+        self.assertEqual(('Foo', 'Bar', 'Deep'), self._get_path_elements('Foo/Bar/Deep.md'))
+        self.assertEqual(
+            'Foo/Shallow.md',
+            self.store.get_note_id_from_iter(self.store.get_iter_from_path_elements(('Foo', 'Shallow'))))
+        self.assertEqual(('Foo', 'Bar'), self.store.get_path_elements_from_iter(
+            self.store.ensure_folder_exists_and_return_iter(('Foo', 'Bar'))))
+        self.assertIsNone(self.store.get_iter_from_note_id('Missing.md'))
+        with self.assertRaises(RuntimeError):
+            self.store.get_iter_from_path_elements(('Missing',))
+
+    def test_iters_stay_valid_after_inserting_rows(self):
+        for i in range(100):
+            self.store.add_note(Note('Foo/{i}.md'.format(i=i), str(i), FolderPath(['Foo'])))
+
+        self.assertEqual(('Foo', 'Bar', 'Deep'), self._get_path_elements('Foo/Bar/Deep.md'))
+        self.assertEqual(('Foo', '99'), self._get_path_elements('Foo/99.md'))
+
+    def test_remove_note_removes_empty_folders(self):
+        self.store.remove_note('Foo/Bar/Deep.md')
+
+        self.assertIsNone(self.store.get_iter_from_note_id('Foo/Bar/Deep.md'))
+        with self.assertRaises(RuntimeError):
+            self.store.get_iter_from_path_elements(('Foo', 'Bar'))
+        self.assertEqual(('Foo', 'Shallow'), self._get_path_elements('Foo/Shallow.md'))
+
+    def test_rename_folder(self):
+        self.store.rename(self.store.get_iter_from_path_elements(('Foo',)), 'Qux', 'Qux')
+
+        self.assertEqual(('Qux', 'Bar', 'Deep'), self._get_path_elements('Foo/Bar/Deep.md'))
+        self.assertEqual(
+            'Foo/Bar/Deep.md',
+            self.store.get_note_id_from_iter(self.store.get_iter_from_path_elements(('Qux', 'Bar', 'Deep'))))
+        with self.assertRaises(RuntimeError):
+            self.store.get_iter_from_path_elements(('Foo', 'Bar'))
+
+    def test_clear(self):
+        self.store.clear()
+
+        self.assertIsNone(self.store.get_iter_from_note_id('Root.md'))
@@ -1,10 +1,9 @@
 import logging
 
-import cyrusbus
 from gi.repository import GtkSource
 
-from application.event import APPLICATION_TOPIC
-from application.note import NoteOpened, UpdateNotePayloadCommand
+from application.bus import EventBus
+from application.note import DeleteNoteTextCommand, InsertNoteTextCommand, NoteOpened
 
 
 class SourceHandler(object):
@@ -15,7 +14,7 @@ class SourceHandler(object):
 
     def __init__(
             self,
-            bus: cyrusbus.bus.Bus,
+            bus: EventBus,
             source_view: GtkSource.View,
     ):
         self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
@@ -25,8 +24,10 @@ class SourceHandler(object):
         self.current_note_id = None
 
         self.clear()
-        self._on_buffer_changed_handler_id = self.source_buffer.connect('changed', self.on_buffer_changed)
-        self.bus.subscribe(APPLICATION_TOPIC, self.on_application_event)
+        # These handlers run before the default handlers, so the iters still point into the unchanged buffer.
+        self._on_insert_text_handler_id = self.source_buffer.connect('insert-text', self.on_insert_text)
+        self._on_delete_range_handler_id = self.source_buffer.connect('delete-range', self.on_delete_range)
+        self.bus.subscribe(NoteOpened, self.on_note_opened)
 
     def clear(self):
         self.current_note_id = None
@@ -34,28 +35,22 @@ class SourceHandler(object):
         self.source_view.set_sensitive(False)
         self.source_view.hide()
 
-    def on_application_event(self, bus, event):
-        self.log.debug(u'Event received: {event}'.format(event=event))
+    def on_note_opened(self, event: NoteOpened):
+        with self.source_buffer.handler_block(self._on_insert_text_handler_id), \
+             self.source_buffer.handler_block(self._on_delete_range_handler_id):
+            if event.note is not None:
+                self.set_note(event)
+            else:
+                self.clear()
 
-        if isinstance(event, NoteOpened):  # type: NoteOpened
-            with self.source_buffer.handler_block(self._on_buffer_changed_handler_id):
-                if event.note is not None:
-                    self.set_note(event)
-                else:
-                    self.clear()
-        else:
-            self.log.debug(u'Unhandled event: {event}'.format(event=event))
+    def on_delete_range(self, buffer, start, end):
+        self._publish(DeleteNoteTextCommand(self.current_note_id, start.get_offset(), end.get_offset()))
 
-    def on_buffer_changed(self, *args, **kwargs):
-        payload = self.source_buffer.get_text(
-            self.source_buffer.get_start_iter(),
-            self.source_buffer.get_end_iter(),
-            include_hidden_chars=False,
-        )
-        self._publish(UpdateNotePayloadCommand(self.current_note_id, payload))
+    def on_insert_text(self, buffer, location, text, length):
+        self._publish(InsertNoteTextCommand(self.current_note_id, location.get_offset(), text))
 
     def _publish(self, object):
-        self.bus.publish(APPLICATION_TOPIC, object)
+        self.bus.publish(object)
 
     def set_note(self, event: NoteOpened):
         self.current_note_id = event.note.note_id
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Helpers for the notebook tree that do not need GTK."""
+
+__all__ = [
+    'TreeRowIndex',
+    'get_folder_key',
+    'get_folder_paths_with_ancestors',
+]
+
+
+def get_folder_key(path_elements) -> str:
+    """Returns a string that identifies a folder, for the rows of folders in the notebook tree."""
+    return '/'.join(path_elements)
+
+
+def get_folder_paths_with_ancestors(folder_paths) -> set:
+    """Returns the paths of some folders and of all their ancestors, e.g. the folders to show for some notes.
+
+    @param folder_paths: An iterable of tuples of path elements.
+    @return: A set of tuples of path elements. The root folder () is not included.
+    """
+    result = set()
+    for path_elements in folder_paths:
+        while path_elements and path_elements not in result:
+            result.add(path_elements)
+            path_elements = path_elements[:-1]
+    return result
+
+
+class TreeRowIndex(object):
+    """An index of the rows of a notebook tree by folder path and by note id.
+
+    The rows are opaque to the index. NotebookTreeStore keeps its Gtk.TreeIters in it, which stay valid as long as
+    their row exists, because a Gtk.TreeStore has persistent iters. Registering a row therefore takes constant time,
+    unlike a Gtk.TreeRowReference, which the store has to update on every insertion. The owner of the index must
+    remove a row from it before the row is removed from the tree.
+    """
+
+    def __init__(self):
+        self._folder_rows = {}  # type: dict[tuple, object]
+        self._note_rows = {}  # type: dict[str, object]
+        self._note_ids_by_path = {}  # type: dict[tuple, str]
+
+    def __len__(self):
+        return len(self._folder_rows) + len(self._note_rows)
+
+    def add_folder(self, path_elements: tuple, row):
+        """Adds or replaces the row of a folder.
+
+        @param path_elements: The path elements of the folder.
+        @param row: The row.
+        """
+        self._folder_rows[path_elements] = row
+
+    def add_note(self, note_id: str, path_elements: tuple, row):
+        """Adds or replaces the row of a note.
+
+        @param note_id: The id of the note.
+        @param path_elements: The path elements of the folder of the note and its title.
+        @param row: The row.
+        """
+        self._note_rows[note_id] = row
+        self._note_ids_by_path[path_elements] = note_id
+
+    def clear(self):
+        self._folder_rows.clear()
+        self._note_rows.clear()
+        self._note_ids_by_path.clear()
+
+    def get_folder_row(self, path_elements: tuple):
+        """Returns the row of a folder, or None if there is none."""
+        return self._folder_rows.get(path_elements)
+
+    def get_note_row(self, note_id: str):
+        """Returns the row of a note, or None if there is none."""
+        return self._note_rows.get(note_id)
+
+    def get_row(self, path_elements: tuple):
+        """Returns the row of a folder or of a note, or None if there is none.
+
+        @param path_elements: The path elements of the folder, or of the note (including its title).
+        """
+        row = self._folder_rows.get(path_elements)
+        if row is None:
+            note_id = self._note_ids_by_path.get(path_elements)
+            if note_id is not None:
+                row = self._note_rows.get(note_id)
+        return row
+
+    def remove_folder(self, path_elements: tuple):
+        """Removes the row of a folder. Nothing happens if there is none."""
+        self._folder_rows.pop(path_elements, None)
+
+    def remove_note(self, note_id: str, path_elements: tuple):
+        """Removes the row of a note. Nothing happens if there is none.
+
+        @param note_id: The id of the note.
+        @param path_elements: The path elements that the row was added with.
+        """
+        self._note_rows.pop(note_id, None)
+        if self._note_ids_by_path.get(path_elements) == note_id:
+            del self._note_ids_by_path[path_elements]
@@ -2,12 +2,13 @@
 
 import logging
 
-import cyrusbus
-from gi.repository import Gdk, Gtk
+from gi.repository import Gdk, GLib, Gtk
 
-from application.note import NoteOpened, OpenNoteCommand
-from application.event import APPLICATION_TOPIC
+from application.bus import EventBus
+from application.note import NotebookChanged, NotebookLoaded, NoteOpened, OpenNoteCommand
 from notebook.aggregate import NoteCreated, FolderPath, Note
+from notebook.search.trigram import TrigramIndex
+from .treeindex import TreeRowIndex, get_folder_key, get_folder_paths_with_ancestors
 
 __all__ = [
     'NotebookTreeStore',
@@ -18,115 +19,226 @@ FOLDER_TYPE = 'folder'
 
 
 class NotebookTreeStore(Gtk.TreeStore):
-    def __init__(self, bus: cyrusbus.bus.Bus):
+    """A tree store with a row for every folder and note in a notebook.
+
+    The store keeps an index from folder paths and note ids to the iters of their rows (see TreeRowIndex), so that
+    rows can be looked up in constant time. The index is kept up to date by the methods of this class that add, rename
+    and remove rows, so rows must not be removed with the methods of Gtk.TreeStore.
+    """
+
+    def __init__(self, bus: EventBus):
         super().__init__(
             str,  # type
             str,  # path element
             str,  # title
             str,  # note_id (only if type == NOTE_TYPE)
+            str,  # folder key (only if type == FOLDER_TYPE, see get_folder_key())
         )
         self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
-        bus.subscribe(APPLICATION_TOPIC, self.on_event)
+        self._rows = TreeRowIndex()
+        bus.subscribe(NoteCreated, self.on_note_created)
+        bus.subscribe(NotebookChanged, self.on_notebook_changed)
 
     @staticmethod
-    def create_folder_row(path_element: str, title: str):
-        return [FOLDER_TYPE, path_element, title, None]
+    def create_folder_row(path_element: str, title: str, folder_key: str):
+        return [FOLDER_TYPE, path_element, title, None, folder_key]
 
     @staticmethod
     def create_note_row(note_id: str, path_element: str, title: str):
-        return [NOTE_TYPE, path_element, title, note_id]
+        return [NOTE_TYPE, path_element, title, note_id, None]
 
-    def ensure_folder_exists_and_return_iter(self, remaining_path_elements, parent_iter: Gtk.TreeIter = None):
-        if len(remaining_path_elements) == 0:
-            return parent_iter
+    def _register_row(self, iter: Gtk.TreeIter, path_elements: tuple):
+        note_id = self.get_note_id_from_iter(iter)
+        if note_id is None:
+            self._rows.add_folder(path_elements, iter.copy())
         else:
-            current_path_element = remaining_path_elements[0]
-
-            if parent_iter is None:
-                current_child_iter = self.get_iter_first()
-            else:
-                current_child_iter = self.iter_children(parent_iter)
-
-            while current_child_iter is not None:
-                matches = current_path_element == self.get_value(current_child_iter, 1)
-                if matches:
-                    break
-                else:
-                    current_child_iter = self.iter_next(current_child_iter)
-
-            if current_child_iter is None:
-                current_child_iter = self.append(
-                    parent_iter,
-                    self.create_folder_row(
-                        path_element=current_path_element,
-                        title=current_path_element
-                    )
-                )
-
-            return self.ensure_folder_exists_and_return_iter(
-                remaining_path_elements=remaining_path_elements[1:],
-                parent_iter=current_child_iter
-            )
+            self._rows.add_note(note_id, path_elements, iter.copy())
 
-    def get_iter_from_path_elements(self, remaining_path_elements, parent_iter: Gtk.TreeIter = None):
-        if len(remaining_path_elements) == 0:
-            return parent_iter
+    def _unregister_row(self, iter: Gtk.TreeIter, path_elements: tuple):
+        note_id = self.get_note_id_from_iter(iter)
+        if note_id is None:
+            self._rows.remove_folder(path_elements)
         else:
-            current_path_element = remaining_path_elements[0]
-
-            if parent_iter is None:
-                current_child_iter = self.get_iter_first()
-            else:
-                current_child_iter = self.iter_children(parent_iter)
-
-            while current_child_iter is not None:
-                matches = current_path_element == self.get_value(current_child_iter, 1)
-                if matches:
-                    break
-                else:
-                    current_child_iter = self.iter_next(current_child_iter)
-
-            if current_child_iter is not None:
-                return self.get_iter_from_path_elements(
-                    remaining_path_elements=remaining_path_elements[1:],
-                    parent_iter=current_child_iter
-                )
-            else:
-                raise RuntimeError('Path not found')
+            self._rows.remove_note(note_id, path_elements)
+
+    def _iterate_subtree(self, iter: Gtk.TreeIter, path_elements: tuple):
+        """Returns an iterable of tuples (iter, path elements) for a row and all of its descendants."""
+        yield iter, path_elements
+        child_iter = self.iter_children(iter)
+        while child_iter is not None:
+            yield from self._iterate_subtree(child_iter, path_elements + (self.get_value(child_iter, 1),))
+            child_iter = self.iter_next(child_iter)
+
+    def clear(self):
+        super().clear()
+        self._rows.clear()
+
+    def ensure_folder_exists_and_return_iter(self, path_elements):
+        """Returns the iter of a folder row, creating it and its ancestors if necessary.
+
+        @param path_elements: The path elements of the folder.
+        @return: The iter of the folder row, or None for the root.
+        """
+        path_elements = tuple(path_elements)
+        iter = self._rows.get_folder_row(path_elements)
+        if iter is not None or len(path_elements) == 0:
+            return iter
+
+        parent_iter = self.ensure_folder_exists_and_return_iter(path_elements[:-1])
+        iter = self.append(
+            parent_iter,
+            self.create_folder_row(
+                path_element=path_elements[-1],
+                title=path_elements[-1],
+                folder_key=get_folder_key(path_elements)
+            )
+        )
+        self._register_row(iter, path_elements)
+        return iter
+
+    def get_iter_from_path_elements(self, path_elements):
+        """Returns the iter of a folder or note row.
+
+        @param path_elements: The path elements of the folder, or of the note (including its title).
+        @return: The iter of the row, or None for the root.
+        @raise RuntimeError: If there is no row for the path.
+        """
+        path_elements = tuple(path_elements)
+        if len(path_elements) == 0:
+            return None
+        iter = self._rows.get_row(path_elements)
+        if iter is None:
+            raise RuntimeError('Path not found')
+        return iter
+
+    def get_iter_from_note_id(self, note_id: str):
+        """Returns the iter of a note row.
+
+        @param note_id: The id of the note.
+        @return: The iter of the row, or None if there is no row for the note.
+        """
+        return self._rows.get_note_row(note_id)
+
+    def get_path_elements_from_iter(self, iter: Gtk.TreeIter):
+        path_elements = []
+        while iter is not None:
+            path_elements.append(self.get_value(iter, 1))
+            iter = self.iter_parent(iter)
+        return tuple(reversed(path_elements))
+
+    def add_note(self, note: Note):
+        """Adds a row for a note, creating the rows for its folders if necessary.
+
+        @param note: The note.
+        @return: The iter of the new row.
+        """
+        parent_iter = self.ensure_folder_exists_and_return_iter(
+            NotebookTreeStore.get_path_elements_for_folder_from_note(note))
+        iter = self.append(
+            parent_iter,
+            NotebookTreeStore.create_note_row(
+                note_id=note.note_id,
+                path_element=note.title,
+                title=note.title
+            )
+        )
+        self._register_row(iter, tuple(NotebookTreeStore.get_path_elements_for_note_from_note(note)))
+        return iter
+
+    def add_notes(self, notes):
+        """Adds rows for many notes at once.
+
+        The store should not be attached to a view while this method runs, to avoid updating the view for every row.
+
+        @param notes: An iterable of notes.
+        """
+        for note in notes:
+            self.add_note(note)
+
+    def remove(self, iter: Gtk.TreeIter):
+        """Removes a row and all of its descendants.
+
+        @param iter: The iter of the row.
+        @return: Whether iter has been set to the next valid row.
+        """
+        for subtree_iter, path_elements in self._iterate_subtree(iter, self.get_path_elements_from_iter(iter)):
+            self._unregister_row(subtree_iter, path_elements)
+        return super().remove(iter)
+
+    def remove_note(self, note_id: str):
+        """Removes the row of a note, and the rows of the folders that become empty.
+
+        @param note_id: The id of the note. Nothing happens if there is no row for it.
+        """
+        iter = self.get_iter_from_note_id(note_id)
+        if iter is None:
+            return
+        parent_iter = self.iter_parent(iter)
+        self.remove(iter)
+        while parent_iter is not None and not self.iter_has_child(parent_iter):
+            iter = parent_iter
+            parent_iter = self.iter_parent(iter)
+            self.remove(iter)
+
+    def rename(self, iter: Gtk.TreeIter, path_element: str, title: str):
+        """Changes the path element and title of a folder or note row.
+
+        @param iter: The iter of the row.
+        @param path_element: The new path element.
+        @param title: The new title.
+        """
+        old_path_elements = self.get_path_elements_from_iter(iter)
+        subtree = list(self._iterate_subtree(iter, old_path_elements))
+        for subtree_iter, path_elements in subtree:
+            self._unregister_row(subtree_iter, path_elements)
+        self.set(iter, [1, 2], [path_element, title])
+        new_prefix = old_path_elements[:-1] + (path_element,)
+        for subtree_iter, path_elements in subtree:
+            new_path_elements = new_prefix + path_elements[len(old_path_elements):]
+            if self.get_note_id_from_iter(subtree_iter) is None:
+                self.set_value(subtree_iter, 4, get_folder_key(new_path_elements))
+            self._register_row(subtree_iter, new_path_elements)
 
     def get_note_id_from_iter(self, iter: Gtk.TreeIter):
         return self.get(iter, 3)[0]
 
     @staticmethod
     def get_path_elements_for_note_from_note(note: Note):
-        return note.folder_path.elements + [note.title]
+        return note.folder_path.elements + (note.title,)
 
     @staticmethod
     def get_path_elements_for_folder_from_note(note: Note):
         return note.folder_path.elements
 
-    def on_event(self, bus, event, *args, **kwargs):
-        self.log.debug(u'Event received: {event}'.format(event=event))
+    def on_note_created(self, event: NoteCreated):
+        NoteCreatedHandler.handle(self, event)
 
-        if isinstance(event, NoteCreated):  # type: NoteCreated
-            NoteCreatedHandler.handle(self, event)
-        else:
-            self.log.debug(u'Unhandled event: {event}'.format(event=event))
+    def on_notebook_changed(self, event: NotebookChanged):
+        for note_id in event.deleted_note_ids:
+            self.remove_note(note_id)
+        for note in event.created_notes:
+            if self.get_iter_from_note_id(note.note_id) is None:
+                self.add_note(note)
 
 
 class NoteCreatedHandler(object):
     @staticmethod
     def handle(tree_store: NotebookTreeStore, event: NoteCreated):
-        parent_iter = tree_store.ensure_folder_exists_and_return_iter(
-            NotebookTreeStore.get_path_elements_for_folder_from_note(event.note))
-        tree_store.append(
-            parent_iter,
-            NotebookTreeStore.create_note_row(
-                note_id=event.note.note_id,
-                path_element=event.note.title,
-                title=event.note.title
-            )
-        )
+        tree_store.add_note(event.note)
+
+
+class NotebookLoadedHandler(object):
+    @staticmethod
+    def handle(tree_store: NotebookTreeStore, tree_view: Gtk.TreeView, event: NotebookLoaded, create_model=None):
+        """Fills the tree store while it is detached from the tree view, then attaches it again.
+
+        @param create_model: A function that returns the model to attach to the tree view, e.g. a filter, given the
+            filled tree store. If it is None, the tree store itself is attached.
+        """
+        tree_view.set_model(None)
+        tree_store.clear()
+        tree_store.add_notes(event.notes)
+        tree_view.set_model(create_model(tree_store) if create_model is not None else tree_store)
 
 
 class SaneExpandCollapseTreeViewHandler(object):
@@ -176,38 +288,185 @@ class SaneExpandCollapseTreeViewHandler(object):
 
 
 class NotebookTreeViewHandler(object):
+    """Connects the notebook tree view to the application.
+
+    If a search entry is given, the tree view shows a filter of the tree store instead of the store itself. Typing in
+    the search entry then only shows the notes whose title or folder path matches the text (see TrigramIndex),
+    together with their folders, and pressing Enter opens the best match. The tree is filtered filter_delay seconds
+    after the last keystroke; the visible rows are computed from the search index once, so the filter only looks
+    them up, and only the folders of the matches are expanded.
+
+    @ivar filter_delay: The number of seconds without typing after which the tree is filtered.
+    """
+
     def __init__(
             self,
-            bus: cyrusbus.bus.Bus,
+            bus: EventBus,
             tree_store: NotebookTreeStore,
             tree_view: Gtk.TreeView,
+            search_entry: Gtk.SearchEntry = None,
+            filter_delay: float = 0.15,
             **kwargs):
 
         self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
         self.bus = bus
-        # self.tree_store = tree_store
+        self.tree_store = tree_store
         self.tree_view = tree_view
-
-        self.tree_view.get_selection().connect('changed', self.on_selection_changed)
-        # bus.subscribe(APPLICATION_TOPIC, self.on_application_event)
-
-    # def on_application_event(self, bus, event, *args, **kwargs):
-    #     self.log.debug(u'Event received: {event}'.format(event=event))
-    #
-    #     if isinstance(event, NoteOpened):  # type: NoteOpened
-    #         self.tree_store.get_iter_from_path_elements(
-    #             NotebookTreeStore.get_path_elements_for_note_from_note(event.note))
-    #     else:
-    #         self.log.debug(u'Unhandled event: {event}'.format(event=event))
+        self.search_entry = search_entry
+        self.search_index = TrigramIndex()
+        self._tree_model_filter = None  # type: Gtk.TreeModelFilter
+        self.filter_delay = filter_delay
+        self._visible_note_ids = None  # type: set[str]
+        self._visible_folder_paths = set()  # type: set[tuple]
+        self._visible_folder_keys = set()  # type: set[str]
+        self._folder_paths = {}  # type: dict[str, tuple]
+        self._filter_source_id = None  # type: int
+
+        self._on_selection_changed_handler_id = self.tree_view.get_selection().connect(
+            'changed', self.on_selection_changed)
+        bus.subscribe(NotebookLoaded, self.on_notebook_loaded)
+        bus.subscribe(NoteOpened, self.on_note_opened)
+        if search_entry is not None:
+            self.tree_view.set_model(self._create_tree_model_filter(tree_store))
+            search_entry.connect('changed', self.on_search_changed)
+            search_entry.connect('activate', self.on_search_activate)
+            bus.subscribe(NoteCreated, self.on_note_created)
+            bus.subscribe(NotebookChanged, self.on_notebook_changed)
+
+    def _add_to_search_index(self, note: Note):
+        folder_path_elements = tuple(NotebookTreeStore.get_path_elements_for_folder_from_note(note))
+        self._folder_paths[note.note_id] = folder_path_elements
+        self.search_index.add(note.note_id, note.title, '/'.join(folder_path_elements))
+
+    def _create_tree_model_filter(self, tree_store: NotebookTreeStore) -> Gtk.TreeModelFilter:
+        self._tree_model_filter = tree_store.filter_new()
+        self._tree_model_filter.set_visible_func(self._is_row_visible)
+        return self._tree_model_filter
+
+    def _is_row_visible(self, model: Gtk.TreeModel, iter: Gtk.TreeIter, data):
+        if self._visible_note_ids is None:
+            return True
+        note_id, folder_key = model.get(iter, 3, 4)
+        if note_id is not None:
+            return note_id in self._visible_note_ids
+        return folder_key in self._visible_folder_keys
+
+    def on_notebook_loaded(self, event: NotebookLoaded):
+        with self.tree_view.get_selection().handler_block(self._on_selection_changed_handler_id):
+            if self.search_entry is None:
+                NotebookLoadedHandler.handle(self.tree_store, self.tree_view, event)
+                return
+            self.search_index = TrigramIndex()
+            self._folder_paths.clear()
+            for note in event.notes:
+                self._add_to_search_index(note)
+            self._update_visible_rows(self.search_entry.get_text())
+            # Let go of the old filter, so that it does not process every row that is added to the store.
+            self._tree_model_filter = None
+            NotebookLoadedHandler.handle(
+                self.tree_store, self.tree_view, event, create_model=self._create_tree_model_filter)
+            self._expand_visible_folders()
+
+    def on_note_created(self, event: NoteCreated):
+        self._add_to_search_index(event.note)
+
+    def on_notebook_changed(self, event: NotebookChanged):
+        for note_id in event.deleted_note_ids:
+            self.search_index.remove(note_id)
+            self._folder_paths.pop(note_id, None)
+        for note in event.created_notes:
+            self._add_to_search_index(note)
+        if self._visible_note_ids is not None and event.created_notes:
+            with self.tree_view.get_selection().handler_block(self._on_selection_changed_handler_id):
+                self.filter(self.search_entry.get_text())
+
+    def on_note_opened(self, event: NoteOpened):
+        if event.note is not None:
+            with self.tree_view.get_selection().handler_block(self._on_selection_changed_handler_id):
+                self.select_note(event.note.note_id)
+
+    def on_search_activate(self, search_entry: Gtk.SearchEntry):
+        if self._filter_source_id is not None:
+            GLib.source_remove(self._filter_source_id)
+            self._on_filter_timeout()
+        matches = self.search_index.search(search_entry.get_text(), limit=1)
+        if matches:
+            self.select_note(matches[0].key)
+
+    def on_search_changed(self, search_entry: Gtk.SearchEntry):
+        if self._filter_source_id is not None:
+            GLib.source_remove(self._filter_source_id)
+        self._filter_source_id = GLib.timeout_add(int(self.filter_delay * 1000), self._on_filter_timeout)
+
+    def _on_filter_timeout(self):
+        self._filter_source_id = None
+        with self.tree_view.get_selection().handler_block(self._on_selection_changed_handler_id):
+            self.filter(self.search_entry.get_text())
+        return GLib.SOURCE_REMOVE
+
+    def filter(self, query: str):
+        """Shows only the notes that match a query, and their folders.
+
+        @param query: The query. If it is empty, all notes are shown.
+        """
+        self._update_visible_rows(query)
+        self._tree_model_filter.refilter()
+        self._expand_visible_folders()
+
+    def _update_visible_rows(self, query: str):
+        if query.strip():
+            self._visible_note_ids = self.search_index.find(query)
+            self._visible_folder_paths = get_folder_paths_with_ancestors(
+                self._folder_paths[note_id] for note_id in self._visible_note_ids)
+            self._visible_folder_keys = {get_folder_key(path_elements) for path_elements in self._visible_folder_paths}
+        else:
+            self._visible_note_ids = None
+            self._visible_folder_paths = set()
+            self._visible_folder_keys = set()
+
+    def _expand_visible_folders(self):
+        """Expands the folders of the notes that match the query, parents first."""
+        if self._visible_note_ids is None:
+            return
+        for path_elements in sorted(self._visible_folder_paths, key=len):
+            try:
+                iter = self._get_view_iter(self.tree_store.get_iter_from_path_elements(path_elements))
+            except RuntimeError:
+                continue
+            if iter is not None:
+                self.tree_view.expand_row(self.tree_view.get_model().get_path(iter), False)
+
+    def _get_view_iter(self, store_iter: Gtk.TreeIter):
+        """Converts an iter of the tree store to an iter of the model of the tree view, or None if it is hidden."""
+        if self._tree_model_filter is None:
+            return store_iter
+        valid, view_iter = self._tree_model_filter.convert_child_iter_to_iter(store_iter)
+        return view_iter if valid else None
+
+    def select_note(self, note_id: str):
+        """Selects the row of a note, unless it is already selected or hidden."""
+        iter = self.tree_store.get_iter_from_note_id(note_id)
+        if iter is None:
+            return
+        iter = self._get_view_iter(iter)
+        if iter is None:
+            return
+        tree_selection = self.tree_view.get_selection()  # type: Gtk.TreeSelection
+        if tree_selection.iter_is_selected(iter):
+            return
+        path = self.tree_view.get_model().get_path(iter)
+        self.tree_view.expand_to_path(path)
+        tree_selection.select_iter(iter)
+        self.tree_view.scroll_to_cell(path, None, False, 0, 0)
 
     def on_selection_changed(self, tree_selection: Gtk.TreeSelection):
         self.log.debug(u'Selection changed')
-        (tree_model, iter) = tree_selection.get_selected()  # type: NotebookTreeStore, Gtk.TreeIter
+        (tree_model, iter) = tree_selection.get_selected()  # type: Gtk.TreeModel, Gtk.TreeIter
         if iter is not None:
-            note_id = tree_model.get_note_id_from_iter(iter)
+            note_id = tree_model.get_value(iter, 3)
         else:
             note_id = None
         self._publish(OpenNoteCommand(note_id))
 
     def _publish(self, object):
-        self.bus.publish(APPLICATION_TOPIC, object)
+        self.bus.publish(object)
@@ -1,58 +1,153 @@
+import json
 import logging
 
-import cyrusbus
-from gi.repository import GtkSource, WebKit2
-import markdown
-from markdown.extensions.toc import TocExtension
-from markdown.extensions.sane_lists import SaneListExtension
-from pymdownx.github import GithubExtension
+from gi.repository import GLib, GtkSource, WebKit2
 
-import application.event
+from application.bus import EventBus
 from application.note import NoteOpened
-from notebook.aggregate import NotePayloadChanged
+from application.render_worker import RenderResult, RenderWorker
+from notebook.aggregate import NotePayloadChanged, NotePayloadTextDeleted, NotePayloadTextInserted
+
+PATCH_SCRIPT = '''
+function wmsPatch(start, deleteCount, blocks) {
+  var body = document.body;
+  for (var i = 0; i < deleteCount; i++) {
+    body.removeChild(body.children[start]);
+  }
+  var reference = body.children[start] || null;
+  for (var j = 0; j < blocks.length; j++) {
+    var div = document.createElement('div');
+    div.className = 'wms-block';
+    div.innerHTML = blocks[j];
+    body.insertBefore(div, reference);
+  }
+}
+'''
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><script>{script}</script></head><body>{blocks}</body></html>'''
+
+BLOCK_TEMPLATE = '<div class="wms-block">{html}</div>'
 
 
 class WebViewHandler(object):
     """Connects and controls a WebKit2.WebView.
+
+    The preview is updated incrementally. The note is rendered block by block, and when it changes, only the blocks
+    that differ from the displayed ones are replaced in the DOM of the loaded page. Rendering happens on a
+    RenderWorker, so it never blocks the main loop; results for outdated revisions of the note are ignored.
+
+    @ivar current_note_id: The id of the current note.
+    @ivar current_payload: The payload of the current note, kept up to date by applying text changes.
     """
 
     def __init__(
             self,
-            bus: cyrusbus.bus.Bus,
+            bus: EventBus,
             web_view: WebKit2.WebView,
+            render_worker: RenderWorker = None,
     ):
         self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
         self.web_view = web_view
+        self.render_worker = render_worker if render_worker is not None else RenderWorker(deliver=GLib.idle_add)
+        self.current_note_id = None
+        self.current_payload = None
+        self._revision = 0
+        self._reload_needed = False
+        self._displayed_block_hashes = None
+        self._page_loaded = False
 
         self.clear()
-        bus.subscribe(application.event.APPLICATION_TOPIC, self.on_event)
+        self.web_view.connect('load-changed', self.on_load_changed)
+        bus.subscribe(NoteOpened, self.on_note_opened)
+        bus.subscribe(NotePayloadChanged, self.on_note_payload_changed)
+        bus.subscribe(NotePayloadTextInserted, self.on_note_payload_text_changed)
+        bus.subscribe(NotePayloadTextDeleted, self.on_note_payload_text_changed)
 
     def clear(self):
+        self.current_note_id = None
+        self.current_payload = None
+        self._revision += 1
+        self._displayed_block_hashes = None
         self.web_view.hide()
 
-    def on_event(self, bus, event):
-        self.log.debug(u'Event received: {event}'.format(event=event))
+    def on_note_opened(self, event: NoteOpened):
+        if event.note is not None:
+            self.current_note_id = event.note.note_id
+            self.set_note(event.payload, reload=True)
+        else:
+            self.clear()
 
-        if isinstance(event, NoteOpened):  # type: NoteOpened
-            if event.note is not None:
-                self.set_note(event.note.payload)
-            else:
-                self.clear()
-        elif isinstance(event, NotePayloadChanged): # type: NotePayloadChanged
+    def on_note_payload_changed(self, event: NotePayloadChanged):
+        if event.note_id == self.current_note_id:
             self.set_note(event.new_payload)
+
+    def on_note_payload_text_changed(self, event):
+        """Handles NotePayloadTextInserted and NotePayloadTextDeleted events."""
+        if event.note_id == self.current_note_id:
+            self.set_note(event.apply_to(self.current_payload))
+
+    def on_load_changed(self, web_view: WebKit2.WebView, load_event: WebKit2.LoadEvent):
+        if load_event == WebKit2.LoadEvent.FINISHED:
+            self._page_loaded = True
+
+    def on_rendered(self, result: RenderResult):
+        """Shows a rendered note. Called on the main loop."""
+        if result.note_id != self.current_note_id or result.revision != self._revision:
+            return
+        block_hashes = [block.block_hash for block in result.blocks]
+        if self._reload_needed or self._displayed_block_hashes is None or not self._page_loaded:
+            self._load_page(result.blocks)
         else:
-            self.log.debug(u'Unhandled event: {event}'.format(event=event))
-
-    def set_note(self, payload):
-        html = markdown.markdown(
-            payload,
-            tab_length=2,
-            extensions=[GithubExtension(), SaneListExtension(), TocExtension()],
-            output_format='html5',
+            self._patch_page(result.blocks, block_hashes)
+        self._reload_needed = False
+        self._displayed_block_hashes = block_hashes
+        self.web_view.show()
+
+    def set_note(self, payload, reload=False):
+        """Requests a note to be rendered and shown.
+
+        @param payload: The payload of the note.
+        @param reload: Whether to load a new page instead of patching the displayed one.
+        """
+        self.current_payload = payload
+        self._revision += 1
+        if reload:
+            self._reload_needed = True
+        self.render_worker.submit(self.current_note_id, self._revision, payload, self.on_rendered)
+
+    def _load_page(self, rendered_blocks):
+        html = PAGE_TEMPLATE.format(
+            script=PATCH_SCRIPT,
+            blocks=''.join(BLOCK_TEMPLATE.format(html=block.html) for block in rendered_blocks),
         )
+        self._page_loaded = False
         # self.webview.load_uri('file:///D:/Users/.../test.html')
         self.web_view.load_html(
             html,
             # base_uri='file:///D:/Users/.../Python/test/'
         )
-        self.web_view.show()
+
+    def _patch_page(self, rendered_blocks, block_hashes):
+        """Replaces the blocks that differ between the displayed and the new blocks."""
+        old_block_hashes = self._displayed_block_hashes
+        max_common_length = min(len(old_block_hashes), len(block_hashes))
+        prefix_length = 0
+        while prefix_length < max_common_length and \
+                old_block_hashes[prefix_length] == block_hashes[prefix_length]:
+            prefix_length += 1
+        suffix_length = 0
+        while suffix_length < max_common_length - prefix_length and \
+                old_block_hashes[-1 - suffix_length] == block_hashes[-1 - suffix_length]:
+            suffix_length += 1
+
+        delete_count = len(old_block_hashes) - prefix_length - suffix_length
+        inserted_blocks = rendered_blocks[prefix_length:len(rendered_blocks) - suffix_length]
+        if delete_count == 0 and len(inserted_blocks) == 0:
+            return
+        script = 'wmsPatch({start}, {delete_count}, {blocks});'.format(
+            start=prefix_length,
+            delete_count=delete_count,
+            blocks=json.dumps([block.html for block in inserted_blocks]),
+        )
+        self.web_view.run_javascript(script, None, None, None)
@@ -1,9 +1,8 @@
 import logging
 
-import cyrusbus
 from gi.repository import Gtk
 
-import application.event
+from application.bus import EventBus
 from application.note import NoteOpened
 
 
@@ -12,23 +11,18 @@ class WindowTitleHandler(object):
 
     def __init__(
             self,
-            bus: cyrusbus.bus.Bus,
+            bus: EventBus,
             window: Gtk.Window,
     ):
         self.log = logging.getLogger('{m}.{c}'.format(m=self.__class__.__module__, c=self.__class__.__name__))
         self.window = window
 
-        bus.subscribe(application.event.APPLICATION_TOPIC, self.on_application_event)
+        bus.subscribe(NoteOpened, self.on_note_opened)
 
         self.set_title(None)
 
-    def on_application_event(self, bus, event):
-        self.log.debug(u'Event received: {event}'.format(event=event))
-
-        if isinstance(event, NoteOpened):  # type: NoteOpened
-            self.set_title(event.note)
-        else:
-            self.log.debug(u'Unhandled event: {event}'.format(event=event))
+    def on_note_opened(self, event: NoteOpened):
+        self.set_title(event.note)
 
     def set_title(self, note):
         if note is not None: